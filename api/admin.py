@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import Dict, List, Optional
 from pymongo.collection import Collection
 from bson import ObjectId
 from pydantic import BaseModel, Field
@@ -7,9 +7,13 @@ from pydantic import BaseModel, Field
 from db.mongodb import get_db, get_collection  # Ensure you have the correct import for your MongoDB functions
 from services.auth import verify_admin
 from models.user import UserInDB
+from utils.market_margin import FAIR_METHODS, MARGIN_METHODS, MarginCache
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Matches read per round-trip when the margins board is built
+MARGIN_BATCH_SIZE = 1000
+
 class ContentCreate(BaseModel):
     title: str
     description: str
@@ -93,3 +97,93 @@ async def delete_content(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found")
     
     return None
+
+@router.get("/margins")
+async def get_market_margins(
+    request: Request,
+    method: str = Query("proportional", pattern=f"^({'|'.join(FAIR_METHODS)})$"),
+    target_margin: Optional[float] = Query(None, ge=0, lt=1),
+    margin_method: str = Query("proportional", pattern=f"^({'|'.join(MARGIN_METHODS)})$"),
+    current_user: UserInDB = Depends(verify_admin),
+    db=Depends(get_db),
+):
+    """
+    Overround, margin and fair probabilities of every open and live market,
+    repricing only matches whose odds changed. Markets come from the matches
+    collection (odds only, in batches); live matches use the streamed odds.
+    """
+    board = {}
+    cursor = db["matches"].find({"status": {"$in": ["open", "live"]}}, {"odds": 1}).batch_size(MARGIN_BATCH_SIZE)
+    async for match in cursor:
+        if match.get("odds"):
+            board[str(match["_id"])] = match["odds"]
+    board.update(request.app.state.odds_stream.odds)  # Newer than Mongo while ticks are being written
+    caches = request.app.state.margin_caches
+    key = (method, target_margin, margin_method)
+    if key not in caches:
+        if len(caches) >= 16:
+            caches.clear()  # Bound the number of pricing configurations kept
+        caches[key] = MarginCache(method, target_margin, margin_method)
+    return caches[key].board(board, prune=True)
+
+@router.get("/exposure")
+async def get_exposure(
+    request: Request,
+    match_id: Optional[str] = None,
+    current_user: UserInDB = Depends(verify_admin),
+):
+    """Stake, liability and net result of the open bets per match/market/selection, from the in-memory exposure book."""
+    return request.app.state.exposure_book.report(match_id)
+
+class RiskLimitUpdate(BaseModel):
+    max_stake: Optional[float] = Field(None, ge=0, description="Largest stake on one bet")
+    max_payout: Optional[float] = Field(None, ge=0, description="Market: largest liability on a selection; user: largest potential payout of open bets")
+
+@router.get("/risk-limits")
+async def get_risk_limits(request: Request, current_user: UserInDB = Depends(verify_admin)):
+    """Every risk limit profile, keyed '<scope>:<key>'."""
+    return request.app.state.risk_limits.profiles()
+
+@router.put("/risk-limits/{scope}/{key}")
+async def set_risk_limit(
+    scope: str,
+    key: str,
+    limits: RiskLimitUpdate,
+    request: Request,
+    current_user: UserInDB = Depends(verify_admin),
+):
+    """Create or replace a limit profile ('market' or 'user' scope; key 'default', a market, a match ID or a user ID). Applies at once on every worker."""
+    await request.app.state.risk_limits.set_profile(scope, key, limits.dict())
+    return {"id": f"{scope}:{key}", **limits.dict()}
+
+@router.delete("/risk-limits/{scope}/{key}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_risk_limit(scope: str, key: str, request: Request, current_user: UserInDB = Depends(verify_admin)):
+    if not await request.app.state.risk_limits.delete_profile(scope, key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Risk limit profile not found")
+    return None
+
+class SettlementRequest(BaseModel):
+    winners: Dict[str, List[str]] = Field(default_factory=dict, description="Winning selections per market, e.g. {'match_odds': ['home']}")
+    void_markets: List[str] = Field(default_factory=list, description="Markets whose bets are voided (stakes returned)")
+    void: bool = Field(False, description="Void every bet on the match")
+
+@router.post("/settle/{match_id}", status_code=status.HTTP_202_ACCEPTED)
+async def settle_match(
+    match_id: str,
+    result: SettlementRequest,
+    request: Request,
+    current_user: UserInDB = Depends(verify_admin),
+):
+    """Settle every pending bet on a match in the background. Repeating a result is a no-op, results for further markets reopen the job, a contradicting one is rejected."""
+    engine = request.app.state.settlement
+    await engine.claim(match_id, result.winners, result.void_markets, result.void)
+    engine.start_job(match_id, result.winners, result.void_markets, result.void)
+    return await engine.job(match_id)
+
+@router.get("/settle/{match_id}")
+async def get_settlement(match_id: str, request: Request, current_user: UserInDB = Depends(verify_admin)):
+    """Progress of a match's settlement: state, bets settled per outcome and amount credited."""
+    job = await request.app.state.settlement.job(match_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match has not been settled")
+    return job
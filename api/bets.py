@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from db.mongodb import get_db
 from services.match import MatchService
+from services.bet import MatchService as MatchListingService
+from services.connections import ConnectionRegistry, EventStreamChannel
+from services.bet_delay import BetDelayQueue
+from services.idempotency import IdempotencyStore
+from services.live import query_encoding, query_topics, serve_connection, serve_subscriber
+from services.odds_stream import OddsStream
+from utils.live_encoding import SSE_ENCODING
 from utils.jwt import get_current_user
+from utils.pagination import NEXT_CURSOR_HEADER, keyset_params
 from schemas.match import (
     MatchResponse,
     MatchDetailResponse,
@@ -25,13 +34,19 @@ router = APIRouter(
 logger = logging.getLogger("uvicorn.error")
 
 # Dependency for MatchService
-def get_match_service(db=Depends(get_db)) -> MatchService:
+def get_match_service(request: Request, db=Depends(get_db)) -> MatchService:
     collection: AsyncIOMotorCollection = db["matches"]
-    return MatchService(collection, db)
+    state = request.app.state
+    return MatchService(collection, db, state.cashout_book, state.exposure_book, state.risk_limits, state.odds_book,
+                        state.bet_delay, state.bet_queue)
 
-# Reusable pagination dependency
-def pagination_params(page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100)):
-    return {"page": page, "page_size": page_size}
+# Listings are read through services.bet, which pages them by keyset (`after` tokens)
+def get_listing_service(request: Request, db=Depends(get_db)) -> MatchListingService:
+    return MatchListingService(db["matches"], db, request.app.state.odds_book)
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
 # Helper function to validate ObjectId format
 def validate_object_id(id: str):
@@ -44,27 +59,82 @@ def validate_object_id(id: str):
         )
 
 @router.websocket("/ws/live-bets")
-async def websocket_live_bets(websocket: WebSocket, match_service: MatchService = Depends(get_match_service)):
+async def websocket_live_bets(websocket: WebSocket, since: Optional[int] = None):
+    """
+    Stream live odds: one snapshot on connect, then per-match deltas tagged with `seq`.
+    Reconnecting clients pass `?since=<last seq>` to replay only the deltas they missed,
+    and can narrow the stream with `?match_id=`/`?sport=`/`?league=` or subscribe messages.
+    """
     await websocket.accept()
+    odds_stream: OddsStream = websocket.app.state.odds_stream
+    connections: ConnectionRegistry = websocket.app.state.connections
+    connection = connections.register(websocket, query_encoding(websocket))
+    odds_stream.subscribe(connection)
     try:
-        while True:
-            odds_data = await match_service.get_live_odds_data()  # Ensure this method exists in MatchService
-            await websocket.send_json(odds_data)
+        topics = query_topics(websocket)
+        if topics:
+            odds_stream.index.subscribe(connection, topics)
+        backlog = odds_stream.since(since, connection) if since is not None else None
+        if backlog is None:
+            connection.send(odds_stream.snapshot(connection))
+        else:
+            for message in backlog:
+                connection.send(message)
+        await serve_subscriber(websocket, odds_stream, connection)
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        await websocket.close()
+    finally:
+        odds_stream.unsubscribe(connection)
+        await connections.unregister(connection)  # Closes the websocket
+
 
+@router.websocket("/ws/bets")
+async def websocket_bets(websocket: WebSocket, token: str = Query(...)):
+    """
+    The user's bet notifications, e.g. in-play bets accepted or rejected after
+    their delay: `{"type": "bets", "results": [{"ticket", "status", ...}]}`.
+    Authenticated with the access token as `?token=`.
+    """
+    try:
+        user_id = get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    bet_delay: BetDelayQueue = websocket.app.state.bet_delay
+    connections: ConnectionRegistry = websocket.app.state.connections
+    connection = connections.register(websocket, query_encoding(websocket))
+    bet_delay.watch(user_id, connection)
+    try:
+        await serve_connection(websocket, connection)
+    except WebSocketDisconnect:
+        logger.info("Bets WebSocket connection closed")
+    except Exception as e:
+        logger.error(f"Bets WebSocket error: {e}")
+    finally:
+        bet_delay.unwatch(user_id, connection)
+        await connections.unregister(connection)
 
 @router.post("/place-bet", response_model=dict)
 async def place_bet(
     bet_request: PlaceBetRequest,
+    request: Request,
+    response: Response,
     user_id: str = Depends(get_current_user),
-    match_service: MatchService = Depends(get_match_service)
+    match_service: MatchService = Depends(get_match_service),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
-    """Place a bet for a specific match."""
+    """
+    Place a bet for a specific match. Retries sent with the same `Idempotency-Key`
+    header get the first response back instead of placing the bet again.
+    """
     try:
+        if idempotency_key:
+            store: IdempotencyStore = request.app.state.idempotency
+            return await store.run(f"place_bet:{user_id}:{idempotency_key}", bet_request.dict(),
+                                   lambda: match_service.place_bet(user_id, bet_request), response)
         result = await match_service.place_bet(user_id, bet_request)
         return result
     except HTTPException as e:
@@ -75,49 +145,83 @@ async def place_bet(
 
 @router.get("/", response_model=List[MatchResponse])
 async def get_all_matches(
-    pagination: dict = Depends(pagination_params),
-    match_service: MatchService = Depends(get_match_service)
+    response: Response,
+    pagination: dict = Depends(keyset_params),
+    match_service: MatchListingService = Depends(get_listing_service)
 ):
-    """Retrieve all available matches with optional pagination."""
+    """Retrieve all available matches, a page at a time. Pass the `X-Next-Cursor` header of a page as `after` to get the next one."""
     try:
-        matches = await match_service.get_all_matches(**pagination)
+        matches, next_cursor = await match_service.get_all_matches(**pagination)
+        set_next_cursor(response, next_cursor)
         if not matches:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matches found.")
         return matches
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error fetching matches: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching matches.")
 
 @router.get("/live", response_model=List[LiveMatchResponse])
 async def get_live_matches(
-    pagination: dict = Depends(pagination_params),
-    match_service: MatchService = Depends(get_match_service)
+    response: Response,
+    pagination: dict = Depends(keyset_params),
+    match_service: MatchListingService = Depends(get_listing_service)
 ):
-    """Retrieve all live matches with live betting options and optional pagination."""
+    """Retrieve all live matches with live betting options, a page at a time. Pass the `X-Next-Cursor` header of a page as `after` to get the next one."""
     try:
-        live_matches = await match_service.get_live_matches(**pagination)
+        live_matches, next_cursor = await match_service.get_live_matches(**pagination)
+        set_next_cursor(response, next_cursor)
         if not live_matches:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No live matches found.")
         return live_matches
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error fetching live matches: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching live matches.")
 
-@router.get("/{match_id}", response_model=MatchDetailResponse)
-async def get_match_by_id(
-    match_id: str,
-    match_service: MatchService = Depends(get_match_service)
+@router.get("/live/stream")
+async def stream_live(
+    request: Request,
+    feed: str = Query("odds", pattern="^(odds|matches)$"),
+    last_event_id: Optional[int] = Header(None),
 ):
-    """Retrieve detailed information for a specific match by match ID."""
-    validate_object_id(match_id)
-    try:
-        match = await match_service.get_match_by_id(match_id)
-        if not match:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found.")
-        return match
-    except Exception as e:
-        logger.error(f"Error fetching match details for ID {match_id}: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching match details.")
+    """
+    Server-Sent Events version of the live websockets, for clients behind proxies
+    that drop websockets. `feed=odds` streams odds deltas whose event ids are their
+    `seq`, so a reconnecting EventSource resumes from `Last-Event-ID`; `feed=matches`
+    streams live match documents (scores, status, odds) and restarts from a snapshot.
+    `?match_id=`/`?sport=`/`?league=` narrow the stream as on the websockets.
+    """
+    hub = request.app.state.odds_stream if feed == "odds" else request.app.state.live_matches_hub
+    connections: ConnectionRegistry = request.app.state.connections
+    channel = EventStreamChannel()
+    connection = connections.register(channel, SSE_ENCODING)
+    hub.subscribe(connection)
+    topics = query_topics(request)
+    if topics:
+        hub.index.subscribe(connection, topics)
+    backlog = hub.since(last_event_id, connection) if feed == "odds" and last_event_id is not None else None
+    if backlog is None:
+        connection.send(hub.snapshot(connection))
+    else:
+        for message in backlog:
+            connection.send(message)
+
+    async def events():
+        try:
+            async for record in channel.records(connection):
+                yield record
+        finally:
+            hub.unsubscribe(connection)
+            await connections.unregister(connection)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/sports/{category}", response_model=List[SportCategoryResponse])
 async def get_matches_by_sport_category(
@@ -136,46 +240,75 @@ async def get_matches_by_sport_category(
 
 @router.get("/today", response_model=List[MatchResponse])
 async def get_todays_matches(
-    pagination: dict = Depends(pagination_params),
-    match_service: MatchService = Depends(get_match_service)
+    response: Response,
+    pagination: dict = Depends(keyset_params),
+    match_service: MatchListingService = Depends(get_listing_service)
 ):
-    """Retrieve all matches scheduled for today with optional pagination."""
+    """Retrieve all matches scheduled for today, a page at a time. Pass the `X-Next-Cursor` header of a page as `after` to get the next one."""
     try:
-        todays_matches = await match_service.get_todays_matches(**pagination)
+        todays_matches, next_cursor = await match_service.get_todays_matches(**pagination)
+        set_next_cursor(response, next_cursor)
         if not todays_matches:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matches available for today.")
         return todays_matches
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error fetching today's matches: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching today's matches.")
 
 @router.get("/upcoming", response_model=List[MatchResponse])
 async def get_upcoming_matches(
-    pagination: dict = Depends(pagination_params),
-    match_service: MatchService = Depends(get_match_service)
+    response: Response,
+    pagination: dict = Depends(keyset_params),
+    match_service: MatchListingService = Depends(get_listing_service)
 ):
-    """Retrieve all upcoming matches with optional pagination."""
+    """Retrieve all upcoming matches, soonest first, a page at a time. Pass the `X-Next-Cursor` header of a page as `after` to get the next one."""
     try:
-        upcoming_matches = await match_service.get_upcoming_matches(**pagination)
+        upcoming_matches, next_cursor = await match_service.get_upcoming_matches(**pagination)
+        set_next_cursor(response, next_cursor)
         if not upcoming_matches:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No upcoming matches found.")
         return upcoming_matches
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error fetching upcoming matches: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching upcoming matches.")
 
 @router.get("/history", response_model=List[BetHistoryResponse])
 async def get_bet_history(
+    response: Response,
     user_id: str = Depends(get_current_user),
-    pagination: dict = Depends(pagination_params),
-    match_service: MatchService = Depends(get_match_service)
+    pagination: dict = Depends(keyset_params),
+    match_service: MatchListingService = Depends(get_listing_service)
 ):
-    """Retrieve the betting history for the authenticated user with optional pagination."""
+    """Retrieve the betting history for the authenticated user, newest first. Pass the `X-Next-Cursor` header of a page as `after` to get the next one."""
     try:
-        bet_history = await match_service.get_bet_history(user_id, **pagination)
+        bet_history, next_cursor = await match_service.get_bet_history(user_id, **pagination)
+        set_next_cursor(response, next_cursor)
         if not bet_history:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No bet history found.")
         return bet_history
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error fetching bet history for user {user_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching bet history.")
+
+# Catch-all match route: declared last so the literal paths above (/today, /history, ...) match first
+@router.get("/{match_id}", response_model=MatchDetailResponse)
+async def get_match_by_id(
+    match_id: str,
+    match_service: MatchService = Depends(get_match_service)
+):
+    """Retrieve detailed information for a specific match by match ID."""
+    validate_object_id(match_id)
+    try:
+        match = await match_service.get_match_by_id(match_id)
+        if not match:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found.")
+        return match
+    except Exception as e:
+        logger.error(f"Error fetching match details for ID {match_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching match details.")
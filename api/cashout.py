@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from db.mongodb import get_db
+from schemas.bet import CashoutQuote, CashoutRequest
+from services.cashout import CashoutBook
+from utils.jwt import get_current_user
+import logging
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Cash-out offers are read from the in-memory book, never from Mongo
+@router.get("/{bet_id}/cashout", response_model=CashoutQuote)
+async def get_cashout_quote(bet_id: str, request: Request, user_id: str = Depends(get_current_user)):
+    """Current cash-out offer for one of the user's open bets."""
+    book: CashoutBook = request.app.state.cashout_book
+    quote = book.quote(bet_id)
+    if quote is None or quote["user_id"] != str(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No cash-out available for this bet")
+    return quote
+
+@router.post("/{bet_id}/cashout", response_model=dict)
+async def accept_cashout(
+    bet_id: str,
+    cashout: CashoutRequest,
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """
+    Cash out at the quoted offer. Rejected with 409 and the current offer if the
+    odds have moved against the bet since it was quoted.
+    """
+    book: CashoutBook = request.app.state.cashout_book
+    try:
+        return await book.accept(db, bet_id, user_id, cashout.offer)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error cashing out bet {bet_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error cashing out bet.")
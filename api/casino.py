@@ -1,26 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, WebSocket
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from typing import List
 from schemas.casino import CasinoGame, CasinoGameCreate, CasinoGameUpdate
 from services.casino import CasinoService
+from services.casino_live import CasinoTicker
+from services.connections import ConnectionRegistry
+from services.live import query_encoding, serve_connection
 from db.mongodb import get_db  # Assuming you have a function to get the DB connection
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-async def get_live_casino_data(db=Depends(get_db)):
-    # Assuming you're querying the database to get live game data
-    try:
-        # Example: Fetch live data of games from your database (replace with actual query)
-        live_games = await db["casino_games"].find({"status": "live"}).to_list(length=10)
-        return live_games  # This should be a list of live casino game data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching live casino data: {str(e)}")
 
 @router.websocket("/ws/casino-live")
 async def websocket_casino_live(websocket: WebSocket):
     await websocket.accept()
-    while True:
-        # Real-time data for live casino games
-        casino_data = await get_live_casino_data()  # Replace with actual function to fetch live data
-        await websocket.send_json(casino_data)
+    connections: ConnectionRegistry = websocket.app.state.connections
+    ticker: CasinoTicker = websocket.app.state.casino_ticker
+    connection = connections.register(websocket, query_encoding(websocket))
+    # Gets the shared snapshot now and again on each tick that changes it
+    ticker.subscribe(connection)
+    try:
+        await serve_connection(websocket, connection)
+    except WebSocketDisconnect:
+        logger.info(f"Casino live client disconnected: {websocket.client}")
+    except Exception as e:
+        logger.error(f"Error with casino live WebSocket: {e}")
+    finally:
+        ticker.unsubscribe(connection)
+        await connections.unregister(connection)
 
 @router.get("/", response_model=List[CasinoGame])
 async def get_casino_games(db=Depends(get_db)):
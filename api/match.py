@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, Field
 from typing import List
 from bson import ObjectId
 from services.match import MatchService
+from services.connections import ConnectionRegistry
+from services.live import LiveHub, query_encoding, query_topics, serve_subscriber
 from motor.motor_asyncio import AsyncIOMotorCollection
 from db.mongodb import get_db, get_collection
-from datetime import datetime
-import asyncio
 
 router = APIRouter()
 
@@ -24,34 +24,25 @@ class MatchResponse(BaseModel):
         json_encoders = {
             ObjectId: str
         }
-async def get_live_match_updates():
-    """
-    Mock function to simulate live match updates.
-    Replace this with actual data retrieval logic from your database or live source.
-    """
-    # Example data, replace with real match data fetching logic.
-    return [
-        {
-            "_id": "64a32c12e8d7b3bcf5d5a123",
-            "team_a": "Team A",
-            "team_b": "Team B",
-            "score": "2-1",
-            "status": "ongoing",
-            "start_time": datetime.now().isoformat(),
-            "markets": [{"market_name": "Win", "odds": 1.5}, {"market_name": "Draw", "odds": 3.0}]
-        },
-        # Additional match updates can be added here.
-    ]
 @router.websocket("/ws/live-matches")
 async def websocket_live_matches(websocket: WebSocket):
+    """Stream live matches, optionally narrowed by match_id/sport/league subscriptions."""
     await websocket.accept()
+    live_matches_hub: LiveHub = websocket.app.state.live_matches_hub
+    connections: ConnectionRegistry = websocket.app.state.connections
+    connection = connections.register(websocket, query_encoding(websocket))
+    live_matches_hub.subscribe(connection)
     try:
-        while True:
-            match_updates = await get_live_match_updates()
-            await websocket.send_json(match_updates)
-            await asyncio.sleep(5)  # Adjust frequency as needed
-    except Exception as e:
-        await websocket.close(code=1001)  # Optional: Close WebSocket if error occurs
+        topics = query_topics(websocket)
+        if topics:
+            live_matches_hub.index.subscribe(connection, topics)
+        connection.send(live_matches_hub.snapshot(connection))
+        await serve_subscriber(websocket, live_matches_hub, connection)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_matches_hub.unsubscribe(connection)
+        await connections.unregister(connection, code=1001)  # Closes the websocket
 
 # Dependency to inject MatchService
 def get_match_service(collection: AsyncIOMotorCollection = Depends(get_collection)):
@@ -63,17 +54,6 @@ def validate_object_id(match_id: str):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid match ID format")
     return ObjectId(match_id)
 
-@router.websocket("/ws/live-matches")
-async def websocket_live_matches(websocket: WebSocket):
-    await websocket.accept()
-    while True:
-        try:
-            # Retrieve live match updates; ensure `get_live_match_updates` is defined.
-            match_updates = await get_live_match_updates()
-            await websocket.send_json(match_updates)
-        except Exception as e:
-            await websocket.close(code=1001)  # Optional: Close WebSocket if error occurs
-
 @router.get("/", response_model=List[MatchResponse])
 async def get_all_matches(service: MatchService = Depends(get_match_service)):
     matches = await service.get_all_matches()
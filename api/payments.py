@@ -1,9 +1,12 @@
 # api/payments.py
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, status
 from pydantic import BaseModel
 from typing import Optional
+import hashlib
 from core.security import verify_access_token  # JWT authentication
+from services.idempotency import IdempotencyStore
+from utils.jwt import get_current_user
 import stripe  # Replace with actual payment provider if different
 
 # Initialize the router
@@ -28,10 +31,31 @@ class PaymentVerificationRequest(BaseModel):
 
 
 @router.post("/initiate", summary="Initiate a new payment")
-async def initiate_payment(payment_request: PaymentInitiateRequest):
+async def initiate_payment(
+    payment_request: PaymentInitiateRequest,
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
     """
     Initiates a new payment using Stripe (or other provider).
+    Retries with the same `Idempotency-Key` header return the first PaymentIntent.
+    Keys are per user, so another user's key never returns their PaymentIntent.
     """
+    if idempotency_key:
+        store: IdempotencyStore = request.app.state.idempotency
+        key = f"payment:{user_id}:{idempotency_key}"
+        # Stripe keys are per account, so the user goes into the one sent there too (hashed to fit 255 chars)
+        stripe_key = hashlib.sha256(key.encode()).hexdigest()
+        return await store.run(key, payment_request.dict(),
+                               lambda: create_payment(payment_request, stripe_key), response)
+    return await create_payment(payment_request)
+
+
+async def create_payment(payment_request: PaymentInitiateRequest, idempotency_key: Optional[str] = None):
+    # Stripe also dedupes retries that carry the same key
+    options = {"idempotency_key": idempotency_key} if idempotency_key else {}
     try:
         # Create a payment intent with Stripe (modify if using a different provider)
         payment_intent = stripe.PaymentIntent.create(
@@ -39,6 +63,7 @@ async def initiate_payment(payment_request: PaymentInitiateRequest):
             currency=payment_request.currency,
             description=payment_request.description,
             receipt_email=payment_request.customer_email,
+            **options,
         )
 
         return {
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 from pymongo.collection import Collection
 from bson import ObjectId
-from db.mongodb import get_db
+from db.mongodb import get_db, get_collection
 from models.transaction import TransactionModel  # Assuming a TransactionModel schema exists in models
 from schemas.transaction import TransactionCreate, TransactionResponse  # Assuming schema files exist
+from services.transaction import TRANSACTION_ORDER
+from utils.pagination import NEXT_CURSOR_HEADER, keyset_params, paginate
 
 router = APIRouter()
 
@@ -34,21 +36,27 @@ async def create_transaction(
     created_transaction = await db.find_one({"_id": result.inserted_id})
     return TransactionResponse(**created_transaction)
 
-# Endpoint to get a list of all transactions, with optional filtering by user ID
+# Dependency for the transactions collection
+async def get_transactions_collection() -> Collection:
+    return await get_collection("transactions")
+
+# Endpoint to get a page of transactions, with optional filtering by user ID
 @router.get("/", response_model=List[TransactionResponse], status_code=status.HTTP_200_OK)
 async def get_transactions(
+    response: Response,
     user_id: Optional[str] = None,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    pagination: dict = Depends(keyset_params),
+    db: Collection = Depends(get_transactions_collection)
 ) -> List[TransactionResponse]:
     """
-    Retrieve all transactions, optionally filtered by user ID.
+    Retrieve transactions newest first, optionally filtered by user ID, one page at a time.
+    The `X-Next-Cursor` header of a page, passed back as `after`, gives the next page.
     """
     query = {"user_id": user_id} if user_id else {}
-    transactions = db.find(query)
-    results = []
-    async for t in transactions:
-        results.append(TransactionResponse(**t))
-    return results
+    transactions, next_cursor = await paginate(db, query, TRANSACTION_ORDER, **pagination)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [TransactionResponse(**t) for t in transactions]
 
 # Endpoint to retrieve a specific transaction by ID
 @router.get("/{transaction_id}", response_model=TransactionResponse, status_code=status.HTTP_200_OK)
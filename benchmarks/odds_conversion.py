@@ -0,0 +1,49 @@
+# benchmarks/odds_conversion.py
+"""
+Scalar vs batch odds conversion for a full board in every display format.
+
+    python -m benchmarks.odds_conversion [--selections 20000] [--repeat 5]
+"""
+
+import argparse
+import timeit
+import numpy as np
+from utils.calculate_odds import (
+    convert_odds_batch,
+    decimal_to_american,
+    decimal_to_fractional,
+    implied_probability,
+    is_valid_odds,
+)
+
+
+def convert_scalar(odds):
+    """The per-price path: one Python call per price per format."""
+    return [
+        (decimal_to_fractional(price), decimal_to_american(price), implied_probability(price))
+        if is_valid_odds(price) else None
+        for price in odds
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--selections", type=int, default=20000, help="Prices on the board")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    odds = np.round(rng.uniform(1.01, 15.0, args.selections), 2)
+    odds[:: max(1, args.selections // 100)] = 0.5  # Sprinkle invalid prices
+    odds_list = odds.tolist()
+
+    scalar = min(timeit.repeat(lambda: convert_scalar(odds_list), number=1, repeat=args.repeat))
+    batch = min(timeit.repeat(lambda: convert_odds_batch(odds), number=1, repeat=args.repeat))
+    print(f"{args.selections} prices, best of {args.repeat}")
+    print(f"  scalar: {scalar * 1000:9.2f} ms  ({args.selections / scalar:,.0f} prices/s)")
+    print(f"  batch:  {batch * 1000:9.2f} ms  ({args.selections / batch:,.0f} prices/s)")
+    print(f"  speedup: {scalar / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/settlement.py
+"""
+Settlement throughput on a million synthetic bets.
+
+Compute (always): outcomes, payouts and per-user credits worked out batch by
+batch as the settlement engine does, cross-checked against a plain per-bet
+loop. Both run at hundreds of thousands of bets a second, well beyond the
+rate the database takes writes, so compute is not where settlement spends
+its time.
+
+With --uri, the writes: a sample settled the per-bet way (one status update
+and one balance $inc per bet) against every bet settled by the engine (bulk
+writes, one $inc per user per batch). Needs a MongoDB replica set for the
+transactions; it works in its own database, which is dropped first.
+
+    python -m benchmarks.settlement [--bets 1000000] [--users 50000] [--batch 5000]
+        [--uri mongodb://localhost:27017/?replicaSet=rs0] [--sample 20000]
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from services.settlement import (
+    aggregate_by_user, bet_arrays, compute_outcomes, compute_payouts, SettlementEngine,
+)
+
+MARKETS = {"match_odds": ["home", "draw", "away"], "total_goals": ["over", "under"], "btts": ["yes", "no"]}
+WINNERS = {"match_odds": ["home"], "total_goals": ["over"]}
+VOID_MARKETS = ["btts"]
+
+
+def synthetic_bets(count: int, users: int, match_id: ObjectId, seed: int = 7) -> list:
+    rng = np.random.default_rng(seed)
+    markets = list(MARKETS)
+    market_index = rng.integers(0, len(markets), count)
+    user_index = rng.integers(0, users, count)
+    user_ids = [ObjectId() for _ in range(users)]
+    amounts = rng.integers(1, 100, count).astype(float)
+    odds = np.round(rng.uniform(1.1, 6.0, count), 2)
+    picks = rng.integers(0, 6, count)
+    bets = []
+    for i in range(count):
+        market = markets[market_index[i]]
+        selections = MARKETS[market]
+        bets.append({
+            "_id": ObjectId(), "user_id": user_ids[user_index[i]], "match_id": match_id, "market": market,
+            "selection": selections[picks[i] % len(selections)], "amount": float(amounts[i]),
+            "odds": float(odds[i]), "status": "pending",
+        })
+    return bets
+
+
+def settle_loop(bets: list) -> dict:
+    """The per-bet way: decide each bet in Python and add its winnings to its user."""
+    credits = {}
+    for bet in bets:
+        market = bet["market"]
+        if market in VOID_MARKETS:
+            payout = bet["amount"]
+        elif market in WINNERS:
+            payout = bet["amount"] * bet["odds"] if bet["selection"] in WINNERS[market] else 0.0
+        else:
+            continue
+        if payout:
+            user_id = bet["user_id"]
+            credits[user_id] = credits.get(user_id, 0.0) + payout
+    return credits
+
+
+def settle_vectorized(bets: list, batch_size: int) -> dict:
+    credits = {}
+    for start in range(0, len(bets), batch_size):
+        columns = bet_arrays(bets[start:start + batch_size])
+        outcomes = compute_outcomes(columns["pairs"], columns["pair_codes"], WINNERS, VOID_MARKETS)
+        payouts = compute_payouts(outcomes, columns["amounts"], columns["odds"])
+        for user_id, amount in aggregate_by_user(columns["users"], columns["user_codes"], payouts).items():
+            credits[user_id] = credits.get(user_id, 0.0) + amount
+    return credits
+
+
+def timed(label: str, count: int, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:28} {elapsed:7.2f}s  {count / elapsed:12,.0f} bets/s")
+    return result
+
+
+async def settle_per_bet(db, bets: list):
+    """The per-bet way in the database: a status update and a balance $inc for every bet."""
+    for bet in bets:
+        market = bet["market"]
+        if market in VOID_MARKETS:
+            outcome, payout = "void", bet["amount"]
+        elif bet["selection"] in WINNERS[market]:
+            outcome, payout = "won", bet["amount"] * bet["odds"]
+        else:
+            outcome, payout = "lost", 0.0
+        await db["bets"].update_one({"_id": bet["_id"], "status": "pending"},
+                                    {"$set": {"status": outcome, "payout": payout}})
+        if payout:
+            await db["users"].update_one({"_id": bet["user_id"]}, {"$inc": {"balance": payout}})
+
+
+async def end_to_end(uri: str, bets: list, match_id: ObjectId, batch_size: int, sample: int):
+    client = AsyncIOMotorClient(uri)
+    await client.drop_database("crystalbet_settlement_bench")
+    db = client["crystalbet_settlement_bench"]
+    await db["users"].insert_many([{"_id": user_id, "balance": 0.0} for user_id in {bet["user_id"] for bet in bets}])
+    for start in range(0, len(bets), 50000):
+        await db["bets"].insert_many(bets[start:start + 50000], ordered=False)
+    await db["bets"].create_index([("match_id", 1), ("status", 1), ("_id", 1)])
+    await db.create_collection("settlements")  # Collections cannot be created inside a transaction
+
+    started = time.perf_counter()
+    await settle_per_bet(db, bets[:sample])
+    elapsed = time.perf_counter() - started
+    label = f"per-bet writes, {sample:,} bets"
+    print(f"  {label:28} {elapsed:7.2f}s  {sample / elapsed:12,.0f} bets/s")
+
+    engine = SettlementEngine(db, batch_size=batch_size)
+    started = time.perf_counter()
+    job = await engine.settle(str(match_id), WINNERS, VOID_MARKETS)
+    elapsed = time.perf_counter() - started
+    label = f"engine, {job['bets']:,} bets"
+    print(f"  {label:28} {elapsed:7.2f}s  {job['bets'] / elapsed:12,.0f} bets/s  "
+          f"(won {job['won']}, lost {job['lost']}, void {job['voided']})")
+
+    started = time.perf_counter()
+    await engine.settle(str(match_id), WINNERS, VOID_MARKETS)
+    print(f"  {'engine re-run (idempotent)':28} {time.perf_counter() - started:7.2f}s")
+    await client.drop_database("crystalbet_settlement_bench")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bets", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=5000, help="Bets per settlement batch")
+    parser.add_argument("--uri", help="Also settle the bets in this MongoDB replica set")
+    parser.add_argument("--sample", type=int, default=20000, help="Bets settled the per-bet way with --uri")
+    args = parser.parse_args()
+
+    match_id = ObjectId()
+    print(f"Generating {args.bets:,} bets from {args.users:,} users")
+    bets = synthetic_bets(args.bets, args.users, match_id)
+
+    loop = timed("per-bet loop", args.bets, lambda: settle_loop(bets))
+    vectorized = timed(f"batches of {args.batch}", args.bets, lambda: settle_vectorized(bets, args.batch))
+    assert loop.keys() == vectorized.keys()
+    assert all(abs(loop[user_id] - vectorized[user_id]) < 1e-6 for user_id in loop)
+    print(f"  {len(vectorized):,} users credited {sum(vectorized.values()):,.2f} either way")
+
+    if args.uri:
+        asyncio.run(end_to_end(args.uri, bets, match_id, args.batch, args.sample))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/wallet_debit.py
+"""
+Concurrent bet placement against a few hot wallets: bets per second and lost
+updates for the old read-check-$set debit, the atomic conditional debit and
+the group-commit queue.
+
+Needs a MongoDB replica set (transactions); it works in its own database,
+which is dropped first.
+
+    python -m benchmarks.wallet_debit [--uri mongodb://localhost:27017/?replicaSet=rs0]
+        [--users 5] [--bets 5000] [--concurrency 200] [--funded 0.8]
+"""
+
+import argparse
+import asyncio
+import time
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from schemas.match import PlaceBetRequest
+from services.bet_queue import BetCommitQueue
+from services.match import MatchService
+
+STAKE = 1.0
+
+
+async def read_check_set(db, user_id: str, bet_request: PlaceBetRequest):
+    """The previous debit: read the balance, check it in Python, then $set it."""
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            user = await db["users"].find_one({"_id": ObjectId(user_id)})
+            if not user or user["balance"] < bet_request.amount:
+                raise HTTPException(status_code=400, detail="Insufficient funds")
+            await db["bets"].insert_one({"user_id": ObjectId(user_id), "amount": bet_request.amount,
+                                         "team": bet_request.team, "status": "pending"}, session=session)
+            await db["users"].update_one({"_id": ObjectId(user_id)},
+                                         {"$set": {"balance": user["balance"] - bet_request.amount}}, session=session)
+
+
+async def run(db, place, user_ids, args) -> dict:
+    await db["bets"].delete_many({})
+    balance = args.funded * args.bets / len(user_ids) * STAKE
+    await db["users"].update_many({}, {"$set": {"balance": balance}})
+    match_id = str(ObjectId())
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcomes = {"placed": 0, "rejected": 0, "failed": 0}
+
+    async def one(i: int):
+        request = PlaceBetRequest(match_id=match_id, amount=STAKE, team="home")
+        async with semaphore:
+            try:
+                await place(user_ids[i % len(user_ids)], request)
+                outcomes["placed"] += 1
+            except HTTPException:
+                outcomes["rejected"] += 1
+            except Exception:
+                outcomes["failed"] += 1  # e.g. a write conflict that ran out of retries
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.bets)))
+    elapsed = time.perf_counter() - started
+
+    debited = balance * len(user_ids) - sum([user["balance"] async for user in db["users"].find()])
+    recorded = await db["bets"].count_documents({})
+    overdrawn = await db["users"].count_documents({"balance": {"$lt": 0}})
+    return {
+        **outcomes,
+        "seconds": elapsed,
+        "bets_per_second": outcomes["placed"] / elapsed,
+        # Bets recorded without their stake leaving a wallet
+        "lost_updates": round(recorded * STAKE - debited),
+        "overdrawn_wallets": overdrawn,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/?replicaSet=rs0")
+    parser.add_argument("--users", type=int, default=5, help="Wallets shared by all bets (fewer = more contention)")
+    parser.add_argument("--bets", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200, help="Placements in flight at once")
+    parser.add_argument("--funded", type=float, default=0.8, help="Share of the bets the wallets can cover")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.uri)
+    await client.drop_database("crystalbet_wallet_bench")
+    db = client["crystalbet_wallet_bench"]
+    await db.create_collection("bets")  # Collections cannot be created inside a transaction
+    result = await db["users"].insert_many([{"balance": 0.0} for _ in range(args.users)])
+    user_ids = [str(user_id) for user_id in result.inserted_ids]
+    service = MatchService(db["matches"], db)
+    queue = BetCommitQueue(db)
+    queue.start()
+    grouped = MatchService(db["matches"], db, bet_queue=queue)
+
+    print(f"{args.bets} bets of {STAKE} on {args.users} wallets funded for {args.funded:.0%}, "
+          f"{args.concurrency} in flight")
+    for name, place in (
+        ("read-check-$set", lambda user_id, request: read_check_set(db, user_id, request)),
+        ("atomic debit", lambda user_id, request: service.commit_bet(user_id, request, 2.0)),
+        ("group commit", lambda user_id, request: grouped.commit_bet(user_id, request, 2.0)),
+    ):
+        stats = await run(db, place, user_ids, args)
+        print(f"  {name:16} {stats['bets_per_second']:8,.0f} bets/s  placed {stats['placed']:6}  "
+              f"rejected {stats['rejected']:6}  failed {stats['failed']:5}  "
+              f"lost updates {stats['lost_updates']:6}  overdrawn wallets {stats['overdrawn_wallets']}")
+    await queue.stop()
+    await client.drop_database("crystalbet_wallet_bench")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
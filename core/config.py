@@ -55,6 +55,35 @@ class Settings(BaseSettings):
     MAIL_TLS: bool
     MAIL_SSL: bool
 
+    # Live feed settings
+    LIVE_POLL_INTERVAL: float = 1.0  # Seconds between polls when change streams are unavailable
+    LIVE_SNAPSHOT_LIMIT: int = 100  # Maximum documents held in a live snapshot
+    ODDS_DELTA_BUFFER: int = 1000  # Recent odds deltas kept for client resume
+    LIVE_SEND_QUEUE_SIZE: int = 256  # Pending messages per socket before it is resynced
+    LIVE_MAX_LAG: float = 10.0  # Seconds a socket may stay behind before it is disconnected
+    LIVE_HEARTBEAT_INTERVAL: float = 15.0  # Seconds between heartbeat pings
+    LIVE_HEARTBEAT_TIMEOUT: float = 45.0  # Seconds a ping may go unanswered before a client that sends frames is reaped
+    LIVE_BUS_BACKEND: str = "memory"  # "memory" for a single worker, "unix" to share live events across workers
+    LIVE_BUS_PATH: str = "/tmp/crystalbet-live.sock"  # Unix socket used by the "unix" live bus
+    LIVE_FEED_URL: Optional[str] = None  # External live-match feed (http(s) URL, file:// URL or local path)
+    LIVE_FEED_INTERVAL: float = 5.0  # Seconds between live feed polls
+    LIVE_FEED_TIMEOUT: float = 10.0  # HTTP timeout for a live feed request
+    ODDS_FLUSH_INTERVAL: float = 0.25  # Seconds between coalesced odds writes to Mongo
+    ODDS_FLUSH_BATCH: int = 500  # Matches with unwritten odds that force an early flush
+    CASINO_TICK_RATE: float = 2.0  # Live casino snapshots computed per second, shared by all casino sockets
+    CASHOUT_MARGIN: float = 0.05  # Share of a bet's current value kept back from its cash-out offer
+    ODDS_ACCEPT_POLICY: str = "exact"  # Price drift a bet accepts by default: "exact", "higher" or "any"
+    ODDS_DRIFT_TOLERANCE: float = 0.0  # Relative price move still treated as unchanged (0.01 = 1%)
+    INPLAY_BET_DELAY: float = 5.0  # Seconds a live bet is held before it is re-validated and placed
+    INPLAY_BET_TICK: float = 0.1  # Resolution of the in-play delay timing wheel, in seconds
+    BET_GROUP_COMMIT: bool = False  # Commit bet placements in micro-batches instead of one transaction each
+    BET_GROUP_COMMIT_INTERVAL: float = 0.005  # Seconds a micro-batch collects placements before it is committed
+    BET_GROUP_COMMIT_MAX: int = 500  # Placements that commit a micro-batch early
+    IDEMPOTENCY_TTL: int = 86400  # Seconds a stored Idempotency-Key response is replayed
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # Stored responses kept in process in front of Mongo
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 60.0  # Seconds before an unfinished claim on a key is taken over
+    SETTLEMENT_BATCH_SIZE: int = 5000  # Pending bets settled per bulk write and transaction
+
     # Pydantic v2 config (use Config class directly, no model_config)
     class Config:
         env_file = ".env"
@@ -3,16 +3,34 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from typing import Any, List
-from db.mongodb import init_db, close_db, get_collection
+from typing import Any, Optional
+from db.mongodb import init_db, close_db, get_collection, get_db
 from core.config import settings
 from logging_config import setup_logging, logger
-import asyncio
+from services.connections import ConnectionRegistry
+from services.live_bus import LiveBus, create_live_bus
+from services.live import LiveHub, query_encoding, query_topics, serve_subscriber
+from services.odds_stream import OddsStream
+from services.odds_book import OddsBook
+from services.bet_delay import BetDelayQueue
+from services.bet_queue import BetCommitQueue
+from services.idempotency import IdempotencyStore
+from services.casino_live import CasinoTicker
+from services.match_feed import LiveMatchFeed
+from services.odds_writer import OddsWriter
+from services.cashout import CashoutBook
+from services.exposure import ExposureBook
+from services.risk_limits import RiskLimits
+from services.settlement import SettlementEngine
+from services import bet as bet_listings, transaction as transaction_listings
+from utils.live_encoding import LiveFrame
+from utils.pagination import NEXT_CURSOR_HEADER, create_indexes
 import traceback,os
 
 # Import routers
 from api.auth import router as auth_router
 from api.bets import router as bet_router
+from api.cashout import router as cashout_router
 from api.match import router as match_router
 from api.users import router as user_router
 from api.admin import router as admin_router
@@ -42,45 +60,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Browsers hide response headers not listed here
 )
 
-# WebSocket connection management
-active_connections: List[WebSocket] = []
-
 # WebSocket for live updates
 @app.websocket("/ws/live")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()  # Accept the WebSocket connection
-    active_connections.append(websocket)  # Add this connection to the list
+    connections: ConnectionRegistry = websocket.app.state.connections
+    live_hub: LiveHub = websocket.app.state.live_hub
+    connection = connections.register(websocket, query_encoding(websocket))  # Own send queue, writer task and encoding
+    live_hub.subscribe(connection)  # Shared hub, no per-client queries
 
     try:
-        while True:
-            # Fetch live data asynchronously
-            live_data = await get_live_bets_data()  # Fetch data asynchronously
-            await websocket.send_json(live_data)  # Send live data to the connected client
-            
-            # Send updates every 1 second
-            await asyncio.sleep(1)
+        topics = query_topics(websocket)
+        if topics:
+            live_hub.index.subscribe(connection, topics)
+        connection.send(live_hub.snapshot(connection))
+        # Push the hub's updates and apply subscribe/unsubscribe requests until disconnect
+        await serve_subscriber(websocket, live_hub, connection)
     
     except WebSocketDisconnect:
         # Handle disconnection
-        active_connections.remove(websocket)  # Remove from active connections
         logger.info(f"Client disconnected: {websocket.client}")
     
     except Exception as e:
         logger.error(f"Error with WebSocket connection: {e}")
-        await websocket.close()  # Close the WebSocket connection
+
+    finally:
+        live_hub.unsubscribe(connection)
+        await connections.unregister(connection)  # Closes the WebSocket connection
 
 # Optionally, broadcast live data to all connected clients
-async def broadcast_live_data(data: dict):
-    # Send live data to all active WebSocket connections
-    for connection in active_connections:
-        try:
-            await connection.send_json(data)
-        except WebSocketDisconnect:
-            # Handle disconnection and clean up
-            active_connections.remove(connection)
-            logger.warning(f"Client disconnected during broadcast: {connection.client}")
+async def broadcast_live_data(data: dict, key: Optional[str] = None):
+    # Hand the payload to every worker; each encodes it once per encoding for its own connections
+    live_bus: LiveBus = app.state.live_bus
+    live_bus.publish("broadcast", {"data": data, "key": key})
 
 # Health check endpoint with MongoDB connection status
 @app.get("/health", tags=["Health"])
@@ -93,9 +108,87 @@ async def health_check():
 async def startup_db_client():
     await init_db()
     logger.info("Connected to MongoDB.")
+    app.state.connections = ConnectionRegistry()
+    await app.state.connections.start()
+    # Only the bus leader tails Mongo; every worker delivers the events to its own sockets
+    app.state.live_bus = create_live_bus()
+    await app.state.live_bus.start()
+    app.state.live_bus.subscribe(
+        "broadcast", lambda message: app.state.connections.broadcast(LiveFrame(message["data"]), message.get("key"))
+    )
+    app.state.live_hub = LiveHub("live_bets")
+    await app.state.live_hub.start(await get_db(), app.state.live_bus)
+    app.state.odds_stream = OddsStream()
+    await app.state.odds_stream.start(await get_db(), app.state.live_bus)
+    # Open bets indexed for cash-out, repriced on every odds delta this worker applies
+    app.state.cashout_book = CashoutBook()
+    await app.state.cashout_book.start(await get_db(), app.state.odds_stream.odds, app.state.live_bus)
+    app.state.odds_stream.listeners.append(app.state.cashout_book.on_odds)
+    # Status and prices of bettable matches, so placement never reads the match document
+    app.state.odds_book = OddsBook()
+    await app.state.odds_book.start(await get_db(), app.state.live_bus)
+    app.state.odds_stream.listeners.append(app.state.odds_book.on_odds)
+    app.state.idempotency = IdempotencyStore()
+    await app.state.idempotency.start(await get_db())
+    app.state.bet_queue = None
+    if settings.BET_GROUP_COMMIT:
+        app.state.bet_queue = BetCommitQueue(await get_db())
+        app.state.bet_queue.start()
+    # Stake and liability per selection, rebuilt by one aggregation and then kept incrementally
+    app.state.exposure_book = ExposureBook()
+    await app.state.exposure_book.start(await get_db(), app.state.live_bus)
+    app.state.cashout_book.exposure = app.state.exposure_book
+    app.state.risk_limits = RiskLimits(app.state.exposure_book)
+    await app.state.risk_limits.start(await get_db(), app.state.live_bus)
+    # In-play bets wait on a timing wheel and are re-validated against the odds book in batches;
+    # started after everything a parked bet is committed through, so it is stopped before them
+    app.state.bet_delay = BetDelayQueue(app.state.odds_book)
+    app.state.bet_delay.start(app.state.live_bus)
+    # Bulk settlement; jobs a stopped process left part-way are resumed by the bus leader
+    app.state.settlement = SettlementEngine(await get_db(), exposure_book=app.state.exposure_book,
+                                            cashout_book=app.state.cashout_book)
+    await app.state.settlement.start(app.state.live_bus)
+    # Compound indexes behind the keyset-paginated listings
+    for listings in (bet_listings, transaction_listings):
+        await create_indexes(await get_db(), listings.INDEXES)
+    app.state.live_matches_hub = LiveHub("matches", query={"status": "live"}, match_field="_id", channel="live_matches")
+    await app.state.live_matches_hub.start(await get_db(), app.state.live_bus)
+    app.state.margin_caches = {}  # (method, target margin, margin method) -> MarginCache for /api/admin/margins
+    app.state.casino_ticker = CasinoTicker()
+    await app.state.casino_ticker.start(await get_db(), app.state.live_bus)
+    # The external feed is polled by the bus leader only; the hubs publish what it changes
+    app.state.match_feed = None
+    if settings.LIVE_FEED_URL:
+        # Odds ticks reach subscribers at once and Mongo in coalesced batches
+        app.state.odds_writer = OddsWriter((await get_db())["matches"], app.state.odds_stream)
+        app.state.odds_book.writer = app.state.odds_writer
+        app.state.match_feed = LiveMatchFeed((await get_db())["matches"], odds_writer=app.state.odds_writer)
+        for component in (app.state.odds_writer, app.state.match_feed):
+            app.state.live_bus.on_leader(component.start)
+            if app.state.live_bus.is_leader:
+                component.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Reverse start order, so nothing is stopped while a component started after it still uses it
+    if app.state.match_feed:
+        await app.state.match_feed.stop()
+        await app.state.odds_writer.stop()
+    await app.state.casino_ticker.stop()
+    await app.state.live_matches_hub.stop()
+    await app.state.settlement.stop()
+    await app.state.bet_delay.stop()
+    await app.state.risk_limits.stop()
+    await app.state.exposure_book.stop()
+    if app.state.bet_queue:
+        await app.state.bet_queue.stop()
+    await app.state.idempotency.stop()
+    await app.state.odds_book.stop()
+    await app.state.cashout_book.stop()
+    await app.state.odds_stream.stop()
+    await app.state.live_hub.stop()
+    await app.state.live_bus.stop()
+    await app.state.connections.stop()
     await close_db()
     logger.info("MongoDB connection closed.")
 
@@ -130,6 +223,7 @@ async def get_all_content(content_collection: Any = Depends(get_content_collecti
 # Include routers
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(bet_router, prefix="/api/bets", tags=["Bets"])
+app.include_router(cashout_router, prefix="/api/bets", tags=["Bets"])
 app.include_router(match_router, prefix="/api/matches", tags=["Matches"])
 app.include_router(user_router, prefix="/api/users", tags=["User Profile"])
 app.include_router(admin_router, prefix="/api/admin", tags=["Admin CMS"])
@@ -145,14 +239,6 @@ app.include_router(main_router, tags=["General"])
 async def read_root():
     return {"message": "Welcome to the Betting Platform API!"}
 
-# Live data fetching from MongoDB (or external service)
-async def get_live_bets_data():
-    # Example: Query live bets collection in MongoDB
-    collection = await get_collection("live_bets")
-    live_bets = await collection.find().to_list(100)  # Fetch live bets data asynchronously
-    return live_bets
-
-
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))  # Default to 8000 if PORT is not set
@@ -41,6 +41,8 @@ class PlaceBetRequest(BaseModel):
     match_id: str  # Match ID the user is betting on
     odds: float  # The odds for the match at the time of betting
     amount: float  # The stake amount for the bet
+    team: Optional[str] = None  # Selection; without it only the match status is checked
+    accept_odds: Optional[str] = Field(None, pattern="^(exact|higher|any)$")  # Price changes to accept
 
     class Config:
         schema_extra = {
@@ -50,3 +52,16 @@ class PlaceBetRequest(BaseModel):
                 "amount": 100.0
             }
         }    
+
+class CashoutQuote(BaseModel):
+    bet_id: str
+    match_id: str
+    selection: str
+    stake: float
+    odds: float  # Odds taken when the bet was placed
+    current_odds: Optional[float] = None
+    available: bool  # False while the selection has no price (suspended)
+    offer: float
+
+class CashoutRequest(BaseModel):
+    offer: float  # The quoted amount the user accepts; a lower current offer is rejected
@@ -68,6 +68,8 @@ class PlaceBetRequest(BaseModel):
     match_id: str
     amount: float = Field(..., gt=0, description="Amount to bet")
     team: str = Field(..., description="The team being bet on")
+    odds: Optional[float] = Field(None, gt=1, description="Odds the client was shown; checked against the current price")
+    accept_odds: Optional[str] = Field(None, pattern="^(exact|higher|any)$", description="Price changes to accept (default from settings)")
 
     class Config:
         schema_extra = {
@@ -1,18 +1,33 @@
 import logging
-from datetime import datetime
-from typing import List, Dict, Any
+from datetime import datetime, time
+from typing import List, Dict, Any, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorCollection
 from bson import ObjectId
 from fastapi import HTTPException, status
 from schemas.bet import PlaceBetRequest  # Assuming this schema exists for bet validation
 from utils.util import validate_object_id  # Assuming a utility function for validating ObjectIds
+from utils.pagination import paginate
 
 logger = logging.getLogger(__name__)
 
+# Keyset orders of the paginated listings; each ends with _id so the key is unique
+MATCH_ORDER = [("_id", 1)]
+MATCH_DATE_ORDER = [("date", 1), ("_id", 1)]
+BET_HISTORY_ORDER = [("_id", -1)]  # Newest first; an ObjectId grows with its creation time
+
+# Compound indexes behind the listings: the filtered fields, then the sort key
+INDEXES = {
+    "matches": [[("status", 1), ("_id", 1)], MATCH_DATE_ORDER],
+    "bets": [[("user_id", 1), ("_id", -1)]],
+}
+
+Page = Tuple[List[Dict[str, Any]], Optional[str]]  # (documents, token of the next page)
+
 class MatchService:
-    def __init__(self, collection: AsyncIOMotorCollection, db):
+    def __init__(self, collection: AsyncIOMotorCollection, db, odds_book=None):
         self.collection = collection
         self.db = db
+        self.odds_book = odds_book  # In-memory match status and prices, when the app runs one
 
     async def get_live_odds_data(self) -> List[Dict[str, Any]]:
         """Fetch live odds data for matches."""
@@ -30,15 +45,22 @@ class MatchService:
             match_id = bet_request.match_id
             validate_object_id(match_id)
 
-            match = await self.collection.find_one({"_id": ObjectId(match_id)})
-            if not match or match.get("status") != "live":
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match is not available for betting.")
-            
+            if self.odds_book is not None:
+                # Status and price drift checked from memory; the match document is not read
+                odds = self.odds_book.validate(match_id, bet_request.team, bet_request.odds, ("live",),
+                                               bet_request.accept_odds)
+            else:
+                match = await self.collection.find_one({"_id": ObjectId(match_id)})
+                if not match or match.get("status") != "live":
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match is not available for betting.")
+                odds = bet_request.odds
+
             bet_data = {
                 "user_id": user_id,
                 "match_id": match_id,
                 "amount": bet_request.amount,
-                "odds": bet_request.odds,
+                "team": bet_request.team,
+                "odds": odds,
                 "placed_at": datetime.utcnow(),
                 "status": "pending"
             }
@@ -52,22 +74,22 @@ class MatchService:
             logger.error(f"Error placing bet for match {bet_request.match_id}: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error placing bet.")
 
-    async def get_all_matches(self, page: int, page_size: int) -> List[Dict[str, Any]]:
-        """Retrieve all available matches with pagination."""
+    async def get_all_matches(self, page_size: int, after: Optional[str] = None) -> Page:
+        """Retrieve all available matches, one page after the ``after`` token."""
         try:
-            skips = page_size * (page - 1)
-            matches = await self.collection.find({}).skip(skips).limit(page_size).to_list(length=page_size)
-            return matches
+            return await paginate(self.collection, {}, MATCH_ORDER, page_size, after)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching all matches: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching all matches.")
 
-    async def get_live_matches(self, page: int, page_size: int) -> List[Dict[str, Any]]:
-        """Retrieve live matches with pagination."""
+    async def get_live_matches(self, page_size: int, after: Optional[str] = None) -> Page:
+        """Retrieve live matches, one page after the ``after`` token."""
         try:
-            skips = page_size * (page - 1)
-            live_matches = await self.collection.find({"status": "live"}).skip(skips).limit(page_size).to_list(length=page_size)
-            return live_matches
+            return await paginate(self.collection, {"status": "live"}, MATCH_ORDER, page_size, after)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching live matches: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching live matches.")
@@ -93,34 +115,36 @@ class MatchService:
             logger.error(f"Error fetching matches by category {category}: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching category matches.")
 
-    async def get_todays_matches(self, page: int, page_size: int) -> List[Dict[str, Any]]:
-        """Retrieve all matches scheduled for today with pagination."""
+    async def get_todays_matches(self, page_size: int, after: Optional[str] = None) -> Page:
+        """Retrieve all matches scheduled for today, one page after the ``after`` token."""
         try:
-            today = datetime.utcnow().date()
-            skips = page_size * (page - 1)
-            todays_matches = await self.collection.find({"date": today}).skip(skips).limit(page_size).to_list(length=page_size)
-            return todays_matches
+            today = datetime.combine(datetime.utcnow().date(), time.min)  # BSON stores dates as datetimes
+            return await paginate(self.collection, {"date": today}, MATCH_DATE_ORDER, page_size, after)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching today's matches: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching today's matches.")
 
-    async def get_upcoming_matches(self, page: int, page_size: int) -> List[Dict[str, Any]]:
-        """Retrieve all upcoming matches with pagination."""
+    async def get_upcoming_matches(self, page_size: int, after: Optional[str] = None) -> Page:
+        """Retrieve all upcoming matches, soonest first, one page after the ``after`` token."""
         try:
-            today = datetime.utcnow().date()
-            skips = page_size * (page - 1)
-            upcoming_matches = await self.collection.find({"date": {"$gt": today}}).skip(skips).limit(page_size).to_list(length=page_size)
-            return upcoming_matches
+            today = datetime.combine(datetime.utcnow().date(), time.min)
+            return await paginate(self.collection, {"date": {"$gt": today}}, MATCH_DATE_ORDER, page_size, after)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching upcoming matches: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching upcoming matches.")
 
-    async def get_bet_history(self, user_id: str, page: int, page_size: int) -> List[Dict[str, Any]]:
-        """Retrieve the betting history for a user with pagination."""
+    async def get_bet_history(self, user_id: str, page_size: int, after: Optional[str] = None) -> Page:
+        """Retrieve the betting history for a user, newest first, one page after the ``after`` token."""
         try:
-            skips = page_size * (page - 1)
-            bet_history = await self.db["bets"].find({"user_id": user_id}).skip(skips).limit(page_size).to_list(length=page_size)
-            return bet_history
+            # services.match stores the user's ObjectId, place_bet above the string
+            owner = {"$in": [user_id, ObjectId(user_id)]} if ObjectId.is_valid(user_id) else user_id
+            return await paginate(self.db["bets"], {"user_id": owner}, BET_HISTORY_ORDER, page_size, after)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error fetching bet history for user {user_id}: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error fetching bet history.")
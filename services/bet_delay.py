@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from core.config import settings
+from services.connections import LiveConnection
+from services.live_bus import LiveBus
+from services.odds_book import OddsBook, price_accepted
+from utils.live_encoding import LiveFrame
+from utils.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# Places a bet that has come through the delay at the given current price; returns the placement result
+Commit = Callable[[float], Awaitable[dict]]
+
+
+class ParkedBet:
+    __slots__ = ("ticket", "user_id", "match_id", "selection", "odds", "accept", "commit", "release")
+
+    def __init__(self, ticket: str, user_id: str, match_id: str, selection: str, odds: float,
+                 accept: Optional[str], commit: Commit, release: Optional[Callable[[], None]] = None):
+        self.ticket = ticket
+        self.user_id = user_id
+        self.match_id = match_id
+        self.selection = selection
+        self.odds = odds  # Price the bet was requested at
+        self.accept = accept
+        self.commit = commit
+        self.release = release  # Called if the bet is rejected without being committed
+
+
+class BetDelayQueue:
+    """
+    In-play acceptance delay. Live bets are parked on a hashed timing wheel
+    for INPLAY_BET_DELAY seconds; one task per worker turns the wheel and,
+    for each tick, re-validates the bets that came due against the odds book,
+    places the ones still at an acceptable price and rejects the rest,
+    then notifies each user once per batch over their bets websocket.
+    Bets still parked when the queue stops are decided there and then.
+    """
+
+    def __init__(self, odds_book: OddsBook, delay: Optional[float] = None, tick: Optional[float] = None,
+                 channel: str = "bet_delay"):
+        self.odds_book = odds_book
+        self.delay = settings.INPLAY_BET_DELAY if delay is None else delay
+        self.wheel = TimingWheel(settings.INPLAY_BET_TICK if tick is None else tick)
+        self.channel = channel
+        self.bus: Optional[LiveBus] = None
+        self._watchers: Dict[str, Set[LiveConnection]] = {}  # user_id -> this worker's bets sockets
+        self._task: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()  # Batches being placed; the wheel keeps turning meanwhile
+
+    def start(self, bus: Optional[LiveBus] = None):
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.channel, self.deliver)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)  # Let batches being placed finish
+        # Bets still parked are decided now rather than dropped: their users were told they are pending,
+        # and any risk-limit headroom they reserve must be given back
+        parked = self.wheel.drain()
+        if parked:
+            logger.info(f"Deciding {len(parked)} bets still in the in-play delay at shutdown")
+            await self._process_batch(parked)
+
+    def __len__(self) -> int:
+        return len(self.wheel)
+
+    def park(self, user_id: str, match_id: str, selection: str, odds: float, accept: Optional[str],
+             commit: Commit, delay: Optional[float] = None, release: Optional[Callable[[], None]] = None) -> dict:
+        """
+        Hold a live bet for the delay; ``commit`` places it if it is still
+        acceptable then, ``release`` is called instead if it is not.
+        """
+        ticket = uuid.uuid4().hex
+        bet = ParkedBet(ticket, str(user_id), str(match_id), selection, odds, accept, commit, release)
+        self.wheel.schedule(ticket, bet, self.delay if delay is None else delay)
+        return {"ticket": ticket, "status": "Bet pending in-play delay", "delay": self.delay if delay is None else delay}
+
+    def watch(self, user_id: str, connection: LiveConnection):
+        self._watchers.setdefault(str(user_id), set()).add(connection)
+
+    def unwatch(self, user_id: str, connection: LiveConnection):
+        connections = self._watchers.get(str(user_id))
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._watchers[str(user_id)]
+
+    async def _run(self):
+        """Turn the wheel on the monotonic clock, catching up on any ticks the loop was late for."""
+        started = time.monotonic()
+        turned = 0
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            due = int((time.monotonic() - started) / self.wheel.tick) - turned
+            if due <= 0:
+                continue
+            turned += due
+            expired = self.wheel.advance(due)
+            if expired:
+                batch = asyncio.create_task(self._process_batch(expired))
+                self._batches.add(batch)
+                batch.add_done_callback(self._batches.discard)
+
+    async def _process_batch(self, bets: List[ParkedBet]):
+        try:
+            await self.process(bets)
+        except Exception as e:
+            logger.error(f"In-play delay batch of {len(bets)} bets failed: {e}")
+
+    async def process(self, bets: List[ParkedBet]):
+        """Re-validate a batch from the odds book, place the acceptable bets together and notify."""
+        results: Dict[str, List[dict]] = {}
+        accepted = []
+        for bet in bets:
+            price, rejection = self.revalidate(bet)
+            if rejection is None:
+                accepted.append((bet, price))
+            else:
+                if bet.release is not None:
+                    bet.release()
+                results.setdefault(bet.user_id, []).append(rejection)
+        placed = await asyncio.gather(*(bet.commit(price) for bet, price in accepted), return_exceptions=True)
+        for (bet, _), result in zip(accepted, placed):
+            if isinstance(result, Exception):
+                detail = result.detail if isinstance(result, HTTPException) else "Error placing bet."
+                results.setdefault(bet.user_id, []).append(
+                    {"ticket": bet.ticket, "status": "rejected", "detail": detail})
+            else:
+                results.setdefault(bet.user_id, []).append(
+                    {"ticket": bet.ticket, "status": "accepted", "bet_id": result.get("bet_id")})
+        for user_id, user_results in results.items():
+            self._publish({"user_id": user_id, "results": user_results})
+
+    def revalidate(self, bet: ParkedBet) -> Tuple[Optional[float], Optional[dict]]:
+        """(current price, None) if the bet can still be placed, else (price, its rejection)."""
+        current = self.odds_book.get(bet.match_id)
+        if current is None or current[0] != "live":
+            return None, {"ticket": bet.ticket, "status": "rejected", "detail": "Match not available for betting"}
+        price = current[1].get(bet.selection)
+        if price is None or not price_accepted(bet.odds, price, bet.accept):
+            return price, {"ticket": bet.ticket, "status": "rejected", "detail": "Odds have changed", "odds": price}
+        return price, None
+
+    def _publish(self, message: dict):
+        # The user's bets socket may be held by another worker
+        if self.bus is None:
+            self.deliver(message)
+        else:
+            self.bus.publish(self.channel, message)
+
+    def deliver(self, message: dict):
+        connections = self._watchers.get(message["user_id"])
+        if not connections:
+            return
+        frame = LiveFrame({"type": "bets", "results": message["results"]})
+        for connection in connections:
+            connection.send(frame)
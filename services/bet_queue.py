@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Attempts at a whole batch before its bets are committed one by one
+BATCH_ATTEMPTS = 3
+
+
+class BalanceChanged(Exception):
+    """A wallet no longer covers its debit (it moved since the batch read it); the transaction is aborted."""
+
+
+class BetCommitQueue:
+    """
+    Group commit for bet placement. Validated bets are queued in process and
+    committed in micro-batches every BET_GROUP_COMMIT_INTERVAL seconds (or
+    as soon as BET_GROUP_COMMIT_MAX are waiting): one read of the batch's
+    balances, funds checked in memory in arrival order, then one transaction
+    with an ``insert_many`` of the bets and one ``bulk_write`` of per-user
+    debits. Each caller awaits a future resolved with its own result.
+
+    Each debit is still conditional (balance >= the user's total), so a
+    wallet drained elsewhere since the read aborts the batch, which is
+    retried with fresh balances; after BATCH_ATTEMPTS the bets are committed
+    as batches of one, where a failed debit means insufficient funds.
+    """
+
+    def __init__(self, db: Any, interval: Optional[float] = None, max_batch: Optional[int] = None):
+        self.db = db
+        self.interval = settings.BET_GROUP_COMMIT_INTERVAL if interval is None else interval
+        self.max_batch = max_batch or settings.BET_GROUP_COMMIT_MAX
+        self._queue: List[Tuple[dict, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit what is queued, then stop."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue:
+            await self.flush()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def submit(self, bet: dict) -> ObjectId:
+        """Queue a validated bet document (with ``user_id`` and ``amount``); resolves to its _id once committed."""
+        bet.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((bet, future))
+        if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._queue) < self.max_batch:
+                # Let the batch fill for one interval; a full batch wakes us early
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            while self._queue:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Bet group commit failed: {e}")
+
+    async def flush(self):
+        """Commit up to one batch of queued bets."""
+        batch, self._queue = self._queue[: self.max_batch], self._queue[self.max_batch:]
+        pending = [(bet, future) for bet, future in batch if not future.cancelled()]
+        for attempt in range(BATCH_ATTEMPTS):
+            try:
+                await self._commit(pending)
+                return
+            except BalanceChanged:
+                logger.info(f"Bet batch of {len(pending)} hit a concurrent debit, retry {attempt + 1}")
+            except Exception as e:
+                self._fail(pending, e)
+                return
+        for item in pending:
+            try:
+                await self._commit([item])
+            except BalanceChanged:
+                self._fail([item], HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds"))
+            except Exception as e:
+                self._fail([item], e)
+
+    async def _commit(self, batch: List[Tuple[dict, asyncio.Future]]):
+        # One read for every wallet in the batch, then funds are checked in arrival order
+        user_ids = list({bet["user_id"] for bet, _ in batch})
+        balances: Dict[Any, float] = {
+            user["_id"]: user.get("balance", 0)
+            async for user in self.db["users"].find({"_id": {"$in": user_ids}}, {"balance": 1})
+        }
+        available = dict(balances)
+        accepted, rejected = [], []
+        for bet, future in batch:
+            if available.get(bet["user_id"], 0) >= bet["amount"]:
+                available[bet["user_id"]] -= bet["amount"]
+                accepted.append((bet, future))
+            else:
+                rejected.append((bet, future))
+        debits = {user_id: balances[user_id] - left for user_id, left in available.items() if balances[user_id] != left}
+
+        if accepted:
+            async def insert_and_debit(session):
+                await self.db["bets"].insert_many([dict(bet) for bet, _ in accepted], session=session)
+                result = await self.db["users"].bulk_write([
+                    # Conditional, so a wallet debited elsewhere since the read is never overdrawn
+                    UpdateOne({"_id": user_id, "balance": {"$gte": amount}}, {"$inc": {"balance": -amount}})
+                    for user_id, amount in debits.items()
+                ], ordered=False, session=session)
+                if result.matched_count < len(debits):
+                    raise BalanceChanged()
+
+            async with await self.db.client.start_session() as session:
+                await session.with_transaction(insert_and_debit)
+
+        for bet, future in accepted:
+            if not future.done():
+                future.set_result(bet["_id"])
+        self._fail(rejected, HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds"))
+
+    @staticmethod
+    def _fail(batch: List[Tuple[dict, asyncio.Future]], error: Exception):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,271 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from fastapi import HTTPException, status
+from core.config import settings
+from services.live_bus import LiveBus
+
+logger = logging.getLogger(__name__)
+
+# Slots a selection's arrays start with before they first double
+INITIAL_CAPACITY = 8
+
+
+class _SelectionBets:
+    """
+    Open bets on one selection of one match, as parallel arrays for vectorized
+    repricing. The arrays double in capacity as bets arrive; the first
+    len(bet_ids) entries are in use.
+    """
+
+    __slots__ = ("bet_ids", "positions", "_payouts", "_offers", "price")
+
+    def __init__(self, price: Optional[float] = None):
+        self.bet_ids: List[str] = []
+        self.positions: Dict[str, int] = {}  # bet_id -> index in the arrays
+        self._payouts = np.empty(INITIAL_CAPACITY)  # stake * odds taken, per bet
+        self._offers = np.empty(INITIAL_CAPACITY)
+        self.price = price  # Current odds of the selection
+
+    @property
+    def payouts(self) -> np.ndarray:
+        return self._payouts[:len(self.bet_ids)]
+
+    @property
+    def offers(self) -> np.ndarray:
+        return self._offers[:len(self.bet_ids)]
+
+    def extend(self, bet_ids: List[str], payouts: List[float], factor: float):
+        """Append bets in bulk and price only the new ones, at the current price."""
+        start = len(self.bet_ids)
+        end = start + len(bet_ids)
+        if end > len(self._payouts):
+            capacity = max(end, 2 * len(self._payouts))
+            for name in ("_payouts", "_offers"):
+                grown = np.empty(capacity)
+                grown[:start] = getattr(self, name)[:start]
+                setattr(self, name, grown)
+        self.positions.update(zip(bet_ids, range(start, end)))
+        self.bet_ids.extend(bet_ids)
+        self._payouts[start:end] = payouts
+        self._offers[start:end] = self._offer(self._payouts[start:end], factor)
+
+    def add(self, bet_id: str, payout: float, factor: float):
+        self.extend([bet_id], [payout], factor)
+
+    def remove(self, bet_id: str):
+        """Swap-remove, so only the moved bet's position changes and no offer is recomputed."""
+        index = self.positions.pop(bet_id)
+        last = len(self.bet_ids) - 1
+        if index != last:
+            moved = self.bet_ids[last]
+            self.bet_ids[index] = moved
+            self.positions[moved] = index
+            self._payouts[index] = self._payouts[last]
+            self._offers[index] = self._offers[last]
+        self.bet_ids.pop()
+
+    def reprice(self, price: Optional[float], factor: float):
+        """Recompute every offer on this selection in one pass."""
+        self.price = price
+        count = len(self.bet_ids)
+        self._offers[:count] = self._offer(self._payouts[:count], factor)
+
+    def _offer(self, payouts: np.ndarray, factor: float) -> np.ndarray:
+        if self.price is None or self.price <= 1.0:
+            return np.zeros(len(payouts))
+        return payouts * (factor / self.price)
+
+
+class CashoutBook:
+    """
+    Open (pending) bets indexed in memory by match and selection, with a
+    cash-out offer per bet that is recomputed, one vectorized pass per
+    selection, whenever that match's odds change. Quotes are O(1) reads.
+
+    The offer is the bet's potential payout at the current price, less the
+    CASHOUT_MARGIN: stake * odds taken / current odds * (1 - margin).
+    Bets placed or closed on any worker reach every worker over the live bus.
+    """
+
+    def __init__(self, margin: Optional[float] = None, channel: str = "open_bets"):
+        self.margin = settings.CASHOUT_MARGIN if margin is None else margin
+        self.channel = channel
+        self.bus: Optional[LiveBus] = None
+        self.odds: Dict[str, Dict[str, float]] = {}  # Live odds board (shared with the odds stream)
+        self._bets: Dict[str, Tuple[str, str, dict]] = {}  # bet_id -> (match_id, selection, bet)
+        self._selections: Dict[str, Dict[str, _SelectionBets]] = {}  # match_id -> selection -> bets
+        self._accepting: set = set()  # Bets with a cash-out being written
+        self.exposure = None  # ExposureBook to take cashed-out bets off, if any
+
+    @property
+    def factor(self) -> float:
+        return 1.0 - self.margin
+
+    async def start(self, db: Any, odds: Dict[str, Dict[str, float]], bus: Optional[LiveBus] = None):
+        """
+        Load every open bet with one query and follow placements from the bus.
+        Bets are gathered per selection first, so each selection's arrays are
+        filled and priced once.
+        """
+        self.odds = odds
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.channel, self.apply)
+        cursor = db["bets"].find({"status": "pending"}, {"match_id": 1, "team": 1, "selection": 1,
+                                                         "amount": 1, "odds": 1, "user_id": 1})
+        loaded: Dict[Tuple[str, str], List[dict]] = {}
+        async for bet in cursor:
+            bet = bet_document(bet)
+            if bet["odds"] is not None and bet["selection"] is not None:
+                loaded.setdefault((bet["match_id"], bet["selection"]), []).append(bet)
+        for (match_id, selection), bets in loaded.items():
+            bets = [bet for bet in bets if bet["bet_id"] not in self._bets]  # Unless the bus got there first
+            for bet in bets:
+                self._bets[bet["bet_id"]] = (match_id, selection, bet)
+            self._group(match_id, selection).extend(
+                [bet["bet_id"] for bet in bets], [bet["amount"] * bet["odds"] for bet in bets], self.factor)
+        logger.info(f"Cash-out book loaded {len(self._bets)} open bets")
+
+    async def stop(self):
+        """Drop the book; the next start loads it again from Mongo."""
+        self._bets.clear()
+        self._selections.clear()
+
+    def __len__(self) -> int:
+        return len(self._bets)
+
+    # Changes from this worker go through the bus so every worker applies them
+    def track(self, bet: dict):
+        self._emit({"op": "add", "bet": bet_document(bet)})
+
+    def close(self, bet_id: str):
+        self._emit({"op": "remove", "bet_id": str(bet_id)})
+
+    def close_many(self, bet_ids: List[str]):
+        """Take settled bets off the book with one event."""
+        self._emit({"op": "remove_many", "bet_ids": [str(bet_id) for bet_id in bet_ids]})
+
+    def _emit(self, event: dict):
+        if self.bus is None:
+            self.apply(event)
+        else:
+            self.bus.publish(self.channel, event)
+
+    def apply(self, event: dict):
+        if event["op"] == "add":
+            self._add(event["bet"])
+        elif event["op"] == "remove":
+            self._remove(event["bet_id"])
+        elif event["op"] == "remove_many":
+            for bet_id in event["bet_ids"]:
+                self._remove(bet_id)
+
+    def _add(self, bet: dict):
+        if bet["odds"] is None or bet["selection"] is None or bet["bet_id"] in self._bets:
+            return  # Bets without the odds taken cannot be valued
+        match_id, selection = bet["match_id"], bet["selection"]
+        self._group(match_id, selection).add(bet["bet_id"], bet["amount"] * bet["odds"], self.factor)
+        self._bets[bet["bet_id"]] = (match_id, selection, bet)
+
+    def _group(self, match_id: str, selection: str) -> _SelectionBets:
+        """A selection's bets, created at the selection's current price."""
+        groups = self._selections.setdefault(match_id, {})
+        group = groups.get(selection)
+        if group is None:
+            group = groups[selection] = _SelectionBets(self.odds.get(match_id, {}).get(selection))
+        return group
+
+    def _remove(self, bet_id: str):
+        entry = self._bets.pop(bet_id, None)
+        if entry is None:
+            return
+        match_id, selection, _ = entry
+        group = self._selections[match_id][selection]
+        group.remove(bet_id)
+        if not group.bet_ids:
+            del self._selections[match_id][selection]
+            if not self._selections[match_id]:
+                del self._selections[match_id]
+
+    def on_odds(self, match_id: str, odds: Optional[Dict[str, float]]):
+        """Odds stream hook: reprice every open bet on the match, one vectorized pass per selection."""
+        for selection, group in self._selections.get(match_id, {}).items():
+            group.reprice((odds or {}).get(selection), self.factor)
+
+    def quote(self, bet_id: str) -> Optional[dict]:
+        """Current cash-out offer for an open bet, or None if it is not open here."""
+        entry = self._bets.get(str(bet_id))
+        if entry is None:
+            return None
+        match_id, selection, bet = entry
+        group = self._selections[match_id][selection]
+        offer = float(group.offers[group.positions[bet["bet_id"]]])
+        return {
+            "bet_id": bet["bet_id"],
+            "user_id": bet["user_id"],
+            "match_id": match_id,
+            "selection": selection,
+            "stake": bet["amount"],
+            "odds": bet["odds"],
+            "current_odds": group.price,
+            "available": offer > 0,
+            "offer": round(offer, 2),
+        }
+
+    async def accept(self, db: Any, bet_id: str, user_id: str, expected_offer: float) -> dict:
+        """
+        Cash a bet out at ``expected_offer`` if the current quote still covers it.
+        The quote check and the claim on the bet happen without yielding, so no
+        odds tick or second request can slip in between; the bet is then closed
+        only if it is still pending in Mongo, and the user credited, in one transaction.
+        """
+        bet_id = str(bet_id)
+        quote = self.quote(bet_id)
+        if quote is None or bet_id in self._accepting or quote["user_id"] != str(user_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No cash-out available for this bet")
+        if not quote["available"]:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cash-out is suspended for this bet")
+        if quote["offer"] < round(expected_offer, 2):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Cash-out offer has changed", "offer": quote["offer"]},
+            )
+        amount = quote["offer"]
+        self._accepting.add(bet_id)
+        try:
+            async with await db.client.start_session() as session:
+                async with session.start_transaction():
+                    closed = await db["bets"].find_one_and_update(
+                        {"_id": ObjectId(bet_id), "status": "pending"},
+                        {"$set": {"status": "cashed_out", "cashout_amount": amount}},
+                        session=session,
+                    )
+                    if closed is None:
+                        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Bet is no longer open")
+                    await db["users"].update_one(
+                        {"_id": closed["user_id"] if isinstance(closed["user_id"], ObjectId) else ObjectId(closed["user_id"])},
+                        {"$inc": {"balance": amount}},
+                        session=session,
+                    )
+        finally:
+            self._accepting.discard(bet_id)
+        self.close(bet_id)
+        if self.exposure is not None:
+            self.exposure.remove({"match_id": quote["match_id"], "user_id": quote["user_id"],
+                                  "selection": quote["selection"], "amount": quote["stake"], "odds": quote["odds"]})
+        return {"bet_id": bet_id, "status": "cashed_out", "amount": amount}
+
+
+def bet_document(bet: dict) -> dict:
+    """The fields the cash-out book keeps for a bet, with ids as strings."""
+    odds = bet.get("odds")
+    return {
+        "bet_id": str(bet.get("bet_id") or bet["_id"]),
+        "user_id": str(bet.get("user_id")),
+        "match_id": str(bet.get("match_id")),
+        "selection": bet.get("selection") or bet.get("team"),
+        "amount": float(bet.get("amount") or 0),
+        "odds": float(odds) if odds is not None else None,
+    }
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from pymongo.errors import PyMongoError
+from core.config import settings
+from services.connections import LiveConnection
+from services.live import CollectionTailer
+from utils.live_encoding import LiveFrame
+
+logger = logging.getLogger(__name__)
+
+
+class CasinoTicker(CollectionTailer):
+    """
+    Live casino state on a fixed tick. The leader reads ``casino_games`` once
+    per tick, whatever the number of sockets, and emits a new versioned
+    snapshot only when the live games changed. Every worker shares that one
+    frame across its casino sockets and skips sockets that already have it.
+    """
+
+    def __init__(self, tick_rate: Optional[float] = None, limit: int = 10):
+        tick_rate = tick_rate or settings.CASINO_TICK_RATE
+        super().__init__("casino_games", poll_interval=1.0 / tick_rate, channel="casino_live")
+        self.limit = limit
+        self.version = 0
+        self.frame: Optional[LiveFrame] = None
+        self._sent: Dict[LiveConnection, int] = {}  # connection -> version of the last frame queued
+        # Leader side: last emitted snapshot, for change detection
+        self._source: Optional[str] = None
+        self._source_version = 0
+
+    def subscribe(self, connection: LiveConnection):
+        self._sent[connection] = -1
+        self.send(connection)
+
+    def unsubscribe(self, connection: LiveConnection):
+        self._sent.pop(connection, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._sent)
+
+    def send(self, connection: LiveConnection):
+        """Queue the current snapshot unless the connection already has it."""
+        if self.frame is None or self._sent.get(connection) == self.version:
+            return
+        self._sent[connection] = self.version
+        # Keyed, so a slow socket only ever holds the newest snapshot
+        connection.send(self.frame, key="casino")
+
+    def apply(self, event: dict):
+        if event["version"] <= self.version:
+            return
+        self.version = event["version"]
+        self.frame = LiveFrame(event["games"])
+        for connection in list(self._sent):
+            self.send(connection)
+
+    async def bootstrap(self):
+        # Version 0: any snapshot from the leader supersedes it
+        self.frame = LiveFrame(await self.fetch())
+
+    def promote(self):
+        self._source_version = max(self._source_version, self.version)
+
+    async def fetch(self) -> List[Any]:
+        return await self.collection.find({"status": "live"}).to_list(length=self.limit)
+
+    async def refresh(self):
+        """Leader side: one query per tick, emitted only when the snapshot changed."""
+        games = await self.fetch()
+        encoded = json.dumps(games, default=str)
+        if encoded == self._source:
+            return
+        self._source = encoded
+        self._source_version += 1
+        self.emit({"version": self._source_version, "games": games})
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                await self.refresh()
+            except PyMongoError as e:
+                logger.error(f"Casino tick failed: {e}")
+            # Fixed rate: a slow query eats into the wait rather than stretching the tick
+            await asyncio.sleep(max(0.0, self.poll_interval - (loop.time() - started)))
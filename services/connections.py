@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import WebSocket
+from core.config import settings
+from utils.live_encoding import DEFAULT_ENCODING, LiveFrame
+
+logger = logging.getLogger(__name__)
+
+# Sent on every heartbeat; clients answer with {"action": "pong"}
+PING_MESSAGE = LiveFrame({"type": "ping"})
+# Close reason for a client whose queue overflowed on a stream that cannot be resynced in place
+OVERFLOW_REASON = "Send queue overflow; reconnect to resync"
+
+
+class LiveConnection:
+    """
+    One accepted websocket with its own bounded outbound queue and writer task,
+    so a stalled client only ever delays itself.
+
+    Messages sent with a key replace any pending message with the same key
+    (only the latest state per key is worth delivering); messages without a key
+    are always delivered in order. ``LiveFrame`` messages are written in the
+    encoding the client negotiated, reusing bytes already encoded for others.
+
+    When the queue overflows, ``on_overflow`` resyncs the client if the stream
+    can be reset; without one the connection is closed, since dropping a
+    message (a bet result, say) would leave the client silently out of date.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket: WebSocket, encoding: str = DEFAULT_ENCODING,
+                 max_queue: Optional[int] = None, max_lag: Optional[float] = None):
+        self.id = next(self._ids)
+        self.websocket = websocket
+        self.encoding = encoding
+        self.max_queue = max_queue or settings.LIVE_SEND_QUEUE_SIZE
+        self.max_lag = max_lag or settings.LIVE_MAX_LAG
+        self.last_seen = time.monotonic()
+        self.heard_from = False  # Whether the client has ever sent a frame (and so answers pings)
+        self.ping_sent: Optional[float] = None  # When the oldest ping no frame has answered yet went out
+        self.closed = asyncio.Event()
+        self.on_overflow: Optional[Callable[["LiveConnection"], None]] = None
+        self._pending: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._unkeyed = itertools.count()
+        self._inflight_since: Optional[float] = None  # Enqueue time of the message being written
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, message: Any, key: Optional[Hashable] = None):
+        """Queue a message without waiting for the socket."""
+        if self.closed.is_set() or self._closing is not None:
+            return
+        now = time.monotonic()
+        if key is None:
+            key = ("_", next(self._unkeyed))
+            self._pending[key] = (message, now)
+        elif key in self._pending:
+            # Coalesce: keep the queue position and age, replace the payload
+            self._pending[key] = (message, self._pending[key][1])
+        else:
+            self._pending[key] = (message, now)
+        if len(self._pending) > self.max_queue:
+            self._overflow()
+        self._ready.set()
+
+    def reset(self, message: Any):
+        """Drop everything pending and queue a single resync message instead."""
+        self._pending.clear()
+        self.send(message)
+
+    @property
+    def lag(self) -> float:
+        """Age in seconds of the oldest message not yet written, including one stuck mid-send."""
+        oldest = self._inflight_since
+        if self._pending:
+            queued_at = next(iter(self._pending.values()))[1]
+            oldest = queued_at if oldest is None else min(oldest, queued_at)
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def touch(self):
+        """Record that the client is alive (any inbound frame counts, and answers every ping so far)."""
+        self.last_seen = time.monotonic()
+        self.heard_from = True
+        self.ping_sent = None
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self._pending.clear()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), timeout=1.0)
+        except Exception:
+            pass  # Already gone or too stalled to take a close frame
+
+    def _overflow(self):
+        if self.on_overflow is not None:
+            self.on_overflow(self)
+        else:
+            logger.warning(f"Closing live connection {self.id}: send queue overflowed")
+            self._pending.clear()  # Nothing more is written; the client reconnects and starts afresh
+            self._closing = asyncio.ensure_future(self.close(code=1008, reason=OVERFLOW_REASON))
+
+    async def _write(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    _, (message, self._inflight_since) = self._pending.popitem(last=False)
+                    if isinstance(message, LiveFrame):
+                        message = message.encode(self.encoding)
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                    self._inflight_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Live connection {self.id} writer stopped: {e}")
+            await self.close()
+
+
+class EventStreamChannel:
+    """
+    Stands in for the websocket of a ``LiveConnection`` serving a Server-Sent
+    Events response: the connection writer hands over each encoded record and
+    the response body yields them. Holding one record at a time keeps a slow
+    HTTP client's backlog in the connection queue, where it is coalesced and
+    counted as lag like any websocket's.
+    """
+
+    def __init__(self):
+        self._records: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=1)
+
+    async def send_text(self, text: str):
+        await self._records.put(text)
+
+    async def send_bytes(self, data: bytes):
+        await self._records.put(data.decode())
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None):
+        while not self._records.empty():
+            self._records.get_nowait()
+        self._records.put_nowait(None)  # Ends the response body
+
+    async def records(self, connection: LiveConnection) -> AsyncIterator[str]:
+        while True:
+            record = await self._records.get()
+            if record is None:
+                return
+            yield record
+            connection.touch()  # The client reads its stream; there is no inbound frame to wait for
+
+
+class ConnectionRegistry:
+    """
+    Every live websocket in this process, keyed by connection id for O(1)
+    removal. A single heartbeat task pings clients, reaps ones that stopped
+    answering and disconnects ones whose outbound queue lags too far behind.
+
+    Only clients that have sent at least one frame are reaped for leaving a
+    ping unanswered; a listen-only client is never expected to answer, and if
+    it has gone away its queue backs up and the lag check disconnects it.
+    """
+
+    def __init__(self, heartbeat_interval: Optional[float] = None, heartbeat_timeout: Optional[float] = None):
+        self.heartbeat_interval = heartbeat_interval or settings.LIVE_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = heartbeat_timeout or settings.LIVE_HEARTBEAT_TIMEOUT
+        self.connections: Dict[int, LiveConnection] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(*(connection.close(code=1001) for connection in self.connections.values()))
+        self.connections.clear()
+
+    def register(self, websocket: WebSocket, encoding: str = DEFAULT_ENCODING) -> LiveConnection:
+        connection = LiveConnection(websocket, encoding)
+        self.connections[connection.id] = connection
+        connection.start()
+        return connection
+
+    async def unregister(self, connection: LiveConnection, code: int = 1000):
+        self.connections.pop(connection.id, None)
+        await connection.close(code=code)
+
+    def broadcast(self, message: Any, key: Optional[Hashable] = None):
+        """Queue a message on every connection; never waits on a socket."""
+        for connection in self.connections.values():
+            connection.send(message, key)
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    async def sweep(self):
+        """Reap dead or hopelessly lagging connections, then ping the rest."""
+        now = time.monotonic()
+        closing = []
+        for connection in list(self.connections.values()):
+            if (connection.heard_from and connection.ping_sent is not None
+                    and now - connection.ping_sent > self.heartbeat_timeout):
+                logger.info(f"Reaping live connection {connection.id}: ping unanswered")
+                closing.append(self.unregister(connection))
+            elif connection.lag > connection.max_lag:
+                logger.warning(f"Disconnecting slow live connection {connection.id}: {connection.lag:.1f}s behind")
+                closing.append(self.unregister(connection, code=1008))
+            else:
+                connection.send(PING_MESSAGE, key="ping")
+                if connection.ping_sent is None:
+                    connection.ping_sent = now
+        # Each close may wait up to a second on a stalled socket; do them together
+        await asyncio.gather(*closing)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Live heartbeat sweep failed: {e}")
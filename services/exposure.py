@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+from services.live_bus import LiveBus
+
+logger = logging.getLogger(__name__)
+
+# Bets without a market field are on the match odds ({selection: price} on the match)
+DEFAULT_MARKET = "match_odds"
+
+Key = Tuple[str, str, str]  # (match_id, market, selection)
+
+
+class ExposureBook:
+    """
+    Stake, liability and bet count of the open (pending) bets per match,
+    market and selection, plus open stake and potential payout per user,
+    kept in memory so every read is O(1).
+
+    Liability is what the book pays out beyond the stakes if the selection
+    wins: stake * (odds - 1) summed over its bets. ``net`` nets that against
+    the stakes taken on the market's other selections.
+
+    Built from Mongo with one aggregation at startup and kept current by
+    placement, cash-out, settlement and void. A change is applied on the worker
+    making it straight away, then on every other worker over the live bus.
+    After a bus reconnect, when changes may have been lost either way, every
+    worker rebuilds from Mongo.
+    """
+
+    def __init__(self, channel: str = "exposure"):
+        self.channel = channel
+        self.bus: Optional[LiveBus] = None
+        self.origin = uuid.uuid4().hex  # Tags this book's events, which it has already applied
+        self._db: Any = None
+        self._replays: List[List[dict]] = []  # Events received while each running rebuild aggregates
+        self._resync_task: Optional[asyncio.Task] = None
+        self._resync_wanted = False
+        self._selections: Dict[Key, List[float]] = {}  # key -> [stake, liability, bets]
+        self._markets: Dict[Tuple[str, str], Set[str]] = {}  # (match_id, market) -> selections with open bets
+        self._market_stakes: Dict[Tuple[str, str], float] = {}  # (match_id, market) -> total stake
+        self._users: Dict[str, List[float]] = {}  # user_id -> [stake, potential payout, bets]
+
+    async def start(self, db: Any, bus: Optional[LiveBus] = None):
+        self.bus = bus
+        self._db = db
+        if bus is not None:
+            bus.subscribe(self.channel, self._on_event)
+            bus.on_reconnect(self._on_reconnect)
+        await self.rebuild(db)
+
+    async def stop(self):
+        """Drop the book; the next start rebuilds it from Mongo."""
+        if self._resync_task:
+            self._resync_task.cancel()
+            try:
+                await self._resync_task
+            except asyncio.CancelledError:
+                pass
+            self._resync_task = None
+        self._clear()
+
+    def _clear(self):
+        self._selections.clear()
+        self._markets.clear()
+        self._market_stakes.clear()
+        self._users.clear()
+
+    async def rebuild(self, db: Any):
+        """
+        Replace the book with two streamed aggregations over the pending bets,
+        one grouped by selection and one by user. Each group comes back as its
+        own document, so the book is not bound by the 16MB document limit.
+
+        The aggregations fill a fresh book while this one keeps serving reads
+        and applying changes. Changes received meanwhile are also buffered and
+        replayed onto the fresh book before it is swapped in.
+        """
+        odds = {"$ifNull": ["$odds", 1]}
+        by_selection = [
+            {"$match": {"status": "pending"}},
+            {"$group": {
+                "_id": {
+                    "match_id": "$match_id",
+                    "market": {"$ifNull": ["$market", DEFAULT_MARKET]},
+                    "selection": {"$ifNull": ["$selection", "$team"]},
+                },
+                "stake": {"$sum": "$amount"},
+                "liability": {"$sum": {"$multiply": ["$amount", {"$subtract": [odds, 1]}]}},
+                "bets": {"$sum": 1},
+            }},
+        ]
+        by_user = [
+            {"$match": {"status": "pending"}},
+            {"$group": {
+                "_id": "$user_id",
+                "stake": {"$sum": "$amount"},
+                "payout": {"$sum": {"$multiply": ["$amount", odds]}},
+                "bets": {"$sum": 1},
+            }},
+        ]
+        replay: List[dict] = []
+        self._replays.append(replay)
+        try:
+            fresh = ExposureBook(self.channel)
+            async for row in db["bets"].aggregate(by_selection, allowDiskUse=True):
+                group = row["_id"]
+                if group.get("selection") is None:
+                    continue
+                key = (str(group["match_id"]), group["market"], group["selection"])
+                fresh._change(key, row["stake"], row["liability"], row["bets"])
+            async for row in db["bets"].aggregate(by_user, allowDiskUse=True):
+                fresh._users[str(row["_id"])] = [row["stake"], row["payout"], row["bets"]]
+        finally:
+            self._replays.remove(replay)
+        for event in replay:
+            fresh.apply(event)
+        self._selections, self._markets = fresh._selections, fresh._markets
+        self._market_stakes, self._users = fresh._market_stakes, fresh._users
+        logger.info(f"Exposure book loaded {len(self._selections)} selections and {len(self._users)} users")
+
+    def resync(self):
+        """Rebuild from Mongo in the background; requests made while one runs coalesce into one more."""
+        self._resync_wanted = True
+        if self._resync_task is None or self._resync_task.done():
+            self._resync_task = asyncio.create_task(self._resync())
+
+    async def _resync(self):
+        while self._resync_wanted:
+            self._resync_wanted = False
+            try:
+                await self.rebuild(self._db)
+            except Exception as e:
+                logger.error(f"Exposure book resync failed: {e}")
+
+    def _on_reconnect(self):
+        # This worker missed the other workers' changes, and they missed the ones it made meanwhile
+        self.resync()
+        self.bus.publish(self.channel, {"op": "resync", "origin": self.origin})
+
+    def _on_event(self, event: dict):
+        if event["op"] == "resync":
+            if event.get("origin") != self.origin:
+                self.resync()
+        elif event.get("origin") != self.origin:
+            self._receive(event)
+
+    def _receive(self, event: dict):
+        for replay in self._replays:
+            replay.append(event)
+        self.apply(event)
+
+    # Changes from this worker apply here at once, and go through the bus so every other worker applies them
+    def add(self, bet: dict):
+        """An accepted bet."""
+        self._emit(bet, 1)
+
+    def remove(self, bet: dict):
+        """A bet leaving the book: settled, voided or cashed out."""
+        self._emit(bet, -1)
+
+    def remove_many(self, bets: List[dict]):
+        """A batch of bets leaving the book, e.g. settled together: one event with the summed changes."""
+        selections: Dict[Key, List[float]] = {}
+        users: Dict[str, List[float]] = {}
+        for bet in bets:
+            change = self._change_of(bet, -1)
+            if change is None:
+                continue
+            entry = selections.setdefault(tuple(change["key"]), [0.0, 0.0, 0])
+            entry[0] += change["stake"]
+            entry[1] += change["liability"]
+            entry[2] += change["bets"]
+            entry = users.setdefault(change["user_id"], [0.0, 0.0, 0])
+            entry[0] += change["stake"]
+            entry[1] += change["payout"]
+            entry[2] += change["bets"]
+        if selections:
+            self._publish({"op": "change_many", "selections": [[list(key), *totals] for key, totals in selections.items()],
+                           "users": users})
+
+    def remove_match(self, match_id: str, users: Optional[Dict[str, Tuple[float, float, int]]] = None):
+        """
+        Every open bet on a match at once, e.g. when the whole match is settled
+        or voided. ``users`` gives the (stake, payout, bets) those bets held per
+        user, so the user totals drop with them.
+        """
+        self._publish({"op": "clear", "match_id": str(match_id),
+                       "users": {str(user_id): list(totals) for user_id, totals in (users or {}).items()}})
+
+    def _emit(self, bet: dict, sign: int):
+        change = self._change_of(bet, sign)
+        if change is not None:
+            self._publish(change)
+
+    @staticmethod
+    def _change_of(bet: dict, sign: int) -> Optional[dict]:
+        selection = bet.get("selection") or bet.get("team")
+        if selection is None:
+            return None
+        stake = float(bet.get("amount") or 0)
+        odds = float(bet["odds"]) if bet.get("odds") is not None else 1.0
+        return {
+            "op": "change",
+            "key": [str(bet.get("match_id")), bet.get("market") or DEFAULT_MARKET, selection],
+            "user_id": str(bet.get("user_id")),
+            "stake": sign * stake,
+            "liability": sign * stake * (odds - 1),
+            "payout": sign * stake * odds,
+            "bets": sign,
+        }
+
+    def _publish(self, event: dict):
+        self._receive(event)
+        if self.bus is not None:
+            self.bus.publish(self.channel, {**event, "origin": self.origin})
+
+    def apply(self, event: dict):
+        if event["op"] == "change":
+            self._change(tuple(event["key"]), event["stake"], event["liability"], event["bets"])
+            self._change_user(event["user_id"], event["stake"], event["payout"], event["bets"])
+        elif event["op"] == "change_many":
+            for key, stake, liability, bets in event["selections"]:
+                self._change(tuple(key), stake, liability, bets)
+            for user_id, (stake, payout, bets) in event["users"].items():
+                self._change_user(user_id, stake, payout, bets)
+        elif event["op"] == "clear":
+            for market in [market for market in self._markets if market[0] == event["match_id"]]:
+                for selection in self._markets.pop(market):
+                    del self._selections[(*market, selection)]
+                self._market_stakes.pop(market, None)
+            for user_id, (stake, payout, bets) in event.get("users", {}).items():
+                self._change_user(user_id, -stake, -payout, -bets)
+
+    def _change(self, key: Key, stake: float, liability: float, bets: int):
+        entry = self._selections.get(key)
+        if entry is None:
+            entry = self._selections[key] = [0.0, 0.0, 0]
+            self._markets.setdefault(key[:2], set()).add(key[2])
+        entry[0] += stake
+        entry[1] += liability
+        entry[2] += bets
+        self._market_stakes[key[:2]] = self._market_stakes.get(key[:2], 0.0) + stake
+        if entry[2] <= 0:
+            del self._selections[key]
+            selections = self._markets[key[:2]]
+            selections.discard(key[2])
+            if not selections:
+                del self._markets[key[:2]]
+                del self._market_stakes[key[:2]]
+
+    def _change_user(self, user_id: str, stake: float, payout: float, bets: int):
+        entry = self._users.setdefault(user_id, [0.0, 0.0, 0])
+        entry[0] += stake
+        entry[1] += payout
+        entry[2] += bets
+        if entry[2] <= 0:
+            del self._users[user_id]
+
+    def user(self, user_id: str) -> Dict[str, float]:
+        """Open stake, potential payout and bet count of one user, in O(1)."""
+        stake, payout, bets = self._users.get(str(user_id), (0.0, 0.0, 0))
+        return {"stake": stake, "payout": payout, "bets": bets}
+
+    def get(self, match_id: str, selection: str, market: str = DEFAULT_MARKET) -> Dict[str, float]:
+        """Stake, liability, bet count and net result for one selection, in O(1)."""
+        entry = self._selections.get((str(match_id), market, selection))
+        stake, liability, bets = entry if entry is not None else (0.0, 0.0, 0)
+        return {
+            "stake": stake,
+            "liability": liability,
+            "bets": bets,
+            "net": self.net(match_id, selection, market),
+        }
+
+    def net(self, match_id: str, selection: str, market: str = DEFAULT_MARKET) -> float:
+        """What the book loses (positive) or wins (negative) on the market if ``selection`` wins."""
+        entry = self._selections.get((str(match_id), market, selection))
+        stake, liability = (entry[0], entry[1]) if entry is not None else (0.0, 0.0)
+        others = self._market_stakes.get((str(match_id), market), 0.0) - stake
+        return liability - others
+
+    def market_stake(self, match_id: str, market: str = DEFAULT_MARKET) -> float:
+        return self._market_stakes.get((str(match_id), market), 0.0)
+
+    def report(self, match_id: Optional[str] = None) -> List[dict]:
+        """Every selection with open bets (on one match, or all), worst net result first."""
+        rows = []
+        for (market_match, market), selections in self._markets.items():
+            if match_id is not None and market_match != str(match_id):
+                continue
+            for selection in selections:
+                rows.append({"match_id": market_match, "market": market, "selection": selection,
+                             **self.get(market_match, selection, market)})
+        rows.sort(key=lambda row: row["net"], reverse=True)
+        return rows
+
+    def __len__(self) -> int:
+        return len(self._selections)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from pymongo.errors import DuplicateKeyError
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS, COMPLETED = "in_progress", "completed"
+# Stored for a request cut off while it ran: it may have taken effect, so it is neither replayed nor re-run
+INTERRUPTED_DETAIL = "An earlier request with this Idempotency-Key was interrupted; check its outcome before retrying"
+# Seconds between checks while another worker runs the same key
+POLL_INTERVAL = 0.05
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(body: Any) -> str:
+    """Stable hash of a request body, so a key reused for a different request is caught."""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Responses of requests sent with an ``Idempotency-Key``, so a retried
+    request gets the first response back instead of running again.
+
+    Completed responses sit in an in-process LRU in front of the
+    ``idempotency_keys`` collection, whose TTL index drops them after
+    IDEMPOTENCY_TTL seconds. A key is claimed in Mongo before the request
+    runs; duplicates arriving meanwhile wait for that first execution, on this
+    worker through a shared future and on other workers by polling the claim.
+    Successes and client errors (4xx) are stored; other failures release the
+    key so the client can retry.
+
+    The first execution runs in its own task, so a client that disconnects
+    or times out does not cut it short: its outcome is stored either way.
+    Only an execution interrupted itself (e.g. at shutdown), whose side
+    effects are unknown, keeps its key, with a 409 telling retries so.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl or settings.IDEMPOTENCY_TTL
+        self.max_entries = max_entries or settings.IDEMPOTENCY_CACHE_SIZE
+        self.collection = None
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()  # key -> (expiry, stored response)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def start(self, db: Any):
+        self.collection = db["idempotency_keys"]
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl)
+
+    async def stop(self):
+        """Let requests still running here store or release their keys, then drop the cache."""
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+        self._cache.clear()
+
+    def _cached(self, key: str) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _remember(self, key: str, stored: dict):
+        self._cache[key] = (time.monotonic() + self.ttl, stored)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def run(self, key: str, body: Any, execute: Callable[[], Awaitable[Any]],
+                  response: Optional[Response] = None) -> Any:
+        """
+        The response for ``key``: stored if this request already ran, awaited if
+        it is running, otherwise from ``execute``. Stored client errors are
+        raised again; ``response`` gets the replay header on replays.
+        """
+        request_hash = fingerprint(body)
+        stored = self._cached(key)
+        if stored is None and key in self._in_flight:
+            stored = await asyncio.shield(self._in_flight[key])
+        if stored is not None:
+            return self._replay(stored, request_hash, response)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        execution = asyncio.ensure_future(self._execute_once(key, request_hash, execute, future))
+        # Retrieve any failure ourselves, in case the caller is no longer waiting for it
+        execution.add_done_callback(lambda task: task.cancelled() or task.exception())
+        stored, replayed = await asyncio.shield(execution)
+        if replayed:
+            return self._replay(stored, request_hash, response)
+        return self._respond(stored)
+
+    async def _execute_once(self, key: str, request_hash: str, execute: Callable[[], Awaitable[Any]],
+                            future: asyncio.Future) -> Tuple[dict, bool]:
+        """``_execute``, resolving the future duplicates on this worker wait on."""
+        try:
+            stored, replayed = await self._execute(key, request_hash, execute)
+            self._remember(key, stored)
+            future.set_result(stored)
+            return stored, replayed
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved, in case no duplicate is waiting
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _execute(self, key: str, request_hash: str, execute: Callable[[], Awaitable[Any]]) -> Tuple[dict, bool]:
+        """Claim the key and run the request, or wait for the worker that holds the claim."""
+        while True:
+            try:
+                await self.collection.insert_one(
+                    {"_id": key, "state": IN_PROGRESS, "fingerprint": request_hash, "created_at": datetime.utcnow()}
+                )
+                break
+            except DuplicateKeyError:
+                document = await self._wait(key)
+                if document is not None:
+                    return {field: document.get(field) for field in ("fingerprint", "status_code", "body")}, True
+                # The other worker's claim went stale or was released; try to claim it ourselves
+
+        try:
+            result = await execute()
+            stored = {"fingerprint": request_hash, "status_code": status.HTTP_200_OK, "body": result}
+        except HTTPException as e:
+            if e.status_code >= 500:
+                await self.collection.delete_one({"_id": key})
+                raise
+            stored = {"fingerprint": request_hash, "status_code": e.status_code, "body": e.detail}
+        except Exception:
+            await self.collection.delete_one({"_id": key})
+            raise
+        except BaseException:
+            # Cancelled part-way: whatever it did may have been committed, so the key is not released
+            await self.collection.update_one({"_id": key}, {"$set": {
+                "state": COMPLETED, "fingerprint": request_hash,
+                "status_code": status.HTTP_409_CONFLICT, "body": INTERRUPTED_DETAIL,
+            }})
+            raise
+        await self.collection.update_one({"_id": key}, {"$set": {"state": COMPLETED, **stored}})
+        return stored, False
+
+    async def _wait(self, key: str) -> Optional[dict]:
+        """Poll another worker's claim until it completes; None if it was released or went stale."""
+        while True:
+            document = await self.collection.find_one({"_id": key})
+            if document is None:
+                return None
+            if document["state"] == COMPLETED:
+                return document
+            if document["created_at"] < datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                # The worker holding it died mid-request; release the claim so it can be taken over
+                await self.collection.delete_one({"_id": key, "state": IN_PROGRESS, "created_at": document["created_at"]})
+                return None
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _replay(self, stored: dict, request_hash: str, response: Optional[Response]) -> Any:
+        if stored["fingerprint"] != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        if response is not None:
+            response.headers[REPLAY_HEADER] = "true"
+        return self._respond(stored)
+
+    @staticmethod
+    def _respond(stored: dict) -> Any:
+        if stored["status_code"] >= 400:
+            raise HTTPException(status_code=stored["status_code"], detail=stored["body"])
+        return stored["body"]
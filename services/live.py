@@ -0,0 +1,448 @@
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+from fastapi import WebSocket, WebSocketDisconnect
+from pymongo.errors import OperationFailure, PyMongoError
+from starlette.requests import HTTPConnection
+from core.config import settings
+from services.connections import LiveConnection
+from services.live_bus import LiveBus
+from utils.live_encoding import LiveFrame, decode_client_message, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Error code returned by a standalone mongod when a change stream is opened
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+# Subscription request fields and the topic prefix each one maps to
+TOPIC_FIELDS = {"match_id": "match", "sport": "sport", "category": "sport", "league": "league"}
+
+
+def match_topics(match_id: Any = None, sport: Any = None, league: Any = None) -> FrozenSet[str]:
+    """Topics a published item belongs to, e.g. {'match:<id>', 'sport:football'}."""
+    topics = set()
+    for prefix, value in (("match", match_id), ("sport", sport), ("league", league)):
+        if value is not None:
+            topics.add(f"{prefix}:{value}")
+    return frozenset(topics)
+
+
+def parse_topics(message: dict) -> Set[str]:
+    """
+    Topics named in a client subscribe/unsubscribe request. Each field accepts a
+    single value or a list, e.g. {"action": "subscribe", "match_id": ["a", "b"], "sport": "tennis"}.
+    """
+    topics = set()
+    for field, prefix in TOPIC_FIELDS.items():
+        values = message.get(field)
+        if values is None:
+            continue
+        if not isinstance(values, list):
+            values = [values]
+        topics.update(f"{prefix}:{value}" for value in values)
+    return topics
+
+
+def query_topics(connection: HTTPConnection) -> Set[str]:
+    """Initial topics passed on the connect URL, e.g. /ws/live?match_id=a&match_id=b&sport=football."""
+    return parse_topics({field: connection.query_params.getlist(field) or None for field in TOPIC_FIELDS})
+
+
+def query_encoding(websocket: WebSocket) -> str:
+    """Frame encoding asked for on the connect URL: ?encoding=json|orjson|msgpack."""
+    return negotiate_encoding(websocket.query_params.get("encoding"))
+
+
+class TopicIndex:
+    """
+    Server-side index of topic -> subscribers, so a publish only touches the
+    subscribers interested in it. Subscribers start out receiving everything
+    until their first subscribe request narrows them down.
+    """
+
+    def __init__(self):
+        self._by_topic: Dict[str, Set[Any]] = {}
+        self._by_subscriber: Dict[Any, Set[str]] = {}
+        self._wildcard: Set[Any] = set()
+
+    def add(self, subscriber: Any):
+        self._by_subscriber[subscriber] = set()
+        self._wildcard.add(subscriber)
+
+    def remove(self, subscriber: Any):
+        self._wildcard.discard(subscriber)
+        for topic in self._by_subscriber.pop(subscriber, ()):
+            self._discard(topic, subscriber)
+
+    def subscribe(self, subscriber: Any, topics: Iterable[str]):
+        self._wildcard.discard(subscriber)
+        for topic in topics:
+            self._by_topic.setdefault(topic, set()).add(subscriber)
+            self._by_subscriber[subscriber].add(topic)
+
+    def subscribe_all(self, subscriber: Any):
+        self._wildcard.add(subscriber)
+
+    def unsubscribe(self, subscriber: Any, topics: Iterable[str]):
+        for topic in topics:
+            self._by_subscriber[subscriber].discard(topic)
+            self._discard(topic, subscriber)
+
+    def topics(self, subscriber: Any) -> Set[str]:
+        return self._by_subscriber.get(subscriber, set())
+
+    def matching(self, topics: Iterable[str]) -> Set[Any]:
+        """Subscribers that should receive an item published under ``topics``."""
+        subscribers = set(self._wildcard)
+        for topic in topics:
+            subscribers.update(self._by_topic.get(topic, ()))
+        return subscribers
+
+    def receives_all(self, subscriber: Any) -> bool:
+        return subscriber in self._wildcard
+
+    def wants(self, subscriber: Any, topics: Iterable[str]) -> bool:
+        if subscriber in self._wildcard:
+            return True
+        return not self._by_subscriber.get(subscriber, set()).isdisjoint(topics)
+
+    def __len__(self) -> int:
+        return len(self._by_subscriber)
+
+    def _discard(self, topic: str, subscriber: Any):
+        subscribers = self._by_topic.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_topic[topic]
+
+
+class CollectionTailer:
+    """
+    Runs one background task per app that watches a collection with a change
+    stream (or polls it on a standalone mongod). ``refresh`` re-reads the
+    collection when tailing starts and on every poll; each burst of change
+    events goes to ``refresh_changes``.
+
+    With a live bus, only the bus leader tails the collection; ``refresh``
+    turns changes into events with ``emit`` and every worker applies them
+    through ``apply``.
+    """
+
+    def __init__(self, collection_name: str, poll_interval: Optional[float] = None, channel: Optional[str] = None):
+        self.collection_name = collection_name
+        self.channel = channel or collection_name  # Bus channel carrying this tailer's events
+        self.poll_interval = poll_interval or settings.LIVE_POLL_INTERVAL
+        self.collection = None
+        self.bus: Optional[LiveBus] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db: Any, bus: Optional[LiveBus] = None):
+        """Start tailing the collection in the background, or follow the leader over the bus."""
+        self.collection = db[self.collection_name]
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.channel, self.apply)
+        if bus is None or bus.is_leader:
+            self._start_tailing()
+        else:
+            bus.on_leader(self._start_tailing)
+            await self.bootstrap()
+
+    def _start_tailing(self):
+        self.promote()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"{type(self).__name__} tailing collection '{self.collection_name}'")
+
+    async def stop(self):
+        """Cancel the tailing task."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self):
+        """Leader side: read the collection and ``emit`` an event per change."""
+        raise NotImplementedError
+
+    async def refresh_changes(self, changes: List[dict]):
+        """Leader side: ``emit`` what a burst of change events changed. By default the collection is re-read."""
+        await self.refresh()
+
+    @staticmethod
+    def changed_documents(changes: List[dict]) -> Optional[Dict[str, Optional[dict]]]:
+        """
+        key -> current document (None once deleted) of every document a burst
+        of change events touched, or None if an event such as a drop names no
+        single document and the collection has to be re-read.
+        """
+        documents = {}
+        for change in changes:
+            key = change.get("documentKey", {}).get("_id")
+            if key is None:
+                return None
+            documents[str(key)] = change.get("fullDocument")
+        return documents
+
+    def apply(self, event: dict):
+        """Every worker: apply an emitted event to local state and subscribers."""
+        raise NotImplementedError
+
+    async def bootstrap(self):
+        """Follower side: load initial state once; the leader's events keep it current."""
+
+    def promote(self):
+        """Called when this process starts tailing, before the first ``refresh``."""
+
+    def emit(self, event: dict):
+        if self.bus is None:
+            self.apply(event)
+        else:
+            self.bus.publish(self.channel, event)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_UNSUPPORTED:
+                    logger.error(f"Change stream failed for '{self.collection_name}': {e}")
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                logger.info(f"Change streams unavailable, polling '{self.collection_name}' instead")
+                await self._poll()
+            except PyMongoError as e:
+                logger.error(f"Error tailing '{self.collection_name}': {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _watch(self):
+        """
+        Hand every change to ``refresh_changes``, draining bursts of events into
+        one call. The server looks up the current version of each changed
+        document, so a change costs no read of the collection.
+        """
+        async with self.collection.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                changes = [change]
+                change = await stream.try_next()
+                while change is not None:
+                    changes.append(change)
+                    change = await stream.try_next()
+                await self.refresh_changes(changes)
+
+    async def _poll(self):
+        """Fallback for standalone mongod: one query per interval regardless of subscribers."""
+        while True:
+            try:
+                await self.refresh()
+            except PyMongoError as e:
+                logger.error(f"Poll failed for '{self.collection_name}': {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class LiveHub(CollectionTailer):
+    """
+    Tails a single collection once for the whole app and keeps its documents
+    in memory. Each changed document is wrapped in one ``LiveFrame`` (encoded
+    at most once per client encoding) and handed only to the subscribers whose
+    topics it matches, so neither DB load nor encoding work grows with clients.
+    """
+
+    def __init__(self, collection_name: str, query: Optional[dict] = None, match_field: str = "match_id",
+                 limit: Optional[int] = None, poll_interval: Optional[float] = None, channel: Optional[str] = None):
+        super().__init__(collection_name, poll_interval, channel)
+        self.query = query or {}
+        self.match_field = match_field  # Document field holding the match id used for topics
+        self.limit = limit or settings.LIVE_SNAPSHOT_LIMIT
+        self.items: Dict[str, Any] = {}  # key -> latest item
+        self.item_topics: Dict[str, FrozenSet[str]] = {}
+        self.index = TopicIndex()
+        self._source: Dict[str, str] = {}  # Leader side: key -> last emitted document, for change detection
+        self._snapshot: Optional[LiveFrame] = None  # Cached unfiltered snapshot
+
+    def subscribe(self, connection: LiveConnection):
+        self.index.add(connection)
+        # A client that overflows its send queue is resynced with a fresh snapshot
+        connection.on_overflow = lambda overflowed: overflowed.reset(self.snapshot(overflowed))
+
+    def unsubscribe(self, connection: LiveConnection):
+        self.index.remove(connection)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.index)
+
+    def topics_for(self, document: dict) -> FrozenSet[str]:
+        return match_topics(
+            document.get(self.match_field),
+            document.get("sport") or document.get("category"),
+            document.get("league"),
+        )
+
+    def encode_snapshot(self, keys: List[str]) -> LiveFrame:
+        return LiveFrame({"type": "snapshot", "data": [self.items[key] for key in keys]})
+
+    def snapshot(self, connection: Optional[LiveConnection] = None, topics: Optional[Iterable[str]] = None) -> LiveFrame:
+        """
+        Encoded snapshot of the items ``connection`` is subscribed to (or of the
+        given ``topics``). The unfiltered snapshot is cached until the next change.
+        """
+        if topics is not None:
+            topics = set(topics)
+            keys = [key for key in self.items if not topics.isdisjoint(self.item_topics[key])]
+            return self.encode_snapshot(keys)
+        if connection is None or self.index.receives_all(connection):
+            if self._snapshot is None:
+                self._snapshot = self.encode_snapshot(list(self.items))
+            return self._snapshot
+        keys = [key for key in self.items if self.index.wants(connection, self.item_topics[key])]
+        return self.encode_snapshot(keys)
+
+    def update(self, key: str, item: Any, topics: FrozenSet[str]) -> LiveFrame:
+        """Store the latest item under ``key`` and publish it to interested subscribers."""
+        message = LiveFrame({"type": "update", "data": item})
+        self.items[key] = item
+        self.item_topics[key] = topics
+        self._snapshot = None
+        self.publish(message, topics, key)
+        return message
+
+    def remove(self, key: str) -> Optional[LiveFrame]:
+        if key not in self.items:
+            return None
+        topics = self.item_topics.pop(key)
+        del self.items[key]
+        self._snapshot = None
+        message = LiveFrame({"type": "remove", "id": key})
+        self.publish(message, topics, key)
+        return message
+
+    def publish(self, message: LiveFrame, topics: Iterable[str], key: Optional[str] = None):
+        """
+        Queue the same frame on every connection interested in ``topics``.
+        Messages published under a key coalesce with unsent ones for that key.
+        """
+        for connection in self.index.matching(topics):
+            connection.send(message, key)
+
+    async def fetch(self) -> List[dict]:
+        return await self.collection.find(self.query).to_list(self.limit)
+
+    def apply(self, event: dict):
+        if event["op"] == "update":
+            self.update(event["key"], event["item"], frozenset(event["topics"]))
+        elif event["op"] == "remove":
+            self.remove(event["key"])
+
+    async def bootstrap(self):
+        for document in await self.fetch():
+            self.update(str(document["_id"]), document, self.topics_for(document))
+
+    def selects(self, document: dict) -> bool:
+        """Whether a changed document belongs in the hub, i.e. matches the (top-level equality) query."""
+        return all(document.get(field) == value for field, value in self.query.items())
+
+    async def refresh(self):
+        """Re-read the collection once and emit only the documents that changed."""
+        documents = {str(document["_id"]): document for document in await self.fetch()}
+        for key in [key for key in self._source if key not in documents]:
+            self.refresh_document(key, None)
+        for key, document in documents.items():
+            self.refresh_document(key, document)
+
+    async def refresh_changes(self, changes: List[dict]):
+        """Emit only the documents named by the change events."""
+        documents = self.changed_documents(changes)
+        if documents is None:
+            await self.refresh()
+            return
+        for key, document in documents.items():
+            # A document that no longer matches the query leaves the hub like a deleted one
+            self.refresh_document(key, document if document is not None and self.selects(document) else None)
+
+    def refresh_document(self, key: str, document: Optional[dict]):
+        """Emit one document if it changed, or its removal if it is gone (None)."""
+        if document is None:
+            if key in self._source:
+                del self._source[key]
+                self.emit({"op": "remove", "key": key})
+            return
+        if key not in self._source and len(self._source) >= self.limit:
+            return  # The hub holds at most ``limit`` documents, as a re-read would
+        encoded = json.dumps(document, default=str)
+        if self._source.get(key) != encoded:
+            self._source[key] = encoded
+            self.emit({"op": "update", "key": key, "item": document, "topics": sorted(self.topics_for(document))})
+
+
+async def serve_connection(websocket: WebSocket, connection: LiveConnection,
+                           on_message: Optional[Callable[[dict], None]] = None):
+    """
+    Read the client's frames while its connection writer pushes messages, until
+    the client disconnects or the connection is closed. Frames are JSON text or
+    MessagePack binary; every frame counts as a heartbeat, ``{"action": "pong"}``
+    is only that, and any other object is handed to ``on_message``.
+    """
+    async def receive():
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                message = decode_client_message(frame["text"] if frame.get("text") is not None else frame["bytes"])
+            except ValueError:
+                connection.send(LiveFrame({"type": "error", "detail": "Invalid message"}))
+                continue
+            connection.touch()
+            if isinstance(message, dict) and message.get("action") == "pong":
+                continue
+            if on_message is None or not isinstance(message, dict):
+                connection.send(LiveFrame({"type": "error", "detail": "Unknown action"}))
+                continue
+            on_message(message)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(connection.closed.wait())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()  # Re-raise WebSocketDisconnect
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def serve_subscriber(websocket: WebSocket, hub: LiveHub, connection: LiveConnection):
+    """
+    Apply the client's subscription requests while its connection writer pushes
+    hub messages, until the client disconnects or the connection is closed:
+
+        {"action": "subscribe", "match_id": "...", "sport": "...", "league": "..."}
+        {"action": "unsubscribe", "match_id": "..."}
+        {"action": "subscribe", "all": true}
+        {"action": "pong"}
+    """
+    def handle(message: dict):
+        action = message.get("action")
+        if action not in ("subscribe", "unsubscribe"):
+            connection.send(LiveFrame({"type": "error", "detail": "Unknown action"}))
+            return
+        topics = parse_topics(message)
+        if action == "subscribe" and message.get("all"):
+            hub.index.subscribe_all(connection)
+        elif action == "subscribe":
+            new_topics = topics - hub.index.topics(connection)
+            hub.index.subscribe(connection, topics)
+            if new_topics:
+                connection.send(hub.snapshot(topics=new_topics))
+        else:
+            hub.index.unsubscribe(connection, topics)
+        connection.send(LiveFrame({"type": "subscriptions", "topics": sorted(hub.index.topics(connection))}))
+
+    await serve_connection(websocket, connection, handle)
@@ -0,0 +1,212 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Largest single event line accepted on the unix socket bus
+MAX_EVENT_SIZE = 16 * 1024 * 1024
+# Peers whose unsent backlog grows past this are dropped by the broker
+MAX_PEER_BACKLOG = 64 * 1024 * 1024
+RECONNECT_DELAY = 0.5
+
+
+class LiveBus:
+    """
+    Pub/sub for live events between the ingestion side (which reads Mongo or
+    feeds once) and every worker holding websocket clients.
+
+    Exactly one process is the leader at a time; only the leader runs the
+    ingestion tasks registered with ``on_leader``.
+    """
+
+    def __init__(self):
+        self.is_leader = False
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._leader_callbacks: List[Callable[[], None]] = []
+        self._reconnect_callbacks: List[Callable[[], None]] = []
+
+    async def start(self):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+    def publish(self, channel: str, message: dict):
+        """Deliver ``message`` to the ``channel`` handlers of every worker, without waiting."""
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_leader(self, callback: Callable[[], None]):
+        """Run ``callback`` if and when this process takes over as leader."""
+        self._leader_callbacks.append(callback)
+
+    def on_reconnect(self, callback: Callable[[], None]):
+        """
+        Run ``callback`` each time the bus comes back after a disconnect, during
+        which events to and from this worker were lost.
+        """
+        self._reconnect_callbacks.append(callback)
+
+    def dispatch(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.error(f"Live bus handler failed on '{channel}': {e}")
+
+    def _become_leader(self):
+        self.is_leader = True
+        logger.info(f"{type(self).__name__}: process {os.getpid()} is the live ingestion leader")
+        for callback in self._leader_callbacks:
+            callback()
+
+    def _reconnected(self):
+        for callback in self._reconnect_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Live bus reconnect callback failed: {e}")
+
+
+class InProcessBus(LiveBus):
+    """Single-worker bus: the process is always the leader and publish is a direct call."""
+
+    async def start(self):
+        self._become_leader()
+
+    def publish(self, channel: str, message: dict):
+        self.dispatch(channel, message)
+
+
+class UnixSocketBus(LiveBus):
+    """
+    Bus shared by the worker processes on one host. The worker holding an
+    flock on ``<path>.lock`` is the leader and also runs a tiny broker on the
+    unix socket ``path`` that relays each newline-delimited JSON event to every
+    connected worker, itself included. If the leader dies, the next worker to
+    reconnect takes the lock over.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__()
+        self.path = path or settings.LIVE_BUS_PATH
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: set = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        reader = await self._connect()
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        if self._server:
+            self._server.close()
+            self._server = None
+            for peer in list(self._peers):
+                peer.close()  # Lets the other workers notice and elect a new leader
+            self._peers.clear()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_file:
+            self._lock_file.close()  # Releases the flock
+            self._lock_file = None
+
+    def publish(self, channel: str, message: dict):
+        if self._writer is None:
+            logger.warning(f"Live bus not connected, dropping event on '{channel}'")
+            return
+        line = json.dumps({"channel": channel, "message": message}, default=str) + "\n"
+        self._writer.write(line.encode())
+
+    def _try_lock(self) -> bool:
+        lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _connect(self) -> asyncio.StreamReader:
+        """Become the broker if nobody holds the lock, then connect to the broker."""
+        while True:
+            if not self.is_leader and self._try_lock():
+                try:
+                    os.unlink(self.path)  # Stale socket left by a dead leader
+                except FileNotFoundError:
+                    pass
+                self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path, limit=MAX_EVENT_SIZE)
+                self._become_leader()
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_EVENT_SIZE)
+                return reader
+            except OSError as e:
+                logger.info(f"Waiting for live bus broker at {self.path}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _run(self, reader: asyncio.StreamReader):
+        while True:
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    envelope = json.loads(line)
+                    self.dispatch(envelope["channel"], envelope["message"])
+            except (OSError, ValueError) as e:
+                logger.error(f"Live bus connection error: {e}")
+            self._writer = None
+            logger.warning("Live bus broker went away, reconnecting")
+            await asyncio.sleep(RECONNECT_DELAY)
+            reader = await self._connect()
+            self._reconnected()
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Broker side: relay every event line from one worker to all workers."""
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for peer in list(self._peers):
+                    if peer.transport.get_write_buffer_size() > MAX_PEER_BACKLOG:
+                        logger.warning("Dropping live bus peer that stopped reading")
+                        self._peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(line)
+        except OSError:
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+
+def create_live_bus() -> LiveBus:
+    """Bus selected by LIVE_BUS_BACKEND ('memory' or 'unix')."""
+    if settings.LIVE_BUS_BACKEND == "unix":
+        return UnixSocketBus()
+    return InProcessBus()
@@ -3,16 +3,25 @@ from schemas.match import MatchResponse, MatchCreate, MatchUpdate, PlaceBetReque
 from motor.motor_asyncio import AsyncIOMotorCollection
 from bson import ObjectId
 from fastapi import HTTPException, status
-from db.mongodb import get_db
-from pymongo.client_session import ClientSession
-import requests  # For making API calls (ensure requests package is installed)
+from services.match_feed import LiveMatchFeed
+from services.odds_book import price_accepted
+import asyncio
+import httpx
 import logging
-from datetime import datetime
+from typing import Optional
 
 class MatchService:
-    def __init__(self, collection: AsyncIOMotorCollection, db):
+    def __init__(self, collection: AsyncIOMotorCollection, db, cashout_book=None, exposure_book=None, risk_limits=None,
+                 odds_book=None, bet_delay=None, bet_queue=None):
         self.collection = collection
         self.db = db  # The database should be passed as part of the initialization
+        # In-memory books kept current with every accepted bet (app.state in the API)
+        self.cashout_book = cashout_book
+        self.exposure_book = exposure_book
+        self.risk_limits = risk_limits
+        self.odds_book = odds_book
+        self.bet_delay = bet_delay  # In-play delay queue; without one only pre-match ('open') bets are taken
+        self.bet_queue = bet_queue  # Group-commit queue, when BET_GROUP_COMMIT is on
 
     def validate_object_id(self, obj_id: str):
         if not ObjectId.is_valid(obj_id):
@@ -60,29 +69,102 @@ class MatchService:
         self.validate_object_id(bet_request.match_id)
         self.validate_object_id(user_id)
 
-        async with await self.db.client.start_session() as session:
-            async with session.start_transaction():
-                match = await self.collection.find_one({"_id": ObjectId(bet_request.match_id)})
-                if not match or match["status"] != "open":
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match not available for betting")
-
-                user_balance = await self.db["users"].find_one({"_id": ObjectId(user_id)})
-                if not user_balance or user_balance["balance"] < bet_request.amount:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
+        if self.odds_book is not None:
+            # Status and price drift checked from memory; the match document is not read
+            statuses = ("open", "live") if self.bet_delay is not None else ("open",)
+            odds = self.odds_book.validate(bet_request.match_id, bet_request.team, bet_request.odds, statuses,
+                                           bet_request.accept_odds)
+        else:
+            match = await self.collection.find_one({"_id": ObjectId(bet_request.match_id)})
+            if not match or match["status"] != "open":
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match not available for betting")
+            odds = (match.get("odds") or {}).get(bet_request.team)
+            if None not in (odds, bet_request.odds) and not price_accepted(bet_request.odds, odds, bet_request.accept_odds):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": "Odds have changed", "odds": odds})
+        reservation = None
+        if self.risk_limits is not None:
+            # In-memory counters only; no extra round-trip. The bet holds its share of
+            # the limits from here until it is in the exposure book or rejected.
+            reservation = self.risk_limits.check(user_id, bet_request.match_id, bet_request.team,
+                                                 bet_request.amount, odds)
+
+        def release():
+            if reservation is not None:
+                self.risk_limits.release(reservation)
+
+        async def commit(price: Optional[float]):
+            try:
+                return await self.commit_bet(user_id, bet_request, price)
+            finally:
+                # Once committed, _track has already added the bet to this worker's exposure book (applied
+                # locally, not via the bus), so its limits never see it both unreserved and uncounted.
+                # Nothing to hold if it failed.
+                release()
+
+        if self.bet_delay is not None and self.odds_book.get(bet_request.match_id)[0] == "live":
+            # In-play: placed after the delay if the price still holds; the result arrives on the bets websocket
+            try:
+                return self.bet_delay.park(
+                    user_id, bet_request.match_id, bet_request.team, bet_request.odds or odds,
+                    bet_request.accept_odds, commit, release=release,
+                )
+            except Exception:
+                release()
+                raise
+        # Shielded: a client that disconnects or times out once the debit may have been
+        # committed must not stop the bet reaching the books and releasing its reservation
+        placing = asyncio.ensure_future(commit(odds))
+        # Retrieve any failure ourselves, in case the caller is no longer waiting for it
+        placing.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(placing)
+
+    async def commit_bet(self, user_id: str, bet_request: PlaceBetRequest, odds: Optional[float]):
+        """
+        Debit the stake and record a validated bet at ``odds`` in one transaction.
+        The debit is a single conditional update, so concurrent bets can never
+        overdraw the wallet or overwrite each other's debit.
+        """
+        bet_data = {
+            "user_id": ObjectId(user_id),
+            "match_id": ObjectId(bet_request.match_id),
+            "amount": bet_request.amount,
+            "team": bet_request.team,
+            "odds": odds,  # Price taken, for settlement and cash-out
+            "status": "pending",
+        }
+
+        if self.bet_queue is not None:
+            # Committed with the other bets queued in the same few milliseconds
+            bet_id = await self.bet_queue.submit(bet_data)
+            self._track(bet_data)
+            return {"bet_id": str(bet_id), "status": "Bet placed successfully"}
+
+        async def debit_and_insert(session):
+            debited = await self.db["users"].find_one_and_update(
+                {"_id": ObjectId(user_id), "balance": {"$gte": bet_request.amount}},
+                {"$inc": {"balance": -bet_request.amount}},
+                projection={"_id": 1},
+                session=session,
+            )
+            if debited is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
+            # A fresh copy each attempt, so a retried transaction does not reuse the _id of an aborted insert
+            return await self.db["bets"].insert_one(dict(bet_data), session=session)
 
-                bet_data = {
-                    "user_id": ObjectId(user_id),
-                    "match_id": ObjectId(bet_request.match_id),
-                    "amount": bet_request.amount,
-                    "team": bet_request.team,
-                    "status": "pending",
-                }
-                bet_result = await self.db["bets"].insert_one(bet_data, session=session)
+        async with await self.db.client.start_session() as session:
+            # Retries on TransientTransactionError and UnknownTransactionCommitResult
+            bet_result = await session.with_transaction(debit_and_insert)
 
-                new_balance = user_balance["balance"] - bet_request.amount
-                await self.db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": {"balance": new_balance}}, session=session)
+        bet_data["_id"] = bet_result.inserted_id
+        self._track(bet_data)
+        return {"bet_id": str(bet_result.inserted_id), "status": "Bet placed successfully"}
 
-                return {"bet_id": str(bet_result.inserted_id), "status": "Bet placed successfully"}
+    def _track(self, bet_data: dict):
+        # Committed: count it in the exposure book and quote it for cash-out on every worker
+        if self.exposure_book is not None:
+            self.exposure_book.add(bet_data)
+        if self.cashout_book is not None:
+            self.cashout_book.track(bet_data)
 
     async def get_live_match_updates(self, external_api_url: str, headers: dict = None):
         """
@@ -90,43 +172,27 @@ class MatchService:
         
         :param external_api_url: URL of the external API providing live match updates.
         :param headers: Optional headers for API authentication or other purposes.
-        :return: A list of updated matches.
+        :return: A list of the matches that changed.
         """
+        feed = LiveMatchFeed(self.collection, external_api_url, headers)
         try:
-            # Fetch live match data from an external source
-            response = requests.get(external_api_url, headers=headers)
-            response.raise_for_status()
-            live_matches = response.json()  # Assuming the API returns JSON data
-
-            updated_matches = []
-            for match_data in live_matches:
-                # Here you would parse the match data according to your schema
-                match_id = match_data.get("match_id")  # Assuming the API returns a match ID
-                update_data = {
-                    "score": match_data.get("score"),
-                    "status": match_data.get("status"),
-                    "last_updated": datetime.utcnow(),
-                    # Include other fields as per API response
-                }
-
-                # Update match details in the database
-                updated_match = await self.collection.find_one_and_update(
-                    {"_id": ObjectId(match_id)},
-                    {"$set": update_data},
-                    return_document=True
-                )
-                if updated_match:
-                    updated_matches.append(MatchResponse(**updated_match))
+            # Async fetch, one query for the current state and one unordered bulk_write
+            changed = await feed.ingest()
+            updated_matches = [
+                MatchResponse(**match) async for match in self.collection.find({"_id": {"$in": changed}})
+            ] if changed else []
 
             logging.info("Live match updates applied successfully.")
             return updated_matches
 
-        except requests.RequestException as e:
+        except (httpx.HTTPError, OSError, ValueError) as e:
             logging.error(f"Failed to fetch live match updates: {e}")
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Failed to fetch live match updates")
         except Exception as e:
             logging.error(f"An unexpected error occurred during live updates: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error during live match updates")
+        finally:
+            await feed.stop()
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from core.config import settings
+from services.odds_writer import OddsWriter
+
+logger = logging.getLogger(__name__)
+
+# Feed fields copied onto the match document; anything else in the payload is ignored
+FEED_FIELDS = ("score", "status", "odds")
+
+
+def normalize_feed(payload: Any) -> Dict[ObjectId, Dict[str, Any]]:
+    """
+    Turn a raw feed payload (a list of matches, or {"matches": [...]}) into
+    match _id -> fields to set. Entries without a valid match id are skipped,
+    and a later entry for the same match wins.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("matches") or []
+    updates: Dict[ObjectId, Dict[str, Any]] = {}
+    for entry in payload:
+        if not isinstance(entry, dict):
+            continue
+        match_id = entry.get("match_id") or entry.get("id")
+        if not match_id or not ObjectId.is_valid(str(match_id)):
+            logger.warning(f"Skipping live feed entry with invalid match id: {match_id!r}")
+            continue
+        fields = {field: entry[field] for field in FEED_FIELDS if entry.get(field) is not None}
+        if fields:
+            updates[ObjectId(str(match_id))] = fields
+    return updates
+
+
+class LiveMatchFeed:
+    """
+    Pulls the external live-match feed and applies it to ``matches`` in bulk.
+
+    One pooled ``httpx.AsyncClient`` (with timeouts) is reused across polls;
+    a ``file://`` URL or plain path reads a local JSON file instead, for
+    development and tests. Each poll reads the current state of the fed
+    matches with a single query and writes only the ones that changed with a
+    single unordered ``bulk_write``, so unchanged matches never reach the
+    change stream and are never republished by the live hubs. With an
+    ``OddsWriter``, odds skip this write and are coalesced there instead.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, url: Optional[str] = None, headers: Optional[dict] = None,
+                 interval: Optional[float] = None, timeout: Optional[float] = None,
+                 client: Optional[httpx.AsyncClient] = None, odds_writer: Optional[OddsWriter] = None):
+        self.collection = collection
+        self.odds_writer = odds_writer  # When set, odds go through it instead of this bulk_write
+        self.url = url or settings.LIVE_FEED_URL
+        self.headers = headers or {}
+        self.interval = interval or settings.LIVE_FEED_INTERVAL
+        self.timeout = timeout or settings.LIVE_FEED_TIMEOUT
+        self._client = client
+        self._owns_client = client is None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._client
+
+    def start(self):
+        """Poll the feed every ``interval`` seconds in the background."""
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Live match feed polling {self.url} every {self.interval}s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self) -> Any:
+        """Raw feed payload from the HTTP feed or a local JSON file."""
+        parsed = urlparse(self.url)
+        if parsed.scheme in ("http", "https"):
+            response = await self.client.get(self.url, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+        path = Path(parsed.path if parsed.scheme == "file" else self.url)
+        return json.loads(await asyncio.to_thread(path.read_text))
+
+    async def apply(self, updates: Dict[ObjectId, Dict[str, Any]]) -> List[ObjectId]:
+        """Write the updates that change something, in one bulk_write. Returns the changed match ids."""
+        if not updates:
+            return []
+        projection = {field: 1 for field in FEED_FIELDS}
+        current = {
+            match["_id"]: match
+            async for match in self.collection.find({"_id": {"$in": list(updates)}}, projection)
+        }
+        now = datetime.utcnow()
+        operations, changed = [], []
+        for match_id, fields in updates.items():
+            existing = current.get(match_id)
+            if existing is None:
+                continue  # Only matches we already list are updated from the feed
+            if self.odds_writer is not None and "odds" in fields:
+                fields = dict(fields)
+                odds = fields.pop("odds")
+                if existing.get("odds") != odds or self.odds_writer.latest(str(match_id)) is not None:
+                    self.odds_writer.submit(match_id, odds)
+            diff = {field: value for field, value in fields.items() if existing.get(field) != value}
+            if diff:
+                diff["last_updated"] = now
+                operations.append(UpdateOne({"_id": match_id}, {"$set": diff}))
+                changed.append(match_id)
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        return changed
+
+    async def ingest(self) -> List[ObjectId]:
+        """Fetch, normalize and apply one round of the feed."""
+        return await self.apply(normalize_feed(await self.fetch()))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                changed = await self.ingest()
+                if changed:
+                    logger.info(f"Live match feed updated {len(changed)} matches")
+            except asyncio.CancelledError:
+                raise
+            except (httpx.HTTPError, OSError, ValueError) as e:
+                logger.error(f"Failed to fetch live match feed: {e}")
+            except PyMongoError as e:
+                logger.error(f"Failed to apply live match feed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
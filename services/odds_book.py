@@ -0,0 +1,135 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException, status
+from core.config import settings
+from services.live import CollectionTailer
+
+logger = logging.getLogger(__name__)
+
+# Match statuses a bet can be placed on (services.match takes 'open', services.bet 'live')
+BETTABLE_STATUSES = ("open", "live")
+
+# How far the current price may have moved from the price the client saw
+ACCEPT_EXACT = "exact"  # Only within ODDS_DRIFT_TOLERANCE either way
+ACCEPT_HIGHER = "higher"  # Any higher price, lower ones within the tolerance
+ACCEPT_ANY = "any"  # Whatever the current price is
+ACCEPT_POLICIES = (ACCEPT_EXACT, ACCEPT_HIGHER, ACCEPT_ANY)
+
+
+class OddsBook(CollectionTailer):
+    """
+    Status and current prices of every bettable match, kept in memory for
+    bet placement so it needs no ``find_one`` on ``matches``.
+
+    The leader follows the matches change stream, reading each changed match
+    from its event (or polls the whole board), and sends each changed match to
+    every worker over the bus; odds ticks from the ingestion
+    pipeline are applied straight away through the odds stream's listeners.
+    """
+
+    def __init__(self, poll_interval: Optional[float] = None, channel: str = "odds_book"):
+        super().__init__("matches", poll_interval, channel)
+        self.matches: Dict[str, Tuple[str, Dict[str, float]]] = {}  # match_id -> (status, odds)
+        self._source: Dict[str, Tuple[str, Dict[str, float]]] = {}  # Leader side: last emitted state
+        self.writer = None  # OddsWriter holding ticks not yet flushed to Mongo, if any
+
+    def get(self, match_id: str) -> Optional[Tuple[str, Dict[str, float]]]:
+        """(status, odds) of a bettable match, in O(1)."""
+        return self.matches.get(str(match_id))
+
+    async def fetch(self) -> List[dict]:
+        return await self.collection.find(
+            {"status": {"$in": list(BETTABLE_STATUSES)}}, {"status": 1, "odds": 1}
+        ).to_list(length=None)
+
+    async def bootstrap(self):
+        for match in await self.fetch():
+            self.matches[str(match["_id"])] = (match["status"], match.get("odds") or {})
+
+    def promote(self):
+        self._source = dict(self.matches)
+
+    async def refresh(self):
+        """Emit every match whose status or odds changed, and the ones no longer bettable."""
+        matches = {str(match["_id"]): match for match in await self.fetch()}
+        for match_id in [match_id for match_id in self._source if match_id not in matches]:
+            self.refresh_document(match_id, None)
+        for match_id, match in matches.items():
+            self.refresh_document(match_id, match)
+
+    async def refresh_changes(self, changes: List[dict]):
+        """Emit only the matches named by the change events."""
+        matches = self.changed_documents(changes)
+        if matches is None:
+            await self.refresh()
+            return
+        for match_id, match in matches.items():
+            if match is not None and match.get("status") not in BETTABLE_STATUSES:
+                match = None  # No longer bettable: leaves the book like a deleted match
+            self.refresh_document(match_id, match)
+
+    def refresh_document(self, match_id: str, match: Optional[dict]):
+        """Emit one match if its status or odds changed, or its removal once it is gone (None)."""
+        if match is None:
+            if match_id in self._source:
+                del self._source[match_id]
+                self.emit({"op": "remove", "match_id": match_id})
+            return
+        # Ticks waiting in the odds writer are newer than what Mongo holds
+        pending = self.writer.latest(match_id) if self.writer is not None else None
+        state = (match["status"], pending if pending is not None else match.get("odds") or {})
+        if self._source.get(match_id) != state:
+            self._source[match_id] = state
+            self.emit({"op": "set", "match_id": match_id, "status": state[0], "odds": state[1]})
+
+    def apply(self, event: dict):
+        if event["op"] == "remove":
+            self.matches.pop(event["match_id"], None)
+        else:
+            self.matches[event["match_id"]] = (event["status"], event["odds"])
+
+    def on_odds(self, match_id: str, odds: Optional[Dict[str, float]]):
+        """Odds stream hook: take live ticks as soon as they are applied, ahead of the Mongo write."""
+        current = self.matches.get(match_id)
+        if current is not None and odds is not None:
+            self.matches[match_id] = (current[0], dict(odds))
+
+    def validate(self, match_id: str, selection: Optional[str], odds: Optional[float],
+                 statuses: Iterable[str] = BETTABLE_STATUSES, accept: Optional[str] = None) -> Optional[float]:
+        """
+        Check that a match takes bets and that the price has not drifted from
+        ``odds`` (the price the client saw) beyond what ``accept`` allows.
+        Returns the current price of ``selection``, which the bet is struck at.
+        """
+        current = self.matches.get(str(match_id))
+        if current is None or current[0] not in statuses:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match not available for betting")
+        if selection is None:
+            return odds
+        price = current[1].get(selection)
+        if price is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Selection not available for betting")
+        if odds is not None and not price_accepted(odds, price, accept):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Odds have changed", "odds": price},
+            )
+        return price
+
+
+def price_accepted(requested: float, current: float, accept: Optional[str] = None,
+                   tolerance: Optional[float] = None) -> bool:
+    """
+    Whether a bet requested at ``requested`` odds may be struck at ``current``,
+    under ``accept`` (default ODDS_ACCEPT_POLICY) and ``tolerance`` (default
+    ODDS_DRIFT_TOLERANCE, relative).
+    """
+    accept = accept or settings.ODDS_ACCEPT_POLICY
+    if accept not in ACCEPT_POLICIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown odds acceptance policy: {accept}")
+    tolerance = settings.ODDS_DRIFT_TOLERANCE if tolerance is None else tolerance
+    if accept == ACCEPT_ANY:
+        return True
+    if current < requested * (1 - tolerance):
+        return False  # Shortened beyond the tolerance
+    return accept == ACCEPT_HIGHER or current <= requested * (1 + tolerance)
@@ -0,0 +1,157 @@
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
+from core.config import settings
+from services.connections import LiveConnection
+from services.live import LiveHub
+from utils.live_encoding import LiveFrame
+
+logger = logging.getLogger(__name__)
+
+
+class OddsStream(LiveHub):
+    """
+    Keeps the live odds board in memory and turns every change into a
+    per-match delta tagged with a monotonically increasing sequence number.
+
+    Clients get one snapshot on connect and deltas afterwards. Recent deltas
+    are kept in a bounded ring buffer so a reconnecting client can resume from
+    the last sequence it saw instead of downloading the whole board again.
+    Sequence numbers are assigned once by the leader, so they mean the same
+    thing on every worker.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        super().__init__("matches", query={"status": "live"}, match_field="_id",
+                         poll_interval=poll_interval, channel="odds")
+        self.seq = 0
+        self._history: Deque[Tuple[int, FrozenSet[str], LiveFrame]] = deque(maxlen=buffer_size or settings.ODDS_DELTA_BUFFER)
+        # Leader side: last emitted odds and topics per match, and the last assigned sequence
+        self._source_odds: Dict[str, Dict[str, float]] = {}
+        self._source_topics: Dict[str, FrozenSet[str]] = {}
+        self._source_seq = 0
+        self.writer = None  # OddsWriter holding ticks not yet flushed to Mongo, if any
+        # Called with (match_id, current odds or None) after every applied delta, e.g. the cash-out book
+        self.listeners: List[Callable[[str, Optional[Dict[str, float]]], None]] = []
+
+    @property
+    def odds(self) -> Dict[str, Dict[str, float]]:
+        """match_id -> current odds."""
+        return self.items
+
+    def encode_snapshot(self, keys: List[str]) -> LiveFrame:
+        matches = [{"match_id": match_id, "odds": self.items[match_id]} for match_id in keys]
+        return LiveFrame({"type": "snapshot", "seq": self.seq, "matches": matches})
+
+    def since(self, seq: int, connection: Optional[LiveConnection] = None) -> Optional[List[LiveFrame]]:
+        """
+        Deltas published after ``seq`` that ``connection`` is subscribed to,
+        or None when the ring buffer no longer covers that point and the client
+        has to start from a snapshot.
+        """
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self._history or self._history[0][0] > seq + 1:
+            return None
+        return [
+            message for message_seq, topics, message in self._history
+            if message_seq > seq and (connection is None or self.index.wants(connection, topics))
+        ]
+
+    def push(self, match_id: str, odds: Optional[Dict[str, float]], sport: Optional[str] = None,
+             league: Optional[str] = None):
+        """
+        Leader side: record the latest odds for a match (None takes it off the
+        board) and emit a delta holding only the selections that changed.
+        """
+        if odds is None:
+            if match_id in self._source_odds:
+                del self._source_odds[match_id]
+                topics = self._source_topics.pop(match_id)
+                self._emit_delta({"op": "remove", "match_id": match_id}, topics)
+            return
+        previous = self._source_odds.get(match_id)
+        topics = self._source_topics.get(match_id) or self.topics_for({"_id": match_id, "sport": sport, "league": league})
+        changed = {selection: price for selection, price in odds.items() if (previous or {}).get(selection) != price}
+        removed = [selection for selection in previous or {} if selection not in odds]
+        if previous is not None and not changed and not removed:
+            return
+        self._source_odds[match_id] = dict(odds)
+        self._source_topics[match_id] = topics
+        event = {"op": "delta", "match_id": match_id, "odds": changed}
+        if removed:
+            event["removed"] = removed
+        self._emit_delta(event, topics)
+
+    def _emit_delta(self, event: dict, topics: FrozenSet[str]):
+        self._source_seq += 1
+        event["seq"] = self._source_seq
+        event["topics"] = sorted(topics)
+        self.emit(event)
+
+    def apply(self, event: dict):
+        """Apply a delta from the leader and forward it, unchanged, to subscribers."""
+        match_id = event["match_id"]
+        topics = frozenset(event["topics"])
+        if event["op"] == "remove":
+            self.items.pop(match_id, None)
+            self.item_topics.pop(match_id, None)
+            delta = {"type": "remove", "match_id": match_id}
+        else:
+            odds = self.items.setdefault(match_id, {})
+            odds.update(event["odds"])
+            for selection in event.get("removed", ()):
+                odds.pop(selection, None)
+            self.item_topics[match_id] = topics
+            delta = {"type": "delta", "match_id": match_id, "odds": event["odds"]}
+            if event.get("removed"):
+                delta["removed"] = event["removed"]
+        self.seq = event["seq"]
+        delta["seq"] = self.seq
+        message = LiveFrame(delta)
+        self._snapshot = None
+        self._history.append((self.seq, topics, message))
+        for listener in self.listeners:
+            try:
+                listener(match_id, self.items.get(match_id))
+            except Exception as e:
+                logger.error(f"Odds listener failed for match {match_id}: {e}")
+        # Deltas are not keyed: each one only carries what changed, so none can be coalesced away
+        self.publish(message, topics)
+
+    def promote(self):
+        """Continue the board and sequence this worker already follows when it becomes leader."""
+        self._source_odds = {match_id: dict(odds) for match_id, odds in self.items.items()}
+        self._source_topics = dict(self.item_topics)
+        self._source_seq = max(self._source_seq, self.seq)
+
+    async def bootstrap(self):
+        for match in await self.fetch():
+            match_id = str(match["_id"])
+            self.items[match_id] = match.get("odds") or {}
+            self.item_topics[match_id] = self.topics_for(match)
+
+    async def fetch(self) -> List[dict]:
+        # The whole board: a capped read would return an arbitrary subset each time, and the
+        # matches left out would be removed and re-added on every refresh
+        return await self.collection.find(
+            self.query, {"odds": 1, "sport": 1, "category": 1, "league": 1}
+        ).to_list(length=None)
+
+    async def refresh(self):
+        """Diff the live matches against the last emitted board and emit deltas."""
+        matches = {str(match["_id"]): match for match in await self.fetch()}
+        for match_id in [match_id for match_id in self._source_odds if match_id not in matches]:
+            self.push(match_id, None)
+        for match_id, match in matches.items():
+            self.refresh_document(match_id, match)
+
+    def refresh_document(self, match_id: str, match: Optional[dict]):
+        """Emit the delta of one changed match, or take it off the board once it is no longer live."""
+        if match is None:
+            self.push(match_id, None)
+            return
+        self._source_topics[match_id] = self.topics_for(match)
+        # Ticks waiting in the odds writer are newer than what Mongo holds
+        pending = self.writer.latest(match_id) if self.writer is not None else None
+        self.push(match_id, pending if pending is not None else match.get("odds") or {})
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OddsWriter:
+    """
+    Coalesces bursty in-play odds ticks before they reach Mongo.
+
+    Every tick is pushed to the odds stream straight away, but only the latest
+    odds per match are kept for the database and written in one unordered
+    bulk_write every ``interval`` seconds, or sooner once ``batch_size``
+    matches are waiting. Dozens of ticks per second on a match become one
+    write per flush.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, stream: Any = None,
+                 interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.collection = collection
+        self.stream = stream  # OddsStream fed on every tick (leader side)
+        self.interval = interval or settings.ODDS_FLUSH_INTERVAL
+        self.batch_size = batch_size or settings.ODDS_FLUSH_BATCH
+        self._pending: Dict[str, Dict[str, float]] = {}  # match_id -> latest odds not yet written
+        self._flushing: Dict[str, Dict[str, float]] = {}  # Batch currently being written
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        if stream is not None:
+            stream.writer = self
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def submit(self, match_id: Any, odds: Dict[str, float]):
+        """Record a tick: publish it now, write it with the next flush."""
+        match_id = str(match_id)
+        self._pending[match_id] = odds
+        if self.stream is not None:
+            self.stream.push(match_id, odds)
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    def latest(self, match_id: str) -> Optional[Dict[str, float]]:
+        """Odds submitted for a match that may not be in Mongo yet."""
+        odds = self._pending.get(match_id)
+        return odds if odds is not None else self._flushing.get(match_id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        self._flushing, self._pending = self._pending, {}
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": ObjectId(match_id) if ObjectId.is_valid(match_id) else match_id},
+                      {"$set": {"odds": odds, "last_updated": now}})
+            for match_id, odds in self._flushing.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Failed to flush odds for {len(operations)} matches: {e}")
+            # Keep the batch unless a newer tick arrived meanwhile
+            for match_id, odds in self._flushing.items():
+                self._pending.setdefault(match_id, odds)
+        finally:
+            self._flushing = {}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
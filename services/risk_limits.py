@@ -0,0 +1,166 @@
+import logging
+from math import floor
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+from services.exposure import DEFAULT_MARKET, ExposureBook, Key
+from services.live_bus import LiveBus
+
+logger = logging.getLogger(__name__)
+
+# Limit profiles are stored by _id '<scope>:<key>': 'market:<match_id>', 'market:<market>',
+# 'user:<user_id>', with 'market:default' and 'user:default' applying to everything else
+SCOPES = ("market", "user")
+DEFAULT_KEY = "default"
+LIMIT_FIELDS = ("max_stake", "max_payout")
+
+
+class Reservation:
+    """Liability and payout a checked bet holds against the limits until it is counted in the exposure book."""
+    __slots__ = ("key", "user_id", "liability", "payout")
+
+    def __init__(self, key: Key, user_id: str, liability: float, payout: float):
+        self.key = key
+        self.user_id = user_id
+        self.liability = liability
+        self.payout = payout
+
+
+class RiskLimits:
+    """
+    Per-market and per-user maximum stake and maximum payout, held in memory
+    and checked against the exposure book's counters, so a bet is checked
+    without any DB round-trip.
+
+    Market limits cap the stake of one bet and the liability of a selection;
+    user limits cap the stake of one bet and the potential payout of all the
+    user's open bets. Profiles are loaded once at startup; admin changes are
+    written to Mongo and pushed to every worker over the live bus.
+
+    A bet that passes ``check`` is reserved against the limits there and then,
+    before its caller awaits anything, so concurrent bets (and in-play bets
+    parked on the delay) cannot all pass against the same headroom. The
+    caller releases the reservation once the bet is in the exposure book or
+    has been rejected.
+    """
+
+    def __init__(self, exposure: ExposureBook, channel: str = "risk_limits"):
+        self.exposure = exposure
+        self.channel = channel
+        self.bus: Optional[LiveBus] = None
+        self.collection = None
+        self._profiles: Dict[str, Dict[str, Optional[float]]] = {}  # '<scope>:<key>' -> limits
+        self._reserved: Dict[Key, float] = {}  # (match_id, market, selection) -> liability of checked bets
+        self._reserved_payouts: Dict[str, float] = {}  # user_id -> potential payout of checked bets
+
+    async def start(self, db: Any, bus: Optional[LiveBus] = None):
+        self.collection = db["risk_limits"]
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.channel, self.apply)
+        async for profile in self.collection.find():
+            self._profiles[profile["_id"]] = {field: profile.get(field) for field in LIMIT_FIELDS}
+        logger.info(f"Loaded {len(self._profiles)} risk limit profiles")
+
+    async def stop(self):
+        """Drop the profiles (reloaded by the next start) and any reservation left behind."""
+        self._profiles.clear()
+        self._reserved.clear()
+        self._reserved_payouts.clear()
+
+    def profiles(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return dict(self._profiles)
+
+    async def set_profile(self, scope: str, key: str, limits: Dict[str, Optional[float]]):
+        """Save a profile and hot-reload it on every worker."""
+        profile_id = profile_key(scope, key)
+        limits = {field: limits.get(field) for field in LIMIT_FIELDS}
+        await self.collection.update_one({"_id": profile_id}, {"$set": limits}, upsert=True)
+        self._publish({"op": "set", "id": profile_id, "limits": limits})
+
+    async def delete_profile(self, scope: str, key: str) -> bool:
+        profile_id = profile_key(scope, key)
+        result = await self.collection.delete_one({"_id": profile_id})
+        self._publish({"op": "delete", "id": profile_id})
+        return result.deleted_count > 0
+
+    def _publish(self, event: dict):
+        if self.bus is None:
+            self.apply(event)
+        else:
+            self.bus.publish(self.channel, event)
+
+    def apply(self, event: dict):
+        if event["op"] == "set":
+            self._profiles[event["id"]] = event["limits"]
+        elif event["op"] == "delete":
+            self._profiles.pop(event["id"], None)
+
+    def _limit(self, field: str, *profile_ids: str) -> Optional[float]:
+        """The first profile (most specific first) that sets ``field``."""
+        for profile_id in profile_ids:
+            value = self._profiles.get(profile_id, {}).get(field)
+            if value is not None:
+                return value
+        return None
+
+    def max_stake(self, user_id: str, match_id: str, selection: str, odds: Optional[float],
+                  market: str = DEFAULT_MARKET) -> Optional[float]:
+        """Largest stake the limits allow on this bet right now, or None when nothing limits it."""
+        market_ids = (f"market:{match_id}", f"market:{market}", f"market:{DEFAULT_KEY}")
+        user_ids = (f"user:{user_id}", f"user:{DEFAULT_KEY}")
+        odds = odds if odds is not None and odds > 1.0 else None
+        allowed = []
+        for limit in (self._limit("max_stake", *market_ids), self._limit("max_stake", *user_ids)):
+            if limit is not None:
+                allowed.append(limit)
+        max_liability = self._limit("max_payout", *market_ids)
+        if max_liability is not None and odds is not None:
+            liability = self.exposure.get(match_id, selection, market)["liability"]
+            liability += self._reserved.get((match_id, market, selection), 0.0)
+            allowed.append((max_liability - liability) / (odds - 1))
+        max_payout = self._limit("max_payout", *user_ids)
+        if max_payout is not None:
+            payout = self.exposure.user(user_id)["payout"] + self._reserved_payouts.get(user_id, 0.0)
+            allowed.append((max_payout - payout) / (odds or 1.0))
+        if not allowed:
+            return None
+        # Round down to whole cents so the offered stake always passes
+        return max(floor(min(allowed) * 100) / 100, 0.0)
+
+    def check(self, user_id: str, match_id: str, selection: str, stake: float, odds: Optional[float],
+              market: str = DEFAULT_MARKET) -> Reservation:
+        """
+        Reject a bet over the limits, with the maximum stake the client can
+        re-offer; otherwise reserve it until ``release``.
+        """
+        user_id, match_id = str(user_id), str(match_id)
+        allowed = self.max_stake(user_id, match_id, selection, odds, market)
+        if allowed is not None and stake > allowed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "Stake exceeds the risk limits for this bet", "max_stake": allowed},
+            )
+        odds = odds if odds is not None and odds > 1.0 else 1.0
+        reservation = Reservation((match_id, market, selection), user_id, stake * (odds - 1), stake * odds)
+        self._reserved[reservation.key] = self._reserved.get(reservation.key, 0.0) + reservation.liability
+        self._reserved_payouts[user_id] = self._reserved_payouts.get(user_id, 0.0) + reservation.payout
+        return reservation
+
+    def release(self, reservation: Reservation):
+        """Drop a reservation once its bet is counted in the exposure book, or was not placed."""
+        if reservation.liability is None:
+            return  # Already released
+        for reserved, key, amount in ((self._reserved, reservation.key, reservation.liability),
+                                      (self._reserved_payouts, reservation.user_id, reservation.payout)):
+            remaining = reserved.get(key, 0.0) - amount
+            if remaining > 1e-9:
+                reserved[key] = remaining
+            else:
+                reserved.pop(key, None)
+        reservation.liability = reservation.payout = None
+
+
+def profile_key(scope: str, key: str) -> str:
+    if scope not in SCOPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown limit scope: {scope}")
+    return f"{scope}:{key}"
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateMany, UpdateOne
+from core.config import settings
+from services.exposure import DEFAULT_MARKET
+from services.live_bus import LiveBus
+
+logger = logging.getLogger(__name__)
+
+# Outcome codes; bets on markets the result does not cover stay pending
+PENDING, LOST, WON, VOID = 0, 1, 2, 3
+OUTCOME_STATUS = {LOST: "lost", WON: "won", VOID: "void"}
+RUNNING, COMPLETED = "running", "completed"
+# Attempts at a batch whose bets changed under it (e.g. a cash-out) before the job fails
+BATCH_ATTEMPTS = 5
+
+BET_FIELDS = {"user_id": 1, "market": 1, "selection": 1, "team": 1, "amount": 1, "odds": 1}
+
+
+class BatchChanged(Exception):
+    """Some bets of a batch left 'pending' between the read and the write; the batch is retried."""
+
+
+def outcome_of(market: str, selection: str, winners: Dict[str, Sequence[str]],
+               void_markets: Sequence[str] = (), void: bool = False) -> int:
+    if void or market in void_markets:
+        return VOID
+    if market in winners:
+        return WON if selection in winners[market] else LOST
+    return PENDING
+
+
+def compute_outcomes(pairs: List[Tuple[str, str]], pair_codes: np.ndarray, winners: Dict[str, Sequence[str]],
+                     void_markets: Sequence[str] = (), void: bool = False) -> np.ndarray:
+    """
+    Outcome code per bet. Each distinct (market, selection) of the batch is
+    decided once and the codes are gathered for every bet in one step.
+    ``winners`` maps a market to its winning selections; markets in
+    ``void_markets`` (or every market, with ``void``) return the stakes.
+    """
+    table = np.array([outcome_of(market, selection, winners, void_markets, void) for market, selection in pairs],
+                     dtype=np.int8)
+    return table[pair_codes] if len(table) else np.zeros(len(pair_codes), dtype=np.int8)
+
+
+def compute_payouts(outcomes: np.ndarray, amounts: np.ndarray, odds: np.ndarray) -> np.ndarray:
+    """Stake * odds for winners, the stake back for voids, nothing otherwise."""
+    return np.select([outcomes == WON, outcomes == VOID], [amounts * odds, amounts], 0.0)
+
+
+def aggregate_by_user(users: List[Any], user_codes: np.ndarray, values: np.ndarray) -> Dict[Any, float]:
+    """Sum of ``values`` per user, keeping only the users with a non-zero total."""
+    totals = np.bincount(user_codes, weights=values, minlength=len(users))
+    return {user: float(total) for user, total in zip(users, totals.tolist()) if total}
+
+
+def bet_arrays(bets: List[dict]) -> Dict[str, Any]:
+    """
+    Columns of a batch of bet documents, read in one pass. Users and
+    (market, selection) pairs are factorized: ``users`` and ``pairs`` list the
+    distinct values and ``user_codes`` / ``pair_codes`` index them per bet.
+    """
+    users: Dict[Any, int] = {}
+    pairs: Dict[Tuple[str, str], int] = {}
+    user_codes, pair_codes, amounts, odds = [], [], [], []
+    for bet in bets:
+        user_codes.append(users.setdefault(bet.get("user_id"), len(users)))
+        pair = (bet.get("market") or DEFAULT_MARKET, bet.get("selection") or bet.get("team"))
+        pair_codes.append(pairs.setdefault(pair, len(pairs)))
+        amounts.append(bet.get("amount") or 0)
+        odds.append(bet.get("odds") or 1.0)
+    return {
+        "ids": np.array([bet["_id"] for bet in bets], dtype=object),
+        "users": list(users),
+        "user_codes": np.array(user_codes, dtype=np.int64),
+        "pairs": list(pairs),
+        "pair_codes": np.array(pair_codes, dtype=np.int64),
+        "amounts": np.array(amounts, dtype=np.float64),
+        "odds": np.array(odds, dtype=np.float64),
+    }
+
+
+def match_id_filter(match_id: str) -> Any:
+    # Bets hold the match id as an ObjectId (services.match) or a string (services.bet)
+    if ObjectId.is_valid(match_id):
+        return {"$in": [ObjectId(match_id), match_id]}
+    return match_id
+
+
+def user_key(user_id: Any) -> Any:
+    # services.bet stores the user id as a string, services.match as the ObjectId
+    if isinstance(user_id, str) and ObjectId.is_valid(user_id):
+        return ObjectId(user_id)
+    return user_id
+
+
+class SettlementEngine:
+    """
+    Settles every pending bet on a match from its result.
+
+    Pending bets are streamed through one cursor in ``_id`` order and handled
+    in batches: outcomes and payouts are computed vectorized, bet statuses
+    are written with one ``bulk_write`` (an ``UpdateMany`` per outcome) and
+    winnings and void stakes credited with one aggregated ``$inc`` per user,
+    in a transaction that also records the batch in the job document
+    (``settlements``, one per match). A job that stops part-way resumes after
+    its last committed batch; re-running a completed job changes nothing.
+    """
+
+    def __init__(self, db: Any, batch_size: Optional[int] = None, exposure_book=None, cashout_book=None):
+        self.db = db
+        self.batch_size = batch_size or settings.SETTLEMENT_BATCH_SIZE
+        self.exposure_book = exposure_book
+        self.cashout_book = cashout_book
+        self.jobs: Dict[str, asyncio.Task] = {}  # match_id -> settlement running in this process
+        self._resuming: Optional[asyncio.Task] = None
+
+    async def job(self, match_id: str) -> Optional[dict]:
+        """The settlement job of a match, with its progress, or None if it was never settled."""
+        job = await self.db["settlements"].find_one({"_id": str(match_id)})
+        if job is None:
+            return None
+        job["match_id"] = job.pop("_id")
+        job["last_id"] = str(job["last_id"]) if job.get("last_id") is not None else None
+        job["in_progress"] = job["match_id"] in self.jobs
+        return job
+
+    def start_job(self, match_id: str, winners: Dict[str, List[str]], void_markets: Sequence[str] = (),
+                  void: bool = False) -> asyncio.Task:
+        """Run ``settle`` in the background (once per match per process)."""
+        match_id = str(match_id)
+        task = self.jobs.get(match_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.settle(match_id, winners, void_markets, void))
+            self.jobs[match_id] = task
+            task.add_done_callback(lambda done: self._finished(match_id, done))
+        return task
+
+    def _finished(self, match_id: str, task: asyncio.Task):
+        if self.jobs.get(match_id) is task:
+            del self.jobs[match_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Settlement of match {match_id} failed: {task.exception()}")
+
+    async def start(self, bus: Optional[LiveBus] = None):
+        """Index the settlement scan; the bus leader (or a lone process) resumes unfinished jobs."""
+        await self.db["bets"].create_index([("match_id", 1), ("status", 1), ("_id", 1)])
+        if bus is None:
+            self.resume()
+            return
+        bus.on_leader(self.resume)
+        if bus.is_leader:
+            self.resume()
+
+    async def stop(self):
+        """
+        Cancel the jobs running here. Each batch is one transaction, so a job
+        stays RUNNING after its last committed batch and is resumed from there.
+        """
+        tasks = [task for task in (self._resuming, *self.jobs.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._resuming = None
+
+    def resume(self):
+        """Restart the jobs a stopped process left part-way."""
+        self._resuming = asyncio.create_task(self._resume())
+
+    async def _resume(self):
+        async for job in self.db["settlements"].find({"state": RUNNING}):
+            self.start_job(job["_id"], job["winners"], job.get("void_markets", []), job.get("void", False))
+
+    async def settle(self, match_id: str, winners: Dict[str, List[str]], void_markets: Sequence[str] = (),
+                     void: bool = False) -> dict:
+        match_id = str(match_id)
+        job = await self.claim(match_id, winners, list(void_markets), void)
+        if job["state"] == COMPLETED:
+            return job
+
+        query = {"match_id": match_id_filter(match_id), "status": "pending"}
+        if job.get("last_id") is not None:
+            query["_id"] = {"$gt": job["last_id"]}
+        logger.info(f"Settling match {match_id}" + (f", resuming after {job['last_id']}" if job.get("last_id") else ""))
+        cursor = self.db["bets"].find(query, BET_FIELDS).sort("_id", 1).batch_size(self.batch_size)
+        batch = []
+        async for bet in cursor:
+            batch.append(bet)
+            if len(batch) >= self.batch_size:
+                await self._settle_batch(match_id, job, batch)
+                batch = []
+        if batch:
+            await self._settle_batch(match_id, job, batch)
+
+        return await self.db["settlements"].find_one_and_update(
+            {"_id": match_id},
+            {"$set": {"state": COMPLETED, "completed_at": datetime.utcnow()}},
+            return_document=True,
+        )
+
+    async def claim(self, match_id: str, winners: Dict[str, List[str]], void_markets: List[str], void: bool) -> dict:
+        """
+        Create the job, or pick up the existing one if it is for the same
+        result. A completed job given results for further markets is reopened
+        for them; a result that contradicts the recorded one is rejected.
+        """
+        result = {"winners": winners, "void_markets": void_markets, "void": void}
+        job = await self.db["settlements"].find_one_and_update(
+            {"_id": match_id},
+            {"$setOnInsert": {**result, "state": RUNNING, "last_id": None, "bets": 0, "won": 0, "lost": 0,
+                              "voided": 0, "credited": 0.0, "started_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=True,
+        )
+        if all(job.get(field) == value for field, value in result.items()):
+            return job
+
+        merged_winners = {**job["winners"], **winners}
+        merged_void = sorted(set(job.get("void_markets", [])) | set(void_markets))
+        if (job["state"] != COMPLETED or job.get("void") != void
+                or any(job["winners"][market] != winners[market] for market in set(job["winners"]) & set(winners))
+                or set(merged_winners) & set(merged_void)):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This match is already being settled with a different result",
+            )
+        # Only bets still pending are read again, so the markets settled before are not touched
+        reopened = await self.db["settlements"].find_one_and_update(
+            {"_id": match_id, "state": COMPLETED, "winners": job["winners"], "void_markets": job.get("void_markets", [])},
+            {"$set": {"winners": merged_winners, "void_markets": merged_void, "state": RUNNING, "last_id": None}},
+            return_document=True,
+        )
+        if reopened is None:
+            return await self.claim(match_id, winners, void_markets, void)
+        return reopened
+
+    async def _settle_batch(self, match_id: str, job: dict, batch: List[dict]):
+        for attempt in range(BATCH_ATTEMPTS):
+            try:
+                settled, columns = await self._commit_batch(match_id, job, batch)
+                break
+            except BatchChanged:
+                # Re-read the batch: only the bets still pending are settled
+                ids = [bet["_id"] for bet in batch]
+                batch = await self.db["bets"].find(
+                    {"_id": {"$in": ids}, "status": "pending"}, BET_FIELDS
+                ).sort("_id", 1).to_list(length=None)
+                if not batch:
+                    return
+        else:
+            raise RuntimeError(f"Batch of match {match_id} kept changing during settlement")
+        self._update_books(match_id, settled, columns)
+
+    async def _commit_batch(self, match_id: str, job: dict, batch: List[dict]):
+        columns = bet_arrays(batch)
+        outcomes = compute_outcomes(columns["pairs"], columns["pair_codes"], job["winners"],
+                                    job.get("void_markets", []), job.get("void", False))
+        payouts = compute_payouts(outcomes, columns["amounts"], columns["odds"])
+        credits = aggregate_by_user(columns["users"], columns["user_codes"], payouts)
+        now = datetime.utcnow()
+
+        bet_writes, expected = [], []
+        for outcome, payout in ((WON, {"$multiply": ["$amount", {"$ifNull": ["$odds", 1]}]}), (LOST, 0), (VOID, "$amount")):
+            ids = columns["ids"][outcomes == outcome].tolist()
+            if ids:
+                # Pipeline update: each bet's payout comes from its own stake and odds
+                bet_writes.append(UpdateMany(
+                    {"_id": {"$in": ids}, "status": "pending"},
+                    [{"$set": {"status": OUTCOME_STATUS[outcome], "payout": payout, "settled_at": now}}],
+                ))
+                expected.append(len(ids))
+        user_writes = [UpdateOne({"_id": user_key(user_id)}, {"$inc": {"balance": amount}})
+                       for user_id, amount in credits.items()]
+        last_id = batch[-1]["_id"]
+        counts = {"bets": int(np.count_nonzero(outcomes)), "won": int(np.count_nonzero(outcomes == WON)),
+                  "lost": int(np.count_nonzero(outcomes == LOST)), "voided": int(np.count_nonzero(outcomes == VOID)),
+                  "credited": float(payouts.sum())}
+
+        async def write(session):
+            if bet_writes:
+                result = await self.db["bets"].bulk_write(bet_writes, ordered=True, session=session)
+                if result.modified_count != sum(expected):
+                    raise BatchChanged()
+            if user_writes:
+                await self.db["users"].bulk_write(user_writes, ordered=False, session=session)
+            # Recorded with the batch, so a resumed job starts after it and never credits it twice
+            await self.db["settlements"].update_one(
+                {"_id": match_id}, {"$set": {"last_id": last_id}, "$inc": counts}, session=session
+            )
+
+        async with await self.db.client.start_session() as session:
+            await session.with_transaction(write)
+        return outcomes != PENDING, columns
+
+    def _update_books(self, match_id: str, settled: np.ndarray, columns: Dict[str, Any]):
+        """Take the settled bets off the exposure and cash-out books."""
+        if not settled.any():
+            return
+        if self.cashout_book is not None:
+            self.cashout_book.close_many([str(bet_id) for bet_id in columns["ids"][settled]])
+        if self.exposure_book is not None:
+            users, pairs = columns["users"], columns["pairs"]
+            self.exposure_book.remove_many([
+                {"match_id": match_id, "user_id": users[user], "market": pairs[pair][0], "selection": pairs[pair][1],
+                 "amount": amount, "odds": odds}
+                for user, pair, amount, odds in zip(
+                    columns["user_codes"][settled].tolist(), columns["pair_codes"][settled].tolist(),
+                    columns["amounts"][settled].tolist(), columns["odds"][settled].tolist(),
+                )
+            ])
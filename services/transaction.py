@@ -5,6 +5,12 @@ from pymongo.errors import PyMongoError
 from fastapi import HTTPException
 from pymongo import MongoClient
 
+# Keyset order of transaction listings (newest first) and the indexes behind it
+TRANSACTION_ORDER = [("created_at", -1), ("_id", -1)]
+INDEXES = {
+    "transactions": [[("user_id", 1), *TRANSACTION_ORDER], TRANSACTION_ORDER],
+}
+
 class TransactionService:
     def __init__(self, db: MongoClient):  # Corrected the type hint for db
         self.collection = db["transactions"]  # Use your transactions collection name
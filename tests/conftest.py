@@ -0,0 +1,4 @@
+import os
+
+# Importing the app's modules builds the Mongo client from settings; keep it local (nothing connects)
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
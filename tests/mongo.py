@@ -0,0 +1,41 @@
+from mongomock_motor import AsyncMongoMockClient
+
+# Collections a FakeSession restores when its transaction callback raises
+TRANSACTIONAL = ("users", "bets", "settlements")
+
+
+class FakeSession:
+    """
+    mongomock has no transactions: run the callback directly, and undo its
+    writes to the TRANSACTIONAL collections if it raises, as an abort would.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def with_transaction(self, callback):
+        snapshot = {name: await self.db[name].find().to_list(length=None) for name in TRANSACTIONAL}
+        try:
+            return await callback(None)
+        except BaseException:
+            for name, documents in snapshot.items():
+                await self.db[name].delete_many({})
+                if documents:
+                    await self.db[name].insert_many(documents)
+            raise
+
+
+def make_db(name: str = "test"):
+    db = AsyncMongoMockClient()[name]
+
+    async def start_session():
+        return FakeSession(db)
+
+    db.client.start_session = start_session
+    return db
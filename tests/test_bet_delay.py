@@ -0,0 +1,43 @@
+import asyncio
+from services.bet_delay import BetDelayQueue
+
+
+class Odds:
+    def __init__(self, books):
+        self.books = books
+
+    def get(self, match_id):
+        return self.books.get(match_id)
+
+
+class Socket:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, frame):
+        self.frames.append(frame.payload)
+
+
+def test_stop_decides_bets_still_parked():
+    async def run():
+        queue = BetDelayQueue(Odds({"m1": ("live", {"home": 2.0, "away": 1.5})}), delay=60.0, tick=0.01)
+        socket = Socket()
+        queue.watch("u1", socket)
+        queue.start()
+        committed, released = [], []
+
+        async def commit(price):
+            committed.append(price)
+            return {"bet_id": "b1"}
+
+        accepted = queue.park("u1", "m1", "home", 2.0, None, commit, release=lambda: released.append("home"))
+        rejected = queue.park("u1", "m1", "away", 1.8, None, commit, release=lambda: released.append("away"))
+        await queue.stop()
+        assert len(queue) == 0
+        assert committed == [2.0] and released == ["away"]
+        assert socket.frames == [{"type": "bets", "results": [
+            {"ticket": rejected["ticket"], "status": "rejected", "detail": "Odds have changed", "odds": 1.5},
+            {"ticket": accepted["ticket"], "status": "accepted", "bet_id": "b1"},
+        ]}]
+
+    asyncio.run(run())
@@ -0,0 +1,135 @@
+import asyncio
+from bson import ObjectId
+from fastapi import HTTPException
+import pytest
+from schemas.match import PlaceBetRequest
+from services.bet_queue import BetCommitQueue
+from services.exposure import ExposureBook
+from services.match import MatchService
+from services.risk_limits import RiskLimits
+from tests.mongo import FakeSession, make_db
+
+
+async def seed_users(db, *balances):
+    users = [ObjectId() for _ in balances]
+    await db["users"].insert_many([{"_id": user_id, "balance": balance} for user_id, balance in zip(users, balances)])
+    return users
+
+
+async def balance(db, user_id):
+    return (await db["users"].find_one({"_id": user_id}))["balance"]
+
+
+def bet(user_id, amount):
+    return {"user_id": user_id, "match_id": ObjectId(), "amount": amount, "team": "home", "odds": 2.0,
+            "status": "pending"}
+
+
+def counting_sessions(db):
+    sessions = []
+
+    async def start_session():
+        sessions.append(1)
+        return FakeSession(db)
+
+    db.client.start_session = start_session
+    return sessions
+
+
+def test_batch_commits_in_one_transaction_and_rejects_overdrafts():
+    async def run():
+        db = make_db("bet_queue_test")
+        rich, poor = await seed_users(db, 100.0, 15.0)
+        sessions = counting_sessions(db)
+        queue = BetCommitQueue(db, interval=0.01, max_batch=10)
+        queue.start()
+        results = await asyncio.gather(
+            queue.submit(bet(rich, 30.0)), queue.submit(bet(poor, 10.0)), queue.submit(bet(rich, 50.0)),
+            queue.submit(bet(poor, 10.0)),  # Only 5 left once the first is counted
+            return_exceptions=True,
+        )
+        await queue.stop()
+        assert [isinstance(result, ObjectId) for result in results] == [True, True, True, False]
+        assert isinstance(results[3], HTTPException) and results[3].detail == "Insufficient funds"
+        assert len(sessions) == 1
+        assert (await balance(db, rich), await balance(db, poor)) == (20.0, 5.0)
+        assert await db["bets"].count_documents({}) == 3
+
+    asyncio.run(run())
+
+
+def test_balance_changed_retries_with_fresh_balances():
+    async def run():
+        db = make_db("bet_queue_test")
+        user, = await seed_users(db, 50.0)
+        drained = []
+
+        class DrainingSession(FakeSession):
+            async def with_transaction(self, callback):
+                if not drained:
+                    # Another debit lands between the batch's balance read and its write
+                    drained.append(1)
+                    await db["users"].update_one({"_id": user}, {"$inc": {"balance": -30.0}})
+                return await super().with_transaction(callback)
+
+        async def start_session():
+            return DrainingSession(db)
+
+        db.client.start_session = start_session
+        queue = BetCommitQueue(db, interval=0.01, max_batch=10)
+        first, second = bet(user, 15.0), bet(user, 15.0)
+        futures = [asyncio.ensure_future(queue.submit(first)), asyncio.ensure_future(queue.submit(second))]
+        await asyncio.sleep(0)
+        await queue.flush()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        # Retried against the 20 left: the first bet fits, the second no longer does
+        assert results[0] == first["_id"] and isinstance(results[1], HTTPException)
+        assert await balance(db, user) == 5.0
+        assert await db["bets"].count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_submissions_are_skipped():
+    async def run():
+        db = make_db("bet_queue_test")
+        user, = await seed_users(db, 50.0)
+        queue = BetCommitQueue(db, interval=0.01, max_batch=10)
+        kept = asyncio.ensure_future(queue.submit(bet(user, 10.0)))
+        dropped = asyncio.ensure_future(queue.submit(bet(user, 10.0)))
+        await asyncio.sleep(0)
+        dropped.cancel()
+        await asyncio.sleep(0)
+        await queue.flush()
+        assert isinstance(await kept, ObjectId) and dropped.cancelled()
+        assert await balance(db, user) == 40.0
+        assert await db["bets"].count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_placement_still_reaches_the_books():
+    async def run():
+        db = make_db("bet_queue_test")
+        user, = await seed_users(db, 50.0)
+        match_id = ObjectId()
+        await db["matches"].insert_one({"_id": match_id, "status": "open", "odds": {"home": 2.0}})
+        exposure = ExposureBook()
+        limits = RiskLimits(exposure)
+        limits.apply({"op": "set", "id": "market:default", "limits": {"max_stake": None, "max_payout": 100.0}})
+        queue = BetCommitQueue(db, interval=0.05, max_batch=10)
+        queue.start()
+        service = MatchService(db["matches"], db, exposure_book=exposure, risk_limits=limits, bet_queue=queue)
+        placing = asyncio.ensure_future(
+            service.place_bet(str(user), PlaceBetRequest(match_id=str(match_id), amount=20.0, team="home")))
+        await asyncio.sleep(0.01)
+        placing.cancel()  # The client goes away while its bet waits for the batch
+        with pytest.raises(asyncio.CancelledError):
+            await placing
+        await queue.stop()
+        await asyncio.sleep(0)
+        assert await balance(db, user) == 30.0
+        assert exposure.get(str(match_id), "home")["liability"] == 20.0
+        assert limits._reserved == {}
+
+    asyncio.run(run())
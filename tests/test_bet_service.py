@@ -0,0 +1,23 @@
+import asyncio
+from types import SimpleNamespace
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from api.bets import get_listing_service
+from schemas.match import PlaceBetRequest
+from services.odds_book import OddsBook
+
+
+def test_listing_service_takes_bets_from_the_odds_book():
+    async def run():
+        db = AsyncMongoMockClient()["bet_service_test"]
+        match_id = str(ObjectId())  # Not in Mongo: validated from memory only
+        odds_book = OddsBook()
+        odds_book.apply({"op": "set", "match_id": match_id, "status": "live", "odds": {"home": 2.2}})
+        request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(odds_book=odds_book)))
+        service = get_listing_service(request, db)
+        assert service.odds_book is odds_book
+        placed = await service.place_bet(str(ObjectId()), PlaceBetRequest(match_id=match_id, amount=5.0, team="home"))
+        bet = await db["bets"].find_one({"_id": ObjectId(placed["bet_id"])})
+        assert bet["odds"] == 2.2
+
+    asyncio.run(run())
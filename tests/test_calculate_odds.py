@@ -0,0 +1,57 @@
+import math
+import numpy as np
+import pytest
+import utils.calculate_odds as calculate_odds
+from utils.calculate_odds import (
+    american_to_decimal_batch, convert_board, convert_odds_batch, decimal_to_american, decimal_to_american_batch,
+    decimal_to_fractional, decimal_to_fractional_batch, fractional_to_decimal_batch, implied_probability_batch,
+)
+
+BOARD = [2.5, 1.333, 2.3, 1.0001, 1.0, 0.5, float("nan"), float("inf"), 1001.0]
+
+
+def test_batch_matches_the_scalar_conversions():
+    converted = convert_odds_batch(BOARD)
+    assert converted["valid"].tolist() == [True, True, True, True, False, False, False, False, True]
+    for i, odds in enumerate(BOARD):
+        if converted["valid"][i]:
+            assert converted["fractional"][i] == decimal_to_fractional(odds)
+            assert converted["american"][i] == decimal_to_american(odds)
+        else:
+            assert converted["fractional"][i] == "" and converted["american"][i] == 0
+            assert math.isnan(converted["decimal"][i]) and math.isnan(converted["implied_probability"][i])
+
+
+def test_fraction_parts():
+    fractions = decimal_to_fractional_batch([2.5, 1.333, 0.5])
+    assert fractions["numerator"].tolist() == [3, 1, 0]
+    assert fractions["denominator"].tolist() == [2, 3, 1]
+    assert fractions["label"].tolist() == ["6/4", "1/3", ""]
+
+
+def test_one_unpriceable_value_only_masks_itself(monkeypatch):
+    real_price = calculate_odds.price
+
+    def flaky_price(odds):
+        if odds == 2.31:
+            raise ZeroDivisionError
+        return real_price(odds)
+
+    monkeypatch.setattr(calculate_odds, "price", flaky_price)
+    converted = convert_odds_batch([2.31, 2.3, 2.5])
+    assert converted["valid"].tolist() == [False, True, True]
+    assert converted["fractional"].tolist() == ["", "13/10", "6/4"]
+    assert decimal_to_american_batch([2.31, 2.5])["american"].tolist() == [0, 150]
+
+
+def test_other_batches_mask_instead_of_raising():
+    assert np.allclose(fractional_to_decimal_batch([3, 1], [2, 0])["decimal"][:1], [2.5])
+    assert fractional_to_decimal_batch([3, 1], [2, 0])["valid"].tolist() == [True, False]
+    assert american_to_decimal_batch([150, -150, 0])["valid"].tolist() == [True, True, False]
+    assert np.allclose(implied_probability_batch([2.5, 4.0])["probability"], [40.0, 25.0])
+
+
+def test_convert_board():
+    board = convert_board({"m1": {"home": 2.5, "away": 1.0}})
+    assert board["m1"]["home"]["fractional"] == "6/4"
+    assert board["m1"]["away"] == {"decimal": None, "fractional": None, "american": None, "implied_probability": None}
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from services.cashout import CashoutBook
+
+
+def test_start_loads_in_bulk_and_quotes():
+    async def run():
+        db = AsyncMongoMockClient()["cashout_test"]
+        match_id = ObjectId()
+        await db["bets"].insert_many([
+            {"user_id": ObjectId(), "match_id": match_id, "team": "home", "amount": float(i + 1), "odds": 2.0,
+             "status": "pending"}
+            for i in range(50)
+        ] + [{"user_id": ObjectId(), "match_id": match_id, "team": "away", "amount": 10.0, "odds": None,
+              "status": "pending"}])
+        book = CashoutBook(margin=0.1)
+        await book.start(db, {str(match_id): {"home": 4.0}})
+        assert len(book) == 50
+        bets = await db["bets"].find({"team": "home"}).to_list(length=None)
+        quote = book.quote(str(bets[9]["_id"]))
+        assert quote["offer"] == pytest.approx(10.0 * 2.0 * 0.9 / 4.0)
+        return book, match_id, bets
+
+    book, match_id, bets = asyncio.run(run())
+    book.on_odds(str(match_id), {"home": 2.0})
+    assert book.quote(str(bets[9]["_id"]))["offer"] == pytest.approx(9.0)
+    book.on_odds(str(match_id), {})
+    assert not book.quote(str(bets[9]["_id"]))["available"]
+
+
+def test_add_and_remove_keep_offers_aligned():
+    book = CashoutBook(margin=0.0)
+    book.odds = {"m": {"home": 2.0}}
+    for i in range(20):  # Grows past the initial capacity
+        book.track({"bet_id": f"b{i}", "user_id": "u", "match_id": "m", "team": "home",
+                    "amount": float(i + 1), "odds": 3.0})
+    for i in range(0, 20, 3):
+        book.close(f"b{i}")
+    for i in range(20):
+        quote = book.quote(f"b{i}")
+        if i % 3 == 0:
+            assert quote is None
+        else:
+            assert quote["offer"] == pytest.approx((i + 1) * 3.0 / 2.0)
+    book.close_many([f"b{i}" for i in range(20)])
+    assert len(book) == 0 and book._selections == {}
@@ -0,0 +1,73 @@
+import asyncio
+from services.connections import ConnectionRegistry
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+        self.reason = reason
+
+
+def test_sweep_reaps_only_clients_that_stop_answering_pings():
+    async def run():
+        registry = ConnectionRegistry(heartbeat_interval=1.0, heartbeat_timeout=0.05)
+        listener = registry.register(FakeWebSocket())
+        answering = registry.register(FakeWebSocket())
+        silent = registry.register(FakeWebSocket())
+        answering.touch()
+        silent.touch()
+        await registry.sweep()  # Pings everyone
+        await asyncio.sleep(0.1)
+        assert listener.websocket.sent and listener.ping_sent is not None
+        answering.touch()  # Pong
+        await registry.sweep()
+        assert set(registry.connections) == {listener.id, answering.id}
+        assert silent.websocket.closed_with == 1000
+        await registry.stop()
+
+    asyncio.run(run())
+
+
+class StalledWebSocket(FakeWebSocket):
+    async def close(self, code=1000, reason=None):
+        await asyncio.sleep(0.2)  # Close frame stuck behind a full socket buffer
+        await super().close(code, reason)
+
+
+def test_overflow_without_resync_closes_the_connection():
+    async def run():
+        registry = ConnectionRegistry()
+        connection = registry.register(FakeWebSocket())
+        connection.max_queue = 2
+        for result in range(4):  # Sent before the writer task gets to run
+            connection.send({"type": "bets", "result": result})
+        await asyncio.sleep(0.01)
+        assert connection.closed.is_set() and connection.websocket.sent == []
+        assert connection.websocket.closed_with == 1008 and "resync" in connection.websocket.reason
+
+    asyncio.run(run())
+
+
+def test_sweep_closes_connections_together():
+    async def run():
+        registry = ConnectionRegistry(heartbeat_interval=1.0, heartbeat_timeout=0.01)
+        stale = [registry.register(StalledWebSocket()) for _ in range(5)]
+        for connection in stale:
+            connection.touch()
+            connection.ping_sent = 0.0
+        started = asyncio.get_running_loop().time()
+        await registry.sweep()
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert len(registry) == 0 and all(connection.websocket.closed_with == 1000 for connection in stale)
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import asyncio
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from services.exposure import ExposureBook
+from services.live_bus import InProcessBus
+
+
+def test_rebuild_groups_by_selection_and_user():
+    async def run():
+        db = AsyncMongoMockClient()["exposure_test"]
+        users = [ObjectId(), ObjectId()]
+        match_id = ObjectId()
+        await db["bets"].insert_many([
+            {"user_id": users[0], "match_id": match_id, "team": "home", "amount": 10.0, "odds": 2.0,
+             "status": "pending"},
+            {"user_id": users[1], "match_id": match_id, "team": "home", "amount": 5.0, "odds": 3.0,
+             "status": "pending"},
+            {"user_id": users[1], "match_id": match_id, "market": "goals", "selection": "over", "amount": 4.0,
+             "odds": 1.5, "status": "pending"},
+            {"user_id": users[0], "match_id": match_id, "team": "away", "amount": 50.0, "odds": 2.0,
+             "status": "won"},
+        ])
+        book = ExposureBook()
+        book._users["stale"] = [1.0, 1.0, 1]
+        await book.start(db)
+        home = book.get(str(match_id), "home")
+        assert (home["stake"], home["liability"], home["bets"]) == (15.0, 20.0, 2)
+        assert book.get(str(match_id), "over", "goals")["liability"] == 2.0
+        assert book.get(str(match_id), "away")["bets"] == 0
+        assert book.user(str(users[1])) == {"stake": 9.0, "payout": 21.0, "bets": 2}
+        assert book.user("stale")["bets"] == 0
+        assert book.net(str(match_id), "home") == 20.0
+
+    asyncio.run(run())
+
+
+class SlowBets:
+    """A bets collection whose aggregations wait on ``gate`` halfway through."""
+
+    def __init__(self, rows, gate):
+        self.rows = rows
+        self.gate = gate
+        self.reading = asyncio.Event()
+
+    def __getitem__(self, name):
+        return self
+
+    async def aggregate(self, pipeline, allowDiskUse=False):
+        by_user = pipeline[1]["$group"]["_id"] == "$user_id"
+        for row in self.rows[by_user]:
+            self.reading.set()
+            await self.gate.wait()
+            yield row
+
+
+def test_changes_during_rebuild_are_kept_once():
+    async def run():
+        bet = {"user_id": "u1", "match_id": "m1", "team": "home", "amount": 10.0, "odds": 2.0}
+        selection = {"_id": {"match_id": "m1", "market": "match_odds", "selection": "home"},
+                     "stake": 10.0, "liability": 10.0, "bets": 1}
+        user = {"_id": "u1", "stake": 10.0, "payout": 20.0, "bets": 1}
+        gate = asyncio.Event()
+        db = SlowBets(([selection], [user]), gate)
+        book = ExposureBook()
+        bus = InProcessBus()
+        await bus.start()
+        starting = asyncio.create_task(book.start(db, bus))
+        await db.reading.wait()
+        book.add({**bet, "amount": 5.0})  # Arrives while the aggregation runs
+        assert book.get("m1", "home")["bets"] == 1  # Applied at once, to the book still serving reads
+        gate.set()
+        await starting
+        assert book.get("m1", "home")["stake"] == 15.0 and book.get("m1", "home")["bets"] == 2
+        assert book.user("u1") == {"stake": 15.0, "payout": 30.0, "bets": 2}
+
+    asyncio.run(run())
+
+
+def test_reconnect_resyncs_every_worker():
+    async def run():
+        db = AsyncMongoMockClient()["exposure_resync_test"]
+        bus = InProcessBus()
+        await bus.start()
+        workers = [ExposureBook(), ExposureBook()]
+        for book in workers:
+            await book.start(db, bus)
+        bet = {"user_id": "u1", "match_id": "m1", "team": "home", "amount": 10.0, "odds": 2.0}
+        workers[0].add(bet)
+        assert [book.get("m1", "home")["bets"] for book in workers] == [1, 1]  # Not applied twice on its own worker
+        # Say worker 1 missed that event, and another bet was committed while the bus was down
+        await db["bets"].insert_one({**bet, "status": "pending"})
+        workers[1]._clear()
+        await db["bets"].insert_one({**bet, "amount": 2.0, "status": "pending"})
+        bus._reconnected()
+        await asyncio.gather(*(book._resync_task for book in workers))
+        assert [book.get("m1", "home")["stake"] for book in workers] == [12.0, 12.0]
+        for book in workers:
+            await book.stop()
+
+    asyncio.run(run())
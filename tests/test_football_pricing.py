@@ -0,0 +1,61 @@
+from math import exp, factorial
+import numpy as np
+import pytest
+from utils.football_pricing import match_odds, poisson_pmf, price_fixtures, score_matrix
+
+
+def test_poisson_pmf():
+    pmf = poisson_pmf(np.array([1.5]), 4)[0]
+    assert pmf == pytest.approx([exp(-1.5) * 1.5 ** k / factorial(k) for k in range(5)])
+
+
+def test_score_matrix_is_normalized_and_independent_without_rho():
+    matrix = score_matrix([1.6, 0.9], [1.1, 2.0])
+    assert matrix.shape == (2, 11, 11)
+    assert matrix.sum(axis=(1, 2)) == pytest.approx([1.0, 1.0])
+    home, away = matrix[0].sum(axis=1), matrix[0].sum(axis=0)
+    assert matrix[0] == pytest.approx(np.outer(home, away))
+    with pytest.raises(ValueError):
+        score_matrix([1.0, 0.0], [1.0, 1.0])
+
+
+def test_dixon_coles_moves_low_scores():
+    plain = score_matrix(1.4, 1.2)[0]
+    adjusted = score_matrix(1.4, 1.2, rho=-0.1)[0]
+    # Negative rho makes 0-0 and 1-1 likelier and 1-0 and 0-1 less likely
+    assert adjusted[0, 0] > plain[0, 0] and adjusted[1, 1] > plain[1, 1]
+    assert adjusted[1, 0] < plain[1, 0] and adjusted[0, 1] < plain[0, 1]
+    assert adjusted.sum() == pytest.approx(1.0)
+
+
+def test_markets_are_consistent():
+    priced = price_fixtures([1.6, 1.0], [1.1, 1.0], rho=[-0.05, 0.0])
+    one_x_two = priced["1x2"]
+    assert one_x_two["home"] + one_x_two["draw"] + one_x_two["away"] == pytest.approx([1.0, 1.0])
+    # Equal rates price both sides the same
+    assert one_x_two["home"][1] == pytest.approx(one_x_two["away"][1])
+    assert priced["over_under"][2.5]["over"] + priced["over_under"][2.5]["under"] == pytest.approx([1.0, 1.0])
+    assert priced["over_under"][0.5]["under"] == pytest.approx(priced["matrix"][:, 0, 0])
+    assert sum(priced["correct_score"].values()) == pytest.approx([1.0, 1.0])
+    assert priced["fair_odds"]["home"] == pytest.approx(1 / one_x_two["home"])
+
+
+def test_asian_handicap():
+    priced = price_fixtures([1.6, 1.2], [1.1, 1.2])
+    one_x_two = priced["1x2"]
+    level = priced["asian_handicap"][0.0]
+    # Draw no bet: the draw returns the stake
+    assert level["home"] == pytest.approx((1 - one_x_two["draw"]) / one_x_two["home"])
+    half = priced["asian_handicap"][-0.5]
+    assert half["home"] == pytest.approx(1 / one_x_two["home"])
+    quarter = priced["asian_handicap"][-0.25]
+    assert np.all(level["home"] < quarter["home"]) and np.all(quarter["home"] < half["home"])
+    # Level match: both sides of the level line are evens
+    assert level["home"][1] == pytest.approx(2.0) and level["away"][1] == pytest.approx(2.0)
+
+
+def test_match_odds_margin():
+    fair = match_odds(1.6, 1.1)
+    assert sum(1 / price for price in fair.values()) == pytest.approx(1.0)
+    with_margin = match_odds(1.6, 1.1, margin=0.05)
+    assert sum(1 / price for price in with_margin.values()) == pytest.approx(1.05)
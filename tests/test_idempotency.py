@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+from fastapi import HTTPException, Response
+from mongomock_motor import AsyncMongoMockClient
+from services.idempotency import COMPLETED, REPLAY_HEADER, IdempotencyStore
+
+
+async def make_store():
+    db = AsyncMongoMockClient()["idempotency_test"]
+    store = IdempotencyStore(ttl=60, max_entries=10)
+    await store.start(db)
+    return store, db
+
+
+def counting(result=None, error=None, delay=0.0):
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return calls, execute
+
+
+def test_ttl_index():
+    async def run():
+        store, db = await make_store()
+        indexes = await db["idempotency_keys"].index_information()
+        assert any(index.get("expireAfterSeconds") == 60 and index["key"] == [("created_at", 1)]
+                   for index in indexes.values())
+
+    asyncio.run(run())
+
+
+def test_replay_from_cache_and_from_mongo():
+    async def run():
+        store, db = await make_store()
+        calls, execute = counting({"bet_id": "1"})
+        assert await store.run("k", {"amount": 5}, execute) == {"bet_id": "1"}
+        response = Response()
+        assert await store.run("k", {"amount": 5}, execute, response) == {"bet_id": "1"}
+        assert response.headers[REPLAY_HEADER] == "true"
+        # Another worker (empty cache) replays from the stored document
+        other = IdempotencyStore(ttl=60)
+        await other.start(db)
+        assert await other.run("k", {"amount": 5}, execute) == {"bet_id": "1"}
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_duplicates_run_once():
+    async def run():
+        store, db = await make_store()
+        other = IdempotencyStore(ttl=60)
+        await other.start(db)
+        calls, execute = counting({"ok": True}, delay=0.05)
+        results = await asyncio.gather(store.run("k", {"a": 1}, execute), store.run("k", {"a": 1}, execute),
+                                       other.run("k", {"a": 1}, execute))
+        assert results == [{"ok": True}] * 3 and len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_key_reused_for_another_request():
+    async def run():
+        store, _ = await make_store()
+        _, execute = counting({"ok": True})
+        await store.run("k", {"amount": 5}, execute)
+        with pytest.raises(HTTPException) as conflict:
+            await store.run("k", {"amount": 50}, execute)
+        assert conflict.value.status_code == 409
+
+    asyncio.run(run())
+
+
+def test_client_errors_are_stored_and_failures_release_the_key():
+    async def run():
+        store, db = await make_store()
+        calls, rejected = counting(error=HTTPException(status_code=400, detail="Insufficient funds"))
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await store.run("rejected", {}, rejected)
+        assert len(calls) == 1
+
+        calls, failing = counting(error=RuntimeError("database down"))
+        with pytest.raises(RuntimeError):
+            await store.run("failed", {}, failing)
+        assert await db["idempotency_keys"].find_one({"_id": "failed"}) is None
+        _, succeeding = counting({"ok": True})
+        assert await store.run("failed", {}, succeeding) == {"ok": True}
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cut_the_execution_short():
+    async def run():
+        store, db = await make_store()
+        calls, execute = counting({"bet_id": "1"}, delay=0.05)
+        caller = asyncio.ensure_future(store.run("k", {}, execute))
+        await asyncio.sleep(0.01)
+        caller.cancel()  # Client disconnected after the bet started
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await store.stop()
+        document = await db["idempotency_keys"].find_one({"_id": "k"})
+        assert document["state"] == COMPLETED and document["body"] == {"bet_id": "1"}
+        assert await store.run("k", {}, execute) == {"bet_id": "1"} and len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_interrupted_execution_keeps_its_key():
+    async def run():
+        store, db = await make_store()
+        calls, execute = counting({"ok": True}, delay=1.0)
+        caller = asyncio.ensure_future(store.run("k", {}, execute))
+        await asyncio.sleep(0.01)
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task() and task is not caller:
+                task.cancel()  # The execution itself is cut off, e.g. at shutdown
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        with pytest.raises(HTTPException) as interrupted:
+            await store.run("k", {}, execute)
+        assert interrupted.value.status_code == 409 and len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_payment_keys_are_per_user(monkeypatch):
+    from types import SimpleNamespace
+    import api.payments as payments
+
+    async def create_payment(payment_request, idempotency_key=None):
+        return {"client_secret": f"secret-{len(sent)}", "key": idempotency_key}
+
+    sent = []
+    monkeypatch.setattr(payments, "create_payment", lambda *args: sent.append(args) or create_payment(*args))
+
+    async def run():
+        store, _ = await make_store()
+        request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(idempotency=store)))
+        body = payments.PaymentInitiateRequest(amount=10.0, currency="usd")
+        first = await payments.initiate_payment(body, request, Response(), user_id="alice", idempotency_key="k1")
+        again = await payments.initiate_payment(body, request, Response(), user_id="alice", idempotency_key="k1")
+        other = await payments.initiate_payment(body, request, Response(), user_id="mallory", idempotency_key="k1")
+        assert again == first and other != first
+        assert other["key"] != first["key"] and len(sent) == 2
+
+    asyncio.run(run())
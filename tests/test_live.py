@@ -0,0 +1,84 @@
+import asyncio
+from services.live import LiveHub
+
+
+class ChangeStream:
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            raise StopAsyncIteration
+        return self.changes.pop(0)
+
+    async def try_next(self):
+        return self.changes.pop(0) if self.changes else None
+
+
+class WatchedCollection:
+    """Serves a change stream and counts full reads."""
+
+    def __init__(self, changes):
+        self.stream = ChangeStream(changes)
+        self.watched_with = None
+        self.reads = 0
+
+    def watch(self, full_document=None):
+        self.watched_with = full_document
+        return self.stream
+
+    def find(self, *args, **kwargs):
+        self.reads += 1
+        raise AssertionError("A change event re-read the collection")
+
+
+def change(operation, key, document=None):
+    event = {"operationType": operation, "documentKey": {"_id": key}}
+    if document is not None:
+        event["fullDocument"] = document
+    return event
+
+
+def test_change_events_update_only_the_changed_documents():
+    async def run():
+        hub = LiveHub("matches", query={"status": "live"}, match_field="_id")
+        hub._source = {"a": "{}", "b": "{}", "c": "{}"}
+        hub.collection = WatchedCollection([
+            change("update", "a", {"_id": "a", "status": "live", "score": "1-0"}),
+            change("update", "b", {"_id": "b", "status": "finished"}),  # Left the query
+            change("delete", "c"),
+            change("insert", "d", {"_id": "d", "status": "live"}),
+        ])
+        events = []
+        hub.emit = events.append
+        await hub._watch()
+        assert hub.collection.watched_with == "updateLookup" and hub.collection.reads == 0
+        assert [(event["op"], event["key"]) for event in events] == [
+            ("update", "a"), ("remove", "b"), ("remove", "c"), ("update", "d")]
+
+    asyncio.run(run())
+
+
+def test_events_without_a_document_fall_back_to_a_re_read():
+    async def run():
+        hub = LiveHub("matches")
+        hub.collection = WatchedCollection([{"operationType": "drop"}])
+        refreshed = []
+
+        async def refresh():
+            refreshed.append(True)
+
+        hub.refresh = refresh
+        await hub._watch()
+        assert refreshed == [True]
+
+    asyncio.run(run())
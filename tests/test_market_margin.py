@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from api.admin import get_market_margins
+from utils.market_margin import MarginCache, fair_probabilities, odds_matrix, overround, price_markets
+
+
+def test_overround_and_padding():
+    matrix, mask = odds_matrix([{"home": 2.0, "draw": 3.5, "away": 4.0}, {"yes": 1.8, "no": 1.8}, {"a": 0.5}])
+    assert matrix.shape == (3, 3)
+    assert mask.tolist() == [[True, True, True], [True, True, False], [False, False, False]]
+    result = overround(matrix, mask)
+    assert result["booksum"][0] == pytest.approx(0.5 + 1 / 3.5 + 0.25)
+    assert result["margin"][1] == pytest.approx(1 - 1 / (2 / 1.8))
+    assert np.isnan(result["margin"][2])
+
+
+@pytest.mark.parametrize("method", ["proportional", "shin", "power"])
+def test_fair_probabilities_sum_to_one(method):
+    matrix, mask = odds_matrix([{"home": 1.9, "draw": 3.4, "away": 4.2}, {"yes": 1.85, "no": 1.95}])
+    fair = fair_probabilities(matrix, mask, method)
+    assert fair.sum(axis=1) == pytest.approx([1.0, 1.0], abs=1e-6)
+    assert fair[0, 0] > fair[0, 1] > fair[0, 2]
+
+
+def test_margin_cache_reprices_only_changed_matches(monkeypatch):
+    calls = []
+
+    def counting(markets, *args):
+        calls.append(len(markets))
+        return price_markets(markets, *args)
+
+    monkeypatch.setattr("utils.market_margin.price_markets", counting)
+    cache = MarginCache()
+    cache.board({"a": {"x": 2.0, "y": 2.0}, "b": {"x": 1.5, "y": 3.0}})
+    cache.board({"a": {"x": 2.0, "y": 2.0}, "b": {"x": 1.6, "y": 2.6}})
+    cache.board({"a": {"x": 2.0, "y": 2.0}}, prune=True)
+    assert calls == [2, 1]
+    assert len(cache) == 1
+
+
+def test_margins_cover_matches_beyond_the_live_board():
+    async def run():
+        db = AsyncMongoMockClient()["margins_test"]
+        pre_match, live, finished = ObjectId(), ObjectId(), ObjectId()
+        await db["matches"].insert_many([
+            {"_id": pre_match, "status": "open", "odds": {"home": 2.0, "away": 2.0}},
+            {"_id": live, "status": "live", "odds": {"home": 1.5, "away": 3.0}},
+            {"_id": finished, "status": "finished", "odds": {"home": 1.1, "away": 9.0}},
+        ])
+        state = SimpleNamespace(margin_caches={},
+                                odds_stream=SimpleNamespace(odds={str(live): {"home": 1.4, "away": 3.2}}))
+        request = SimpleNamespace(app=SimpleNamespace(state=state))
+        return live, pre_match, finished, await get_market_margins(
+            request, method="proportional", target_margin=None, margin_method="proportional", current_user=None, db=db)
+
+    live, pre_match, finished, margins = asyncio.run(run())
+    assert set(margins) == {str(pre_match), str(live)}
+    fresh, = price_markets([{"home": 1.4, "away": 3.2}])
+    assert margins[str(live)] == fresh
@@ -0,0 +1,48 @@
+import asyncio
+from bson import ObjectId
+from fastapi import HTTPException
+import pytest
+from pymongo.errors import DuplicateKeyError
+from schemas.match import PlaceBetRequest
+from services.match import MatchService
+from tests.mongo import make_db
+
+
+async def setup(balance):
+    db = make_db("match_service_test")
+    user_id = ObjectId()
+    await db["users"].insert_one({"_id": user_id, "balance": balance})
+    return db, MatchService(db["matches"], db), user_id
+
+
+async def balance_of(db, user_id):
+    return (await db["users"].find_one({"_id": user_id}))["balance"]
+
+
+def test_debit_rejects_an_insufficient_balance():
+    async def run():
+        db, service, user_id = await setup(25.0)
+        request = PlaceBetRequest(match_id=str(ObjectId()), amount=20.0, team="home")
+        results = await asyncio.gather(*(service.commit_bet(str(user_id), request, 2.0) for _ in range(2)),
+                                       return_exceptions=True)
+        rejected = [result for result in results if isinstance(result, HTTPException)]
+        assert len(rejected) == 1 and rejected[0].detail == "Insufficient funds"
+        assert await balance_of(db, user_id) == 5.0
+        assert await db["bets"].count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_failed_insert_does_not_debit():
+    async def run():
+        db, service, user_id = await setup(50.0)
+        match_id = ObjectId()
+        await db["bets"].create_index([("user_id", 1), ("match_id", 1)], unique=True)
+        await db["bets"].insert_one({"user_id": user_id, "match_id": match_id, "amount": 1.0, "status": "won"})
+        request = PlaceBetRequest(match_id=str(match_id), amount=20.0, team="home")
+        with pytest.raises(DuplicateKeyError):
+            await service.commit_bet(str(user_id), request, 2.0)
+        assert await balance_of(db, user_id) == 50.0  # The debit was rolled back with the insert
+        assert await db["bets"].count_documents({}) == 1
+
+    asyncio.run(run())
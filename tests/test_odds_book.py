@@ -0,0 +1,29 @@
+import asyncio
+from services.odds_book import OddsBook
+
+
+class Unreadable:
+    def find(self, *args, **kwargs):
+        raise AssertionError("A change event re-read the matches")
+
+
+def test_change_events_update_only_the_changed_matches():
+    async def run():
+        book = OddsBook()
+        book.collection = Unreadable()
+        book._source = {"m1": ("open", {"home": 2.0}), "m2": ("live", {"home": 1.5}), "m3": ("open", {"home": 4.0})}
+        events = []
+        book.emit = events.append
+        await book.refresh_changes([
+            {"documentKey": {"_id": "m1"}, "fullDocument": {"_id": "m1", "status": "live", "odds": {"home": 2.0}}},
+            {"documentKey": {"_id": "m2"}, "fullDocument": {"_id": "m2", "status": "finished"}},
+            {"documentKey": {"_id": "m3"}},  # Deleted
+            {"documentKey": {"_id": "m4"}, "fullDocument": {"_id": "m4", "status": "scheduled"}},
+        ])
+        assert events == [
+            {"op": "set", "match_id": "m1", "status": "live", "odds": {"home": 2.0}},
+            {"op": "remove", "match_id": "m2"},
+            {"op": "remove", "match_id": "m3"},
+        ]
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+from fractions import Fraction
+import pytest
+from utils.odds_ladder import LADDER, from_american, from_fractional, ladder_rung, price, rational_price, snap_to_ladder
+
+
+def test_ladder_is_sorted_and_round_trips():
+    decimals = [rung.decimal for rung in LADDER]
+    assert decimals == sorted(decimals)
+    for rung in LADDER:
+        assert price(rung.decimal) == rung
+        assert from_fractional(rung.fractional) == rung
+
+
+@pytest.mark.parametrize("decimal_odds, fractional, american", [
+    (2.5, "6/4", 150),
+    (1.67, "4/6", -150),
+    (2.375, "11/8", 138),
+    (1.333, "1/3", -300),
+    (2.3, "13/10", 130),
+    (4.333, "100/30", 333),
+])
+def test_price(decimal_odds, fractional, american):
+    rung = price(decimal_odds)
+    assert (rung.fractional, rung.american) == (fractional, american)
+
+
+@pytest.mark.parametrize("decimal_odds", [1.0001, 1.00001, 1.000001, 1.004, 1.0099])
+def test_prices_below_the_shortest_rung_clamp_to_it(decimal_odds):
+    assert price(decimal_odds) == LADDER[0]
+
+
+@pytest.mark.parametrize("decimal_odds", [1.0, 0.5, 0.0, -2.0, float("nan"), float("inf")])
+def test_invalid_prices_raise(decimal_odds):
+    with pytest.raises(ValueError):
+        price(decimal_odds)
+
+
+def test_longest_rung_and_beyond():
+    assert price(1001.0).fractional == "1000/1"
+    beyond = price(5000.5)
+    assert beyond.fraction == Fraction(9999, 2) and beyond.american == 499950
+
+
+def test_rational_price_rejects_a_zero_fraction():
+    with pytest.raises(ValueError):
+        rational_price(1.0001)
+
+
+def test_lookup_helpers():
+    assert ladder_rung(2.375).fractional == "11/8"
+    assert ladder_rung(2.31) is None
+    assert snap_to_ladder(1.333).fractional == "1/3"
+    assert snap_to_ladder(2.3) is None
+    assert from_american(-150).fractional == "4/6"
+    assert from_american(250).fraction == Fraction(5, 2)
+    with pytest.raises(ValueError):
+        from_american(50)
+    with pytest.raises(ValueError):
+        from_fractional("0/1")
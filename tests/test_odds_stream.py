@@ -0,0 +1,54 @@
+import asyncio
+from mongomock_motor import AsyncMongoMockClient
+from services.odds_stream import OddsStream
+
+
+class MotorLengthCollection:
+    """mongomock-motor ignores ``to_list(length)``; Motor stops after ``length`` documents."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        cursor = self.collection.find(*args, **kwargs)
+
+        class Cursor:
+            async def to_list(self, length=None):
+                documents = await cursor.to_list(length=None)
+                return documents if length is None else documents[:length]
+
+        return Cursor()
+
+
+def test_refresh_keeps_the_whole_live_board():
+    async def run():
+        db = AsyncMongoMockClient()["odds_stream_test"]
+        await db["matches"].insert_many([{"status": "live", "odds": {"home": 2.0 + i / 100}} for i in range(250)])
+        stream = OddsStream()
+        stream.collection = MotorLengthCollection(db["matches"])
+        events = []
+        stream.emit = events.append
+        await stream.refresh()
+        assert len(events) == 250
+        await stream.refresh()  # Nothing changed: no deltas, and no match dropped off the board
+        assert len(events) == 250 and all(event["op"] == "delta" for event in events)
+
+    asyncio.run(run())
+
+
+def test_change_events_emit_deltas_for_the_changed_match_only():
+    async def run():
+        stream = OddsStream()
+        events = []
+        stream.emit = events.append
+        stream.push("m1", {"home": 2.0, "away": 1.8})
+        stream.push("m2", {"home": 3.0})
+        await stream.refresh_changes([
+            {"documentKey": {"_id": "m1"},
+             "fullDocument": {"_id": "m1", "status": "live", "odds": {"home": 2.1, "away": 1.8}}},
+            {"documentKey": {"_id": "m2"}, "fullDocument": {"_id": "m2", "status": "finished", "odds": {"home": 3.0}}},
+        ])
+        assert [(event["op"], event["match_id"], event.get("odds")) for event in events[2:]] == [
+            ("delta", "m1", {"home": 2.1}), ("remove", "m2", None)]
+
+    asyncio.run(run())
@@ -0,0 +1,61 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter, paginate
+
+SORT = [("date", 1), ("_id", 1)]
+
+
+def test_cursor_round_trip_keeps_bson_types():
+    document = {"_id": ObjectId(), "date": datetime(2026, 5, 1, 15, 30), "name": "ignored"}
+    token = encode_cursor(document, SORT)
+    assert "=" not in token and "+" not in token and "/" not in token
+    assert decode_cursor(token, SORT) == [document["date"], document["_id"]]
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("token", [
+    "", "not base64!", "bm90IGpzb24", encode_cursor({"_id": 1}, [("_id", 1)]),
+    b64('[{"$oid": "zz"}, 1]'), b64('[{"$date": "zz"}, 1]'), b64('[{"$date": {}}, 1]'),
+    b64('[{"$binary": 5}, 1]'), b64('[{"$numberLong": "x"}, 1]'),
+])
+def test_invalid_cursor_is_a_400(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token, SORT)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter():
+    assert keyset_filter([("_id", -1)], [5]) == {"_id": {"$lt": 5}}
+    assert keyset_filter([("a", -1), ("b", 1), ("_id", 1)], [1, 2, 3]) == {"$or": [
+        {"a": {"$lt": 1}},
+        {"a": 1, "b": {"$gt": 2}},
+        {"a": 1, "b": 2, "_id": {"$gt": 3}},
+    ]}
+
+
+def test_paginate_walks_every_document_once():
+    async def run():
+        collection = AsyncMongoMockClient()["pagination_test"]["matches"]
+        start = datetime(2026, 1, 1)
+        # Repeated dates, so the _id tiebreak decides the order within a date
+        await collection.insert_many([{"date": start + timedelta(days=i // 3), "n": i} for i in range(10)])
+        seen, after, pages = [], None, 0
+        while True:
+            page, after = await paginate(collection, {}, SORT, 4, after)
+            seen.extend(document["n"] for document in page)
+            pages += 1
+            if after is None:
+                break
+        assert seen == list(range(10)) and pages == 3
+        page, after = await paginate(collection, {"n": {"$lt": 4}}, SORT, 4)
+        assert len(page) == 4 and after is None  # An exactly full last page has no next token
+
+    asyncio.run(run())
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from schemas.match import PlaceBetRequest
+from services.bet_delay import BetDelayQueue, ParkedBet
+from services.exposure import ExposureBook
+from services.live_bus import LiveBus
+from services.match import MatchService
+from services.risk_limits import RiskLimits
+from tests.mongo import make_db
+
+
+def make_limits(**profiles):
+    limits = RiskLimits(ExposureBook())
+    for profile_id, values in profiles.items():
+        limits.apply({"op": "set", "id": profile_id.replace("_", ":"), "limits": values})
+    return limits
+
+
+def test_check_reserves_until_released():
+    limits = make_limits(market_default={"max_stake": None, "max_payout": 100.0})
+    first = limits.check("u1", "m1", "home", 60.0, 2.0)
+    with pytest.raises(HTTPException) as rejected:
+        limits.check("u2", "m1", "home", 60.0, 2.0)
+    assert rejected.value.detail["max_stake"] == 40.0
+    limits.release(first)
+    limits.release(first)  # Releasing twice does not free the headroom twice
+    second = limits.check("u2", "m1", "home", 60.0, 2.0)
+    limits.release(second)
+    assert limits._reserved == {} and limits._reserved_payouts == {}
+
+
+def test_concurrent_bets_cannot_share_headroom():
+    async def run():
+        limits = make_limits(market_default={"max_stake": None, "max_payout": 100.0})
+        db = AsyncMongoMockClient()["risk_limits_test"]
+        match_id = ObjectId()
+        await db["matches"].insert_one({"_id": match_id, "status": "open", "odds": {"home": 2.0}})
+        service = MatchService(db["matches"], db, exposure_book=limits.exposure, risk_limits=limits)
+
+        async def commit_bet(user_id, bet_request, odds):
+            await asyncio.sleep(0.01)  # The checks of the other bets run meanwhile
+            service._track({"user_id": user_id, "match_id": bet_request.match_id, "team": bet_request.team,
+                            "amount": bet_request.amount, "odds": odds})
+            return {"bet_id": "x", "status": "Bet placed successfully"}
+
+        service.commit_bet = commit_bet
+        request = PlaceBetRequest(match_id=str(match_id), amount=60.0, team="home")
+        results = await asyncio.gather(*(service.place_bet(str(ObjectId()), request) for _ in range(3)),
+                                       return_exceptions=True)
+        assert sum(not isinstance(result, Exception) for result in results) == 1
+        assert limits.exposure.get(str(match_id), "home")["liability"] == 60.0
+        assert limits._reserved == {}
+
+        async def failed_commit(user_id, bet_request, odds):
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+
+        service.commit_bet = failed_commit
+        small = PlaceBetRequest(match_id=str(match_id), amount=40.0, team="home")
+        with pytest.raises(HTTPException):
+            await service.place_bet(str(ObjectId()), small)
+        assert limits._reserved == {}  # The failed commit gave its headroom back
+
+    asyncio.run(run())
+
+
+class NoOdds:
+    def get(self, match_id):
+        return None
+
+
+def test_delay_rejection_releases():
+    async def run():
+        limits = make_limits(market_default={"max_stake": None, "max_payout": 100.0})
+        reservation = limits.check("u1", "m1", "home", 60.0, 2.0)
+        queue = BetDelayQueue(NoOdds(), delay=0.0, tick=0.01)
+        bet = ParkedBet("t1", "u1", "m1", "home", 2.0, None, None, lambda: limits.release(reservation))
+        await queue.process([bet])
+        assert limits._reserved == {}
+
+    asyncio.run(run())
+
+
+class QueuedBus(LiveBus):
+    """Delivers events only when drained, like a bus relaying through a broker."""
+
+    def __init__(self):
+        super().__init__()
+        self.queued = []
+
+    def publish(self, channel, message):
+        self.queued.append((channel, message))
+
+
+def test_release_waits_for_the_exposure():
+    async def run():
+        db = make_db("risk_limits_bus_test")
+        book = ExposureBook()
+        await book.start(db, QueuedBus())
+        limits = make_limits(market_default={"max_stake": None, "max_payout": 100.0})
+        limits.exposure = book
+        match_id, user_id = ObjectId(), ObjectId()
+        await db["matches"].insert_one({"_id": match_id, "status": "open", "odds": {"home": 2.0}})
+        await db["users"].insert_one({"_id": user_id, "balance": 100.0})
+        service = MatchService(db["matches"], db, exposure_book=book, risk_limits=limits)
+        seen = []
+        release = limits.release
+
+        def checked_release(reservation):
+            seen.append(book.get(str(match_id), "home")["liability"])
+            release(reservation)
+
+        limits.release = checked_release
+        await service.place_bet(str(user_id), PlaceBetRequest(match_id=str(match_id), amount=60.0, team="home"))
+        assert seen == [60.0]  # Counted before the reservation went, with the bus event still in flight
+        with pytest.raises(HTTPException):
+            limits.check("u2", str(match_id), "home", 60.0, 2.0)
+
+    asyncio.run(run())
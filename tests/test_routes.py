@@ -0,0 +1,36 @@
+import pytest
+from starlette.routing import Match
+from api.bets import router
+
+
+def first_match(path: str, method: str = "GET"):
+    scope = {"type": "http", "path": path, "method": method, "root_path": ""}
+    for route in router.routes:
+        matched, _ = route.matches(scope)
+        if matched == Match.FULL:
+            return route.endpoint.__name__
+    return None
+
+
+@pytest.mark.parametrize("path, endpoint", [
+    ("/api/matches/", "get_all_matches"),
+    ("/api/matches/live", "get_live_matches"),
+    ("/api/matches/today", "get_todays_matches"),
+    ("/api/matches/upcoming", "get_upcoming_matches"),
+    ("/api/matches/history", "get_bet_history"),
+    ("/api/matches/sports/football", "get_matches_by_sport_category"),
+    ("/api/matches/64b7f0c2a1b2c3d4e5f60718", "get_match_by_id"),
+])
+def test_literal_paths_match_before_the_match_id_route(path, endpoint):
+    assert first_match(path) == endpoint
+
+
+def test_cors_exposes_the_next_cursor_header():
+    from fastapi.testclient import TestClient
+    from core.config import settings
+    from main import app
+    from utils.pagination import NEXT_CURSOR_HEADER
+
+    origin = settings.ALLOW_ORIGINS.split(",")[0]
+    response = TestClient(app).get("/health", headers={"Origin": origin})
+    assert NEXT_CURSOR_HEADER in response.headers["access-control-expose-headers"]
@@ -0,0 +1,135 @@
+import asyncio
+import numpy as np
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from services.exposure import ExposureBook
+from services.settlement import (
+    LOST, PENDING, VOID, WON, SettlementEngine, aggregate_by_user, bet_arrays, compute_outcomes, compute_payouts,
+)
+from tests.mongo import make_db
+
+
+async def seed(db, bets=9):
+    users = [ObjectId(), ObjectId()]
+    await db["users"].insert_many([{"_id": user_id, "balance": 0.0} for user_id in users])
+    match_id = ObjectId()
+    await db["bets"].insert_many([
+        {"user_id": users[i % 2], "match_id": match_id, "team": ("home", "away", "draw")[i % 3],
+         "amount": 10.0, "odds": 2.0, "status": "pending"}
+        for i in range(bets)
+    ] + [{"user_id": users[0], "match_id": match_id, "market": "goals", "selection": "over",
+          "amount": 5.0, "odds": 3.0, "status": "pending"}])
+    return users, str(match_id)
+
+
+def test_compute_outcomes_and_credits():
+    columns = bet_arrays([
+        {"_id": 1, "user_id": "a", "team": "home", "amount": 10.0, "odds": 2.0},
+        {"_id": 2, "user_id": "b", "team": "away", "amount": 10.0, "odds": 3.0},
+        {"_id": 3, "user_id": "a", "market": "goals", "selection": "over", "amount": 4.0, "odds": 1.5},
+        {"_id": 4, "user_id": "b", "market": "corners", "selection": "over", "amount": 1.0, "odds": 1.5},
+    ])
+    outcomes = compute_outcomes(columns["pairs"], columns["pair_codes"], {"match_odds": ["home"]}, ["goals"])
+    assert outcomes.tolist() == [WON, LOST, VOID, PENDING]
+    payouts = compute_payouts(outcomes, columns["amounts"], columns["odds"])
+    assert np.allclose(payouts, [20.0, 0.0, 4.0, 0.0])
+    assert aggregate_by_user(columns["users"], columns["user_codes"], payouts) == {"a": 24.0}
+
+
+def test_settlement_job_runs_to_completion():
+    async def scenario():
+        db = make_db("settlement_test")
+        users, match_id = await seed(db)
+        exposure = ExposureBook()
+        await exposure.rebuild(db)
+        engine = SettlementEngine(db, batch_size=4, exposure_book=exposure)
+
+        await engine.claim(match_id, {"match_odds": ["home"]}, [], False)
+        await engine.start_job(match_id, {"match_odds": ["home"]})
+        job = await engine.job(match_id)
+        assert job["state"] == "completed" and not job["in_progress"]
+        assert (job["bets"], job["won"], job["lost"]) == (9, 3, 6)
+        balances = [user["balance"] async for user in db["users"].find().sort("_id", 1)]
+        assert sum(balances) == 60.0
+        # The goals market had no result: its bet stays pending and on the exposure book
+        assert await db["bets"].count_documents({"status": "pending"}) == 1
+        assert [row["market"] for row in exposure.report(match_id)] == ["goals"]
+
+        # Same result again: nothing changes
+        await engine.settle(match_id, {"match_odds": ["home"]})
+        assert sum([user["balance"] async for user in db["users"].find()]) == 60.0
+
+        # A further market reopens the job for that market only
+        job = await engine.settle(match_id, {"goals": ["over"]})
+        assert job["winners"] == {"match_odds": ["home"], "goals": ["over"]} and job["bets"] == 10
+        assert sum([user["balance"] async for user in db["users"].find()]) == 75.0
+
+        with pytest.raises(HTTPException) as conflict:
+            await engine.settle(match_id, {"match_odds": ["away"]})
+        assert conflict.value.status_code == 409
+
+    asyncio.run(scenario())
+
+
+def test_resume_picks_up_a_running_job():
+    async def scenario():
+        db = make_db("settlement_test")
+        _, match_id = await seed(db)
+        engine = SettlementEngine(db, batch_size=4)
+        await engine.claim(match_id, {}, [], True)  # Claimed, then the process stopped
+        await engine.start()
+        await engine._resuming
+        await asyncio.gather(*engine.jobs.values())
+        job = await engine.job(match_id)
+        assert job["state"] == "completed" and job["voided"] == 10
+
+    asyncio.run(scenario())
+
+
+def test_stop_cancels_jobs_and_a_restart_resumes_them():
+    async def scenario():
+        db = make_db("settlement_test")
+        _, match_id = await seed(db)
+        engine = SettlementEngine(db, batch_size=4)
+        commit_batch = engine._commit_batch
+
+        async def slow_commit(*args):
+            result = await commit_batch(*args)
+            await asyncio.sleep(1)  # Shutdown arrives after the first batch
+            return result
+
+        engine._commit_batch = slow_commit
+        task = engine.start_job(match_id, {}, void=True)
+        await asyncio.sleep(0.05)
+        await engine.stop()
+        assert task.cancelled() and not engine.jobs
+        job = await engine.job(match_id)
+        assert job["state"] == "running" and job["voided"] == 4
+
+        restarted = SettlementEngine(db, batch_size=4)
+        await restarted.start()
+        await restarted._resuming
+        await asyncio.gather(*restarted.jobs.values())
+        job = await restarted.job(match_id)
+        assert job["state"] == "completed" and job["voided"] == 10
+        assert sum([user["balance"] async for user in db["users"].find()]) == 95.0
+
+    asyncio.run(scenario())
+
+def test_settle_endpoint_starts_the_job():
+    from types import SimpleNamespace
+    from api.admin import SettlementRequest, settle_match
+
+    async def scenario():
+        db = make_db("settlement_test")
+        _, match_id = await seed(db)
+        engine = SettlementEngine(db)
+        request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(settlement=engine)))
+        body = SettlementRequest(winners={"match_odds": ["draw"]}, void_markets=["goals"])
+        accepted = await settle_match(match_id, body, request, current_user=None)
+        assert accepted["state"] == "running"
+        await asyncio.gather(*engine.jobs.values())
+        assert (await engine.job(match_id))["state"] == "completed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+from itertools import combinations
+from math import prod
+import pytest
+from schemas.bet import Bet
+from utils.system_bets import (
+    LOST, PENDING, VOID, WON, build_bet_slip, elementary_symmetric, fold_sizes, price_system_bet,
+)
+
+
+def brute_force(odds, sizes, stake):
+    return sum(prod(combo) for size in sizes for combo in combinations(odds, size)) * stake
+
+
+def test_elementary_symmetric():
+    assert elementary_symmetric([2, 3, 4]) == [1, 9, 26, 24]
+    assert elementary_symmetric([2, 3, 4], 2) == [1, 9, 26]
+    assert elementary_symmetric([]) == [1.0]
+
+
+@pytest.mark.parametrize("bet_type, count, sizes", [
+    ("accumulator", 4, (4,)), ("trixie", 3, (2, 3)), ("Super Yankee", 5, (2, 3, 4, 5)),
+    ("doubles", 5, (2,)), ("4-folds", 6, (4,)), ("goliath", 8, (2, 3, 4, 5, 6, 7, 8)),
+])
+def test_fold_sizes(bet_type, count, sizes):
+    assert fold_sizes(bet_type, count) == sizes
+
+
+@pytest.mark.parametrize("bet_type, count", [("yankee", 3), ("trebles", 2), ("7-folds", 5), ("round robin", 3)])
+def test_fold_sizes_rejects(bet_type, count):
+    with pytest.raises(ValueError):
+        fold_sizes(bet_type, count)
+
+
+@pytest.mark.parametrize("bet_type, lines", [("yankee", 11), ("lucky15", 15), ("doubles", 6), ("acca", 1)])
+def test_price_matches_enumeration(bet_type, lines):
+    odds = [2.0, 1.5, 3.25, 4.0]
+    priced = price_system_bet(odds, 2.0, bet_type)
+    sizes = fold_sizes(bet_type, 4)
+    assert priced["lines"] == lines and priced["total_stake"] == lines * 2.0
+    assert priced["potential_return"] == pytest.approx(brute_force(odds, sizes, 2.0))
+    assert priced["settled_return"] == 0.0 and not priced["settled"]
+
+
+def test_settled_legs():
+    odds = [2.0, 3.0, 5.0]
+    priced = price_system_bet(odds, 1.0, "trixie", [WON, VOID, LOST])
+    # Only the double of the won and the void leg survives: 2.0 * 1.0
+    assert priced["settled"] and priced["settled_return"] == pytest.approx(2.0)
+    pending = price_system_bet(odds, 1.0, "trixie", [WON, VOID, PENDING])
+    assert pending["settled_return"] == pytest.approx(2.0)
+    assert pending["potential_return"] == pytest.approx(2.0 + 10.0 + 5.0 + 10.0)
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        price_system_bet([2.0, 1.0], 1.0, "doubles")
+    with pytest.raises(ValueError):
+        price_system_bet([2.0, 3.0], 1.0, "doubles", [WON])
+    with pytest.raises(ValueError):
+        price_system_bet([2.0, 3.0], 1.0, "doubles", [WON, "cashed_out"])
+
+
+def test_build_bet_slip():
+    bets = [Bet(id=str(i), match_id=f"m{i}", odds=price, stake=5.0, user_id="u") for i, price in enumerate((2.0, 3.0))]
+    slip = build_bet_slip(bets)
+    assert slip.total_stake == 5.0 and slip.potential_payout == pytest.approx(30.0)
+    assert build_bet_slip(bets, "singles", 1.0).potential_payout == pytest.approx(5.0)
+    with pytest.raises(ValueError):
+        build_bet_slip([])
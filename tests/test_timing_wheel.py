@@ -0,0 +1,57 @@
+import pytest
+from utils.timing_wheel import TimingWheel
+
+
+def fire_times(wheel, ticks):
+    fired = {}
+    for tick in range(1, ticks + 1):
+        for item in wheel.advance():
+            fired[item] = tick
+    return fired
+
+
+def test_timers_fire_on_their_tick():
+    wheel = TimingWheel(0.1, slots=8)
+    for key, delay in (("a", 0.1), ("b", 0.25), ("c", 0.8), ("d", 0.0), ("e", 2.05)):
+        wheel.schedule(key, key, delay)
+    assert len(wheel) == 5
+    # Delays round up to whole ticks, at least one; 'e' goes round the wheel twice
+    assert fire_times(wheel, 30) == {"a": 1, "d": 1, "b": 3, "c": 8, "e": 21}
+    assert len(wheel) == 0
+
+
+def test_advance_many_ticks_returns_expiry_order():
+    wheel = TimingWheel(1.0, slots=4)
+    wheel.advance(3)  # Start mid-ring
+    for key, delay in (("late", 6), ("early", 2), ("mid", 4)):
+        wheel.schedule(key, key, delay)
+    assert wheel.advance(10) == ["early", "mid", "late"]
+
+
+def test_cancel():
+    wheel = TimingWheel(1.0, slots=4)
+    wheel.schedule("a", {"bet": 1}, 3)
+    wheel.schedule("b", {"bet": 2}, 3)
+    assert "a" in wheel
+    assert wheel.cancel("a") == {"bet": 1}
+    assert wheel.cancel("a") is None and "a" not in wheel
+    assert wheel.advance(3) == [{"bet": 2}]
+
+
+def test_invalid_use():
+    with pytest.raises(ValueError):
+        TimingWheel(0)
+    wheel = TimingWheel(1.0)
+    wheel.schedule("a", 1, 1)
+    with pytest.raises(KeyError):
+        wheel.schedule("a", 2, 1)
+
+
+def test_drain_returns_pending_in_expiry_order():
+    wheel = TimingWheel(1.0, slots=4)
+    wheel.advance(2)
+    for key, delay in (("far", 9), ("near", 1), ("next_turn", 5), ("mid", 3)):
+        wheel.schedule(key, key, delay)
+    assert wheel.drain() == ["near", "mid", "next_turn", "far"]
+    assert len(wheel) == 0 and "near" not in wheel
+    assert wheel.advance(12) == []
@@ -1,16 +1,18 @@
 # utils/calculate_odds.py
 
-from typing import Union
+import math
+from typing import Any, Dict, Iterable, Union
+import numpy as np
+from utils.odds_ladder import LADDER, LADDER_DECIMALS, SNAP_TOLERANCE, price
 
 def decimal_to_fractional(decimal_odds: float) -> str:
     """
-    Convert decimal odds to fractional odds.
-    Example: 2.5 -> '3/2'
+    Convert decimal odds to fractional odds, as quoted on the odds ladder.
+    Example: 2.5 -> '6/4', 1.333 -> '1/3', 2.3 -> '13/10'
     """
-    numerator = int((decimal_odds - 1) * 100)
-    denominator = 100
-    gcd = _find_gcd(numerator, denominator)
-    return f"{numerator // gcd}/{denominator // gcd}"
+    if not is_valid_odds(decimal_odds):
+        return "Invalid decimal odds"
+    return price(decimal_odds).fractional
 
 def fractional_to_decimal(fractional_odds: str) -> float:
     """
@@ -35,11 +37,10 @@ def decimal_to_american(decimal_odds: float) -> Union[int, str]:
     Convert decimal odds to American odds.
     Returns +value if decimal odds indicate an underdog.
     Returns -value if decimal odds indicate a favorite.
+    Example: 1.67 -> -150 (the 4/6 rung)
     """
-    if decimal_odds >= 2.0:
-        return int((decimal_odds - 1) * 100)
-    elif decimal_odds > 1:
-        return int(-100 / (decimal_odds - 1))
+    if is_valid_odds(decimal_odds):
+        return price(decimal_odds).american
     else:
         return "Invalid decimal odds"
 
@@ -64,14 +65,160 @@ def calculate_profit(stake: float, decimal_odds: float) -> float:
 
 def is_valid_odds(decimal_odds: float) -> bool:
     """
-    Validate if the decimal odds are positive and above 1.0 (1.0 means no return).
+    Validate if the decimal odds are finite and above 1.0 (1.0 means no return).
+    """
+    return decimal_odds > 1.0 and math.isfinite(decimal_odds)
+
+
+# Batch (NumPy) variants. They take any array-like of odds and work on the whole
+# array at once; invalid entries are flagged in a boolean ``valid`` mask and
+# filled with 0 (integers) or NaN (floats) instead of returning error strings.
+
+# Odds ladder as arrays, for pricing whole boards with one searchsorted
+_LADDER_DECIMALS = np.asarray(LADDER_DECIMALS)
+_LADDER_NUMERATORS = np.asarray([rung.fraction.numerator for rung in LADDER], dtype=np.int64)
+_LADDER_DENOMINATORS = np.asarray([rung.fraction.denominator for rung in LADDER], dtype=np.int64)
+_LADDER_AMERICAN = np.asarray([rung.american for rung in LADDER], dtype=np.int64)
+_LADDER_LABELS = np.asarray([rung.fractional for rung in LADDER], dtype=object)
+
+def _price_or_none(decimal_odds: float):
+    try:
+        return price(decimal_odds)
+    except (ValueError, ZeroDivisionError, OverflowError):
+        return None
+
+def _price_batch(odds: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    ``price`` for a whole array: prices on or near the ladder take their rung
+    in one searchsorted, and each distinct off-ladder price goes through the
+    memoized rational fallback once. Invalid prices, and any the ladder cannot
+    quote, are masked and left as 0/1/0/''.
+    """
+    valid = is_valid_odds_batch(odds)
+    safe = np.where(valid, odds, 2.0)
+    upper = np.clip(np.searchsorted(_LADDER_DECIMALS, safe), 1, len(_LADDER_DECIMALS) - 1)
+    lower = upper - 1
+    index = np.where(np.abs(_LADDER_DECIMALS[lower] - safe) <= np.abs(_LADDER_DECIMALS[upper] - safe), lower, upper)
+    snapped = np.abs(_LADDER_DECIMALS[index] - safe) <= SNAP_TOLERANCE * safe
+    numerators = _LADDER_NUMERATORS[index]
+    denominators = _LADDER_DENOMINATORS[index]
+    american = _LADDER_AMERICAN[index]
+    labels = _LADDER_LABELS[index]
+    off_ladder = valid & ~snapped
+    if off_ladder.any():
+        values, inverse = np.unique(safe[off_ladder], return_inverse=True)
+        rungs = [_price_or_none(value) for value in values.tolist()]
+        inverse = inverse.reshape(-1)
+        unpriced = np.asarray([rung is None for rung in rungs])[inverse]
+        if unpriced.any():
+            # One price the ladder cannot quote is masked; the rest of the board still renders
+            valid[np.flatnonzero(off_ladder)[unpriced]] = False
+            rungs = [rung or LADDER[0] for rung in rungs]
+        numerators[off_ladder] = np.asarray([rung.fraction.numerator for rung in rungs], dtype=np.int64)[inverse]
+        denominators[off_ladder] = np.asarray([rung.fraction.denominator for rung in rungs], dtype=np.int64)[inverse]
+        american[off_ladder] = np.asarray([rung.american for rung in rungs], dtype=np.int64)[inverse]
+        labels[off_ladder] = np.asarray([rung.fractional for rung in rungs], dtype=object)[inverse]
+    numerators[~valid] = 0
+    denominators[~valid] = 1
+    american[~valid] = 0
+    labels[~valid] = ""
+    return {"numerator": numerators, "denominator": denominators, "american": american, "label": labels, "valid": valid}
+
+def is_valid_odds_batch(decimal_odds: Iterable[float]) -> np.ndarray:
+    """
+    Boolean mask of decimal odds that are finite and above 1.0.
+    """
+    odds = np.asarray(decimal_odds, dtype=np.float64)
+    return np.isfinite(odds) & (odds > 1.0)
+
+def decimal_to_fractional_batch(decimal_odds: Iterable[float]) -> Dict[str, np.ndarray]:
+    """
+    Convert an array of decimal odds to fractions, as ``decimal_to_fractional``
+    does: reduced numerators and denominators plus the quoted ladder label.
+    Example: [2.5, 1.333, 0.5] -> numerators [3, 1, 0], denominators [2, 3, 1],
+    labels ['6/4', '1/3', ''], valid [True, True, False]
     """
-    return decimal_odds > 1.0
+    priced = _price_batch(np.asarray(decimal_odds, dtype=np.float64))
+    return {key: priced[key] for key in ("numerator", "denominator", "label", "valid")}
 
-def _find_gcd(a: int, b: int) -> int:
+def fractional_to_decimal_batch(numerators: Iterable[int], denominators: Iterable[int]) -> Dict[str, np.ndarray]:
     """
-    Helper function to find the greatest common divisor (GCD) of two numbers.
+    Convert arrays of fraction numerators and denominators to decimal odds.
+    Example: ([3], [2]) -> decimal [2.5]
     """
-    while b:
-        a, b = b, a % b
-    return a
+    numerators = np.asarray(numerators, dtype=np.float64)
+    denominators = np.asarray(denominators, dtype=np.float64)
+    valid = (denominators > 0) & (numerators > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decimal = np.where(valid, numerators / denominators + 1, np.nan)
+    return {"decimal": decimal, "valid": valid}
+
+def american_to_decimal_batch(american_odds: Iterable[float]) -> Dict[str, np.ndarray]:
+    """
+    Convert an array of American odds to decimal odds. 0 (and anything
+    between -100 and +100) is not a valid American price and is masked.
+    """
+    american = np.asarray(american_odds, dtype=np.float64)
+    valid = np.isfinite(american) & (np.abs(american) >= 100)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decimal = np.where(american > 0, american / 100 + 1, 100 / np.abs(american) + 1)
+    return {"decimal": np.where(valid, decimal, np.nan), "valid": valid}
+
+def decimal_to_american_batch(decimal_odds: Iterable[float]) -> Dict[str, np.ndarray]:
+    """
+    Convert an array of decimal odds to American odds (+value for underdogs,
+    -value for favorites), masking odds at or below 1.0.
+    """
+    priced = _price_batch(np.asarray(decimal_odds, dtype=np.float64))
+    return {"american": priced["american"], "valid": priced["valid"]}
+
+def implied_probability_batch(decimal_odds: Iterable[float]) -> Dict[str, np.ndarray]:
+    """
+    Implied probabilities in percent for an array of decimal odds.
+    Example: [2.5, 4.0] -> [40.0, 25.0]
+    """
+    odds = np.asarray(decimal_odds, dtype=np.float64)
+    valid = is_valid_odds_batch(odds)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probability = np.where(valid, 100 / odds, np.nan)
+    return {"probability": probability, "valid": valid}
+
+def convert_odds_batch(decimal_odds: Iterable[float]) -> Dict[str, np.ndarray]:
+    """
+    Every display format for an array of decimal odds in one vectorized pass:
+    decimal, fractional (quoted labels such as '4/6', '' when invalid), American,
+    implied probability and the shared ``valid`` mask.
+    """
+    odds = np.asarray(decimal_odds, dtype=np.float64)
+    priced = _price_batch(odds)
+    valid = priced["valid"]
+    return {
+        "decimal": np.where(valid, odds, np.nan),
+        "fractional": priced["label"],
+        "american": priced["american"],
+        "implied_probability": np.where(valid, implied_probability_batch(odds)["probability"], np.nan),
+        "valid": valid,
+    }
+
+def convert_board(board: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Convert a whole odds board ({match_id: {selection: decimal_odds}}) to every
+    display format with a single ``convert_odds_batch`` call.
+    Invalid prices come back as None in every format.
+    """
+    keys = [(match_id, selection) for match_id, odds in board.items() for selection in odds]
+    converted = convert_odds_batch([board[match_id][selection] for match_id, selection in keys])
+    decimal = converted["decimal"].tolist()
+    fractional = converted["fractional"].tolist()
+    american = converted["american"].tolist()
+    probability = converted["implied_probability"].tolist()
+    valid = converted["valid"].tolist()
+    result: Dict[str, Dict[str, Dict[str, Any]]] = {match_id: {} for match_id in board}
+    for i, (match_id, selection) in enumerate(keys):
+        result[match_id][selection] = {
+            "decimal": decimal[i] if valid[i] else None,
+            "fractional": fractional[i] if valid[i] else None,
+            "american": american[i] if valid[i] else None,
+            "implied_probability": probability[i] if valid[i] else None,
+        }
+    return result
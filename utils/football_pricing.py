@@ -0,0 +1,150 @@
+# utils/football_pricing.py
+
+from functools import lru_cache
+from math import lgamma
+from typing import Dict, Iterable, Sequence, Union
+import numpy as np
+
+# Goals per side modelled in the score matrix (0..MAX_GOALS); the tail beyond is negligible for football
+MAX_GOALS = 10
+TOTAL_LINES = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+# Asian handicap lines, applied to the home side (-0.25 is the quarter line between 0 and -0.5)
+HANDICAP_LINES = (-2.5, -2.0, -1.5, -1.25, -1.0, -0.75, -0.5, -0.25, 0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5)
+# Correct scores quoted individually; everything else is 'other'
+CORRECT_SCORE_MAX = 5
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+@lru_cache(maxsize=8)
+def _log_factorials(max_goals: int) -> np.ndarray:
+    return np.array([lgamma(n + 1) for n in range(max_goals + 1)])
+
+
+@lru_cache(maxsize=8)
+def _cell_projections(max_goals: int) -> tuple:
+    """
+    One-hot maps from score-matrix cells to goal difference (offset by
+    max_goals) and to total goals, so both distributions are a matrix product.
+    """
+    goals = np.arange(max_goals + 1)
+    home_goals, away_goals = np.meshgrid(goals, goals, indexing="ij")
+    projections = []
+    for values in ((home_goals - away_goals + max_goals).ravel(), (home_goals + away_goals).ravel()):
+        one_hot = np.zeros((values.size, 2 * max_goals + 1))
+        one_hot[np.arange(values.size), values] = 1.0
+        projections.append(one_hot)
+    return tuple(projections)
+
+
+def poisson_pmf(rates: np.ndarray, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """P(k goals) for k = 0..max_goals, for every rate at once: shape (len(rates), max_goals + 1)."""
+    k = np.arange(max_goals + 1)
+    log_factorial = _log_factorials(max_goals)
+    rates = np.asarray(rates, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore"):
+        return np.exp(k * np.log(rates) - rates - log_factorial)
+
+
+def score_matrix(home_rates: ArrayLike, away_rates: ArrayLike, rho: ArrayLike = 0.0,
+                 max_goals: int = MAX_GOALS) -> np.ndarray:
+    """
+    P(home goals = i, away goals = j) for every fixture: shape (fixtures, max_goals + 1, max_goals + 1).
+
+    Goals are independent Poisson with the given expected goals, with the
+    Dixon-Coles correction ``rho`` for the low-scoring cells (0-0, 1-0, 0-1, 1-1)
+    when it is non-zero. Each matrix is renormalized for the truncated tail.
+    """
+    home_rates = np.atleast_1d(np.asarray(home_rates, dtype=np.float64))
+    away_rates = np.atleast_1d(np.asarray(away_rates, dtype=np.float64))
+    if np.any(home_rates <= 0) or np.any(away_rates <= 0):
+        raise ValueError("Expected goals must be positive")
+    rho = np.broadcast_to(np.asarray(rho, dtype=np.float64), home_rates.shape)
+    matrix = poisson_pmf(home_rates, max_goals)[:, :, None] * poisson_pmf(away_rates, max_goals)[:, None, :]
+    if np.any(rho != 0):
+        lam, mu = home_rates, away_rates
+        # Dixon-Coles tau, clipped at 0 where rho is outside its valid range for the rates
+        matrix[:, 0, 0] *= np.maximum(1 - lam * mu * rho, 0)
+        matrix[:, 0, 1] *= np.maximum(1 + lam * rho, 0)
+        matrix[:, 1, 0] *= np.maximum(1 + mu * rho, 0)
+        matrix[:, 1, 1] *= np.maximum(1 - rho, 0)
+    return matrix / matrix.sum(axis=(1, 2), keepdims=True)
+
+
+def _fair_odds(probability: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.where(probability > 0, 1.0 / probability, np.inf)
+
+
+def _handicap_odds(difference: np.ndarray, line: float, max_goals: int) -> Dict[str, np.ndarray]:
+    """
+    Fair odds for both sides of a home Asian handicap ``line``, given the goal
+    difference distribution (index max_goals is a draw). Pushes return the
+    stake; quarter lines are half the stake on each neighbouring line.
+    """
+    diffs = np.arange(-max_goals, max_goals + 1)
+    halves = (line - 0.25, line + 0.25) if (line * 4) % 2 else (line,)
+    home_win = home_push = away_win = 0.0
+    for half in halves:
+        outcome = diffs + half
+        home_win = home_win + difference[:, outcome > 0].sum(axis=1) / len(halves)
+        home_push = home_push + difference[:, outcome == 0].sum(axis=1) / len(halves)
+        away_win = away_win + difference[:, outcome < 0].sum(axis=1) / len(halves)
+    # Fair when win * odds + push = 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "home": np.where(home_win > 0, (1 - home_push) / home_win, np.inf),
+            "away": np.where(away_win > 0, (1 - home_push) / away_win, np.inf),
+        }
+
+
+def price_fixtures(home_rates: ArrayLike, away_rates: ArrayLike, rho: ArrayLike = 0.0,
+                   max_goals: int = MAX_GOALS, total_lines: Iterable[float] = TOTAL_LINES,
+                   handicap_lines: Iterable[float] = HANDICAP_LINES) -> Dict[str, object]:
+    """
+    Fair probabilities and odds of 1X2, over/under, BTTS, correct score and
+    Asian handicap markets for a whole fixture list, all derived from one
+    score matrix per fixture. Every value is an array with one entry per fixture.
+    """
+    matrix = score_matrix(home_rates, away_rates, rho, max_goals)
+    to_difference, to_total = _cell_projections(max_goals)
+    cells = matrix.reshape(matrix.shape[0], -1)
+    difference = cells @ to_difference  # Index max_goals is a draw
+    totals = cells @ to_total
+
+    home = difference[:, max_goals + 1:].sum(axis=1)
+    draw = difference[:, max_goals]
+    away = difference[:, :max_goals].sum(axis=1)
+    btts = matrix[:, 1:, 1:].sum(axis=(1, 2))
+    cumulative = np.cumsum(totals, axis=1)
+    over_under = {}
+    for line in total_lines:
+        under = cumulative[:, int(np.floor(line))]
+        over_under[line] = {"over": 1 - under, "under": under}
+    shown = min(CORRECT_SCORE_MAX, max_goals)
+    correct_score = {f"{i}-{j}": matrix[:, i, j] for i in range(shown + 1) for j in range(shown + 1)}
+    correct_score["other"] = 1 - matrix[:, : shown + 1, : shown + 1].sum(axis=(1, 2))
+
+    return {
+        "matrix": matrix,
+        "1x2": {"home": home, "draw": draw, "away": away},
+        "over_under": over_under,
+        "btts": {"yes": btts, "no": 1 - btts},
+        "correct_score": correct_score,
+        "asian_handicap": {line: _handicap_odds(difference, line, max_goals) for line in handicap_lines},
+        "fair_odds": {
+            "home": _fair_odds(home), "draw": _fair_odds(draw), "away": _fair_odds(away),
+            "btts_yes": _fair_odds(btts), "btts_no": _fair_odds(1 - btts),
+            **{f"over_{line}": _fair_odds(market["over"]) for line, market in over_under.items()},
+            **{f"under_{line}": _fair_odds(market["under"]) for line, market in over_under.items()},
+        },
+    }
+
+
+def match_odds(home_rate: float, away_rate: float, rho: float = 0.0, margin: float = 0.0) -> Dict[str, float]:
+    """
+    1X2 odds for one fixture in the ``MatchCreate.odds`` shape, with ``margin``
+    (e.g. 0.05) spread proportionally. Example: (1.6, 1.1) -> {'home': ..., 'draw': ..., 'away': ...}
+    """
+    market = price_fixtures(home_rate, away_rate, rho, total_lines=(), handicap_lines=())["1x2"]
+    return {selection: float(1 / (probability[0] * (1 + margin))) for selection, probability in market.items()}
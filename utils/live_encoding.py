@@ -0,0 +1,92 @@
+# utils/live_encoding.py
+
+import json
+from typing import Any, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:  # Optional: compact JSON is only offered when orjson is installed
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: binary frames are only offered when msgpack is installed
+    msgpack = None
+
+DEFAULT_ENCODING = "json"
+SSE_ENCODING = "sse"  # Server-Sent Events records, never offered to websocket clients
+
+
+def encode_json(payload: Any) -> str:
+    """Standard library JSON, for clients that did not ask for anything else."""
+    return json.dumps(payload, default=str)
+
+
+def encode_orjson(payload: Any) -> str:
+    """Compact JSON text via orjson (no whitespace, much faster than json.dumps)."""
+    return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """MessagePack, sent as binary websocket frames."""
+    return msgpack.packb(payload, default=str, use_bin_type=True)
+
+
+def encode_sse(payload: Any) -> str:
+    """
+    One Server-Sent Events record: the payload as JSON data, its ``type`` as the
+    event name and its ``seq``, when it has one, as the event id clients resume from.
+    """
+    lines = []
+    if isinstance(payload, dict):
+        if payload.get("seq") is not None:
+            lines.append(f"id: {payload['seq']}")
+        if payload.get("type"):
+            lines.append(f"event: {payload['type']}")
+    lines.append(f"data: {encode_json(payload)}")
+    return "\n".join(lines) + "\n\n"
+
+
+ENCODERS: Dict[str, Callable[[Any], Union[str, bytes]]] = {DEFAULT_ENCODING: encode_json, SSE_ENCODING: encode_sse}
+if orjson is not None:
+    ENCODERS["orjson"] = encode_orjson
+if msgpack is not None:
+    ENCODERS["msgpack"] = encode_msgpack
+
+
+def negotiate_encoding(requested: str = None) -> str:
+    """
+    Pick the frame encoding for a client from its ``?encoding=`` request,
+    falling back to plain JSON when the encoding is unknown or not installed.
+    """
+    if requested and requested.lower() in ENCODERS and requested.lower() != SSE_ENCODING:
+        return requested.lower()
+    return DEFAULT_ENCODING
+
+
+def decode_client_message(data: Union[str, bytes]) -> Any:
+    """Decode a frame sent by a client: JSON text, or MessagePack binary."""
+    if isinstance(data, bytes):
+        if msgpack is None:
+            raise ValueError("Binary frames are not supported")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+class LiveFrame:
+    """
+    A payload that is published to many sockets. It is encoded at most once per
+    encoding, however many clients it is written to.
+    """
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encode(self, encoding: str = DEFAULT_ENCODING) -> Union[str, bytes]:
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = ENCODERS[encoding](self.payload)
+        return encoded
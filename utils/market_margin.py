@@ -0,0 +1,196 @@
+# utils/market_margin.py
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+# Methods for removing the margin from a market's implied probabilities
+FAIR_METHODS = ("proportional", "shin", "power")
+# Methods for putting a target margin back on fair probabilities
+MARGIN_METHODS = ("proportional", "power")
+
+_ITERATIONS = 60
+
+
+def odds_matrix(markets: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack markets ({selection: decimal_odds}, e.g. ``MatchCreate.odds``) into a
+    padded (markets x selections) array, with a mask of the real, valid prices.
+    """
+    width = max((len(market) for market in markets), default=0)
+    matrix = np.full((len(markets), width), np.nan)
+    for row, market in enumerate(markets):
+        matrix[row, : len(market)] = list(market.values())
+    mask = np.isfinite(matrix) & (matrix > 1.0)
+    return matrix, mask
+
+
+def implied_probabilities(matrix: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """1 / odds for every valid price, 0 for padding and invalid prices."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(mask, 1.0 / matrix, 0.0)
+
+
+def overround(matrix: np.ndarray, mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per market: the booksum (sum of implied probabilities), the overround
+    (booksum - 1) and the bookmaker margin (1 - 1 / booksum).
+    """
+    booksum = implied_probabilities(matrix, mask).sum(axis=1)
+    with np.errstate(divide="ignore"):
+        margin = np.where(booksum > 0, 1.0 - 1.0 / booksum, np.nan)
+    return {"booksum": booksum, "overround": booksum - 1.0, "margin": margin}
+
+
+def _power_exponent(probabilities: np.ndarray, mask: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Per row, the exponent k with sum(p ** k) == target, by Newton's method from k = 1."""
+    k = np.ones(probabilities.shape[0])
+    safe = np.where(mask, probabilities, 1.0)
+    logs = np.log(safe)
+    for _ in range(_ITERATIONS):
+        powered = np.where(mask, safe ** k[:, None], 0.0)
+        f = powered.sum(axis=1) - target
+        slope = (powered * logs).sum(axis=1)
+        step = np.divide(f, slope, out=np.zeros_like(f), where=slope != 0)
+        k = np.maximum(k - step, 1e-6)
+        if np.all(np.abs(step) < 1e-12):
+            break
+    return k
+
+
+def _shin_z(q: np.ndarray, mask: np.ndarray, booksum: np.ndarray) -> np.ndarray:
+    """Per row, Shin's insider-trading share z, by bisection on sum(p(z)) == 1."""
+    low = np.zeros(q.shape[0])
+    high = np.full(q.shape[0], 0.999)
+    for _ in range(_ITERATIONS):
+        z = (low + high) / 2
+        total = _shin_probabilities(q, mask, booksum, z).sum(axis=1)
+        # The probabilities sum to sqrt(booksum) at z = 0 and shrink as z grows
+        low = np.where(total > 1.0, z, low)
+        high = np.where(total > 1.0, high, z)
+    return (low + high) / 2
+
+
+def _shin_probabilities(q: np.ndarray, mask: np.ndarray, booksum: np.ndarray, z: np.ndarray) -> np.ndarray:
+    z = z[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = (np.sqrt(z ** 2 + 4 * (1 - z) * q ** 2 / booksum[:, None]) - z) / (2 * (1 - z))
+    return np.where(mask, p, 0.0)
+
+
+def fair_probabilities(matrix: np.ndarray, mask: np.ndarray, method: str = "proportional") -> np.ndarray:
+    """
+    Margin-free probabilities for every market at once.
+
+    proportional: scale implied probabilities down by the booksum.
+    power: raise implied probabilities to the power k that makes them sum to 1
+    (takes more margin off longshots).
+    shin: Shin's model, which attributes the margin to insider trading and
+    also shades longshots. Markets without a margin (booksum <= 1) are
+    normalized proportionally.
+    """
+    if method not in FAIR_METHODS:
+        raise ValueError(f"Unknown fair price method: {method}")
+    q = implied_probabilities(matrix, mask)
+    booksum = q.sum(axis=1)
+    proportional = np.divide(q, booksum[:, None], out=np.zeros_like(q), where=booksum[:, None] > 0)
+    if method == "proportional":
+        return proportional
+    if method == "power":
+        k = _power_exponent(q, mask, np.ones_like(booksum))
+        fair = np.where(mask, np.where(mask, q, 1.0) ** k[:, None], 0.0)
+    else:
+        fair = _shin_probabilities(q, mask, booksum, _shin_z(q, mask, booksum))
+    return np.where((booksum > 1.0)[:, None], fair, proportional)
+
+
+def apply_margin(probabilities: np.ndarray, mask: np.ndarray, margin: float,
+                 method: str = "proportional") -> np.ndarray:
+    """
+    Offered decimal odds that put ``margin`` (e.g. 0.05 for a 105% book) on
+    fair probabilities, proportionally or with the power method.
+    """
+    if method not in MARGIN_METHODS:
+        raise ValueError(f"Unknown margin method: {method}")
+    target = 1.0 + margin
+    if method == "proportional":
+        offered = probabilities * target
+    else:
+        k = _power_exponent(probabilities, mask, np.full(probabilities.shape[0], target))
+        offered = np.where(mask, np.where(mask, probabilities, 1.0) ** k[:, None], 0.0)
+    with np.errstate(divide="ignore"):
+        return np.where(mask & (offered > 0), 1.0 / offered, np.nan)
+
+
+def price_markets(markets: List[Dict[str, float]], method: str = "proportional",
+                  target_margin: Optional[float] = None, margin_method: str = "proportional") -> List[Dict[str, Any]]:
+    """
+    Overround, margin and fair probabilities (plus offered odds at
+    ``target_margin``) for a list of markets in one vectorized pass.
+    """
+    matrix, mask = odds_matrix(markets)
+    books = overround(matrix, mask)
+    fair = fair_probabilities(matrix, mask, method)
+    offered = apply_margin(fair, mask, target_margin, margin_method) if target_margin is not None else None
+    results = []
+    for row, market in enumerate(markets):
+        selections = list(market)
+        result = {
+            "booksum": float(books["booksum"][row]),
+            "overround": float(books["overround"][row]),
+            "margin": float(books["margin"][row]) if mask[row].any() else None,
+            "fair_probabilities": {
+                selection: float(fair[row, col]) if mask[row, col] else None for col, selection in enumerate(selections)
+            },
+        }
+        if offered is not None:
+            result["offered_odds"] = {
+                selection: float(offered[row, col]) if mask[row, col] else None for col, selection in enumerate(selections)
+            }
+        results.append(result)
+    return results
+
+
+class MarginCache:
+    """
+    Priced markets per match, keyed by the odds they were computed from, so a
+    match is only repriced when its odds change. Stale matches on a board are
+    repriced together in one vectorized call.
+    """
+
+    def __init__(self, method: str = "proportional", target_margin: Optional[float] = None,
+                 margin_method: str = "proportional"):
+        self.method = method
+        self.target_margin = target_margin
+        self.margin_method = margin_method
+        self._entries: Dict[Hashable, Tuple[Tuple, Dict[str, Any]]] = {}  # match_id -> (odds key, result)
+
+    def get(self, match_id: Hashable, odds: Dict[str, float]) -> Dict[str, Any]:
+        return self.board({match_id: odds})[match_id]
+
+    def board(self, board: Dict[Hashable, Dict[str, float]], prune: bool = False) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Priced markets for {match_id: odds}, reusing every entry whose odds are
+        unchanged. With ``prune``, matches no longer on the board are dropped.
+        """
+        if prune:
+            for match_id in [match_id for match_id in self._entries if match_id not in board]:
+                del self._entries[match_id]
+        keys = {match_id: tuple(odds.items()) for match_id, odds in board.items()}
+        stale = [match_id for match_id, key in keys.items()
+                 if match_id not in self._entries or self._entries[match_id][0] != key]
+        if stale:
+            priced = price_markets([board[match_id] for match_id in stale], self.method,
+                                   self.target_margin, self.margin_method)
+            for match_id, result in zip(stale, priced):
+                self._entries[match_id] = (keys[match_id], result)
+        return {match_id: self._entries[match_id][1] for match_id in board}
+
+    def invalidate(self, match_id: Optional[Hashable] = None):
+        """Forget one match (or everything), e.g. when it leaves the board."""
+        if match_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(match_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
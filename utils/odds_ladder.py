@@ -0,0 +1,131 @@
+# utils/odds_ladder.py
+
+from bisect import bisect_left
+from math import isfinite
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+# Standard fractional price ladder, shortest to longest
+LADDER_FRACTIONS = (
+    "1/100", "1/50", "1/33", "1/25", "1/20", "1/16", "1/14", "1/12", "1/10", "1/9",
+    "1/8", "2/15", "1/7", "2/13", "1/6", "2/11", "1/5", "2/9", "1/4", "2/7",
+    "3/10", "1/3", "4/11", "2/5", "4/9", "1/2", "8/15", "4/7", "8/13", "4/6",
+    "8/11", "4/5", "5/6", "10/11", "1/1", "11/10", "6/5", "5/4", "11/8", "7/5",
+    "6/4", "8/5", "13/8", "7/4", "15/8", "2/1", "85/40", "9/4", "12/5", "5/2",
+    "13/5", "11/4", "3/1", "100/30", "7/2", "4/1", "9/2", "5/1", "11/2", "6/1",
+    "13/2", "7/1", "15/2", "8/1", "17/2", "9/1", "10/1", "11/1", "12/1", "14/1",
+    "16/1", "18/1", "20/1", "22/1", "25/1", "28/1", "33/1", "40/1", "50/1", "66/1",
+    "80/1", "100/1", "125/1", "150/1", "200/1", "250/1", "500/1", "1000/1",
+)
+
+# Off-ladder prices within this relative distance of a rung are shown as that rung
+SNAP_TOLERANCE = 0.005
+# Largest denominator used when an off-ladder price is turned into a fraction
+MAX_DENOMINATOR = 100
+
+
+class OddsRung(NamedTuple):
+    fractional: str  # As quoted, e.g. '4/6' or '100/30' (not reduced)
+    fraction: Fraction  # Exact profit per unit staked
+    decimal: float
+    american: int
+
+
+def _rung(fractional: str, fraction: Fraction) -> OddsRung:
+    if fraction >= 1:
+        american = round(fraction * 100)
+    else:
+        american = -round(100 / fraction)
+    return OddsRung(fractional, fraction, float(1 + fraction), american)
+
+
+LADDER: List[OddsRung] = sorted(
+    (_rung(label, Fraction(label)) for label in LADDER_FRACTIONS), key=lambda rung: rung.decimal
+)
+LADDER_DECIMALS: List[float] = [rung.decimal for rung in LADDER]
+
+# O(1) lookups. Decimal prices are keyed to 4 places, and to the 2 places they
+# are usually published with (1.67 is 4/6) where that is unambiguous.
+_BY_DECIMAL: Dict[float, OddsRung] = {round(rung.decimal, 4): rung for rung in LADDER}
+for _entry in LADDER:
+    _BY_DECIMAL.setdefault(round(_entry.decimal, 2), _entry)
+del _entry
+_BY_FRACTIONAL: Dict[str, OddsRung] = {rung.fractional: rung for rung in LADDER}
+_BY_AMERICAN: Dict[int, OddsRung] = {rung.american: rung for rung in LADDER}
+
+
+def ladder_rung(decimal_odds: float) -> Optional[OddsRung]:
+    """
+    The rung for a price that is on the ladder, in O(1).
+    Example: 2.375 -> OddsRung('11/8', ...)
+    """
+    return _BY_DECIMAL.get(round(decimal_odds, 4)) or _BY_DECIMAL.get(round(decimal_odds, 2))
+
+
+def snap_to_ladder(decimal_odds: float, tolerance: float = SNAP_TOLERANCE) -> Optional[OddsRung]:
+    """
+    The nearest rung (binary search), if it is within ``tolerance`` of the price.
+    Example: 1.333 -> OddsRung('1/3', ...)
+    """
+    index = bisect_left(LADDER_DECIMALS, decimal_odds)
+    candidates = [LADDER[i] for i in (index - 1, index) if 0 <= i < len(LADDER)]
+    if not candidates:
+        return None
+    nearest = min(candidates, key=lambda rung: abs(rung.decimal - decimal_odds))
+    if abs(nearest.decimal - decimal_odds) <= tolerance * decimal_odds:
+        return nearest
+    return None
+
+
+def rational_price(decimal_odds: float) -> OddsRung:
+    """
+    Exact rational form of an off-ladder price, with the denominator capped at
+    MAX_DENOMINATOR.
+    Example: 2.3 -> OddsRung('13/10', ...)
+    """
+    fraction = Fraction(repr(round(decimal_odds - 1, 6))).limit_denominator(MAX_DENOMINATOR)
+    if fraction <= 0:
+        raise ValueError(f"Decimal odds too short for a fraction: {decimal_odds}")
+    return _rung(f"{fraction.numerator}/{fraction.denominator}", fraction)
+
+
+@lru_cache(maxsize=4096)
+def price(decimal_odds: float) -> OddsRung:
+    """
+    Fractional and American forms of valid (finite, > 1.0) decimal odds: ladder
+    prices exactly, near-ladder prices snapped to their rung, prices below the
+    shortest rung clamped to it, anything else as a fraction.
+    Memoized, so a board's repeated prices are resolved once.
+    """
+    if not (decimal_odds > 1.0 and isfinite(decimal_odds)):
+        raise ValueError(f"Invalid decimal odds: {decimal_odds}")
+    rung = ladder_rung(decimal_odds) or snap_to_ladder(decimal_odds)
+    if rung is not None:
+        return rung
+    if decimal_odds < LADDER_DECIMALS[0]:
+        # Too short to quote as a fraction (1.0001 would round to 0/1); 1/100 is the shortest price
+        return LADDER[0]
+    return rational_price(decimal_odds)
+
+
+def from_fractional(fractional_odds: str) -> OddsRung:
+    """Rung for a quoted fraction such as '11/8', exact even when it is off the ladder."""
+    rung = _BY_FRACTIONAL.get(fractional_odds.strip())
+    if rung is not None:
+        return rung
+    fraction = Fraction(fractional_odds.strip())
+    if fraction <= 0:
+        raise ValueError(f"Invalid fractional odds: {fractional_odds}")
+    return _rung(fractional_odds.strip(), fraction)
+
+
+def from_american(american_odds: int) -> OddsRung:
+    """Rung for American odds such as -150 (4/6) or +138 (11/8)."""
+    rung = _BY_AMERICAN.get(american_odds)
+    if rung is not None:
+        return rung
+    if abs(american_odds) < 100:
+        raise ValueError(f"Invalid American odds: {american_odds}")
+    fraction = Fraction(american_odds, 100) if american_odds > 0 else Fraction(100, -american_odds)
+    return price(float(1 + fraction))
@@ -0,0 +1,72 @@
+# utils/pagination.py
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bson import json_util
+from bson.errors import BSONError
+from fastapi import HTTPException, Query, status
+
+# Response header carrying the token of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Sort = Sequence[Tuple[str, int]]  # [(field, 1 | -1)], ending with _id so every key is unique
+
+
+def keyset_params(page_size: int = Query(10, ge=1, le=100), after: Optional[str] = Query(None, max_length=512)):
+    """Reusable dependency: page size and the ``after`` token of the previous page."""
+    return {"page_size": page_size, "after": after}
+
+
+def encode_cursor(document: Dict[str, Any], sort: Sort) -> str:
+    """Opaque token holding a document's sort key, to resume the scan right after it."""
+    values = [document.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: Sort) -> List[Any]:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError, UnicodeDecodeError, json.JSONDecodeError,
+            BSONError, IndexError, KeyError, TypeError, OverflowError):
+        values = None  # Tampered or truncated: e.g. {"$oid": "zz"} or {"$date": "zz"} inside the token
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+    return values
+
+
+def keyset_filter(sort: Sort, values: List[Any]) -> Dict[str, Any]:
+    """
+    Documents strictly after ``values`` in ``sort`` order: for a key (a, b, _id),
+    a > va, or a = va and b > vb, or a = va, b = vb and _id > v_id (with < for
+    descending fields). Served by an index on the same fields in the same order.
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {prefix: value for (prefix, _), value in zip(sort[:i], values[:i])}
+        branch[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+async def paginate(collection: Any, query: Dict[str, Any], sort: Sort, page_size: int,
+                   after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of ``query`` in ``sort`` order, starting after the ``after`` token,
+    and the token of the next page (None on the last one). The scan seeks
+    straight to the token's key, so every page costs the same as the first.
+    """
+    if after:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(after, sort))]}
+    documents = await collection.find(query).sort(list(sort)).limit(page_size + 1).to_list(length=page_size + 1)
+    if len(documents) <= page_size:
+        return documents, None
+    return documents[:page_size], encode_cursor(documents[page_size - 1], sort)
+
+
+async def create_indexes(db: Any, indexes: Dict[str, List[List[Tuple[str, int]]]]):
+    """Create the compound indexes a module's listings page on ({collection: [keys, ...]})."""
+    for collection, keys in indexes.items():
+        for index in keys:
+            await db[collection].create_index(index)
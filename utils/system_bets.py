@@ -0,0 +1,127 @@
+# utils/system_bets.py
+
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+from schemas.bet import Bet, BetSlip
+
+# Selection states; a void leg stays in its combinations at odds of 1.0
+PENDING, WON, LOST, VOID = "pending", "won", "lost", "void"
+
+# Full-cover system bets: number of selections and the fold sizes they contain
+SYSTEM_BETS: Dict[str, Tuple[int, Tuple[int, ...]]] = {
+    "trixie": (3, (2, 3)),
+    "patent": (3, (1, 2, 3)),
+    "yankee": (4, (2, 3, 4)),
+    "lucky15": (4, (1, 2, 3, 4)),
+    "canadian": (5, (2, 3, 4, 5)),
+    "super_yankee": (5, (2, 3, 4, 5)),
+    "lucky31": (5, (1, 2, 3, 4, 5)),
+    "heinz": (6, (2, 3, 4, 5, 6)),
+    "lucky63": (6, (1, 2, 3, 4, 5, 6)),
+    "super_heinz": (7, (2, 3, 4, 5, 6, 7)),
+    "goliath": (8, (2, 3, 4, 5, 6, 7, 8)),
+}
+
+# Bets made of every combination of one size
+FOLD_NAMES = {"singles": 1, "doubles": 2, "trebles": 3}
+
+
+def fold_sizes(bet_type: str, selections: int) -> Tuple[int, ...]:
+    """
+    Fold sizes covered by a bet type for ``selections`` legs, e.g. 'yankee' -> (2, 3, 4),
+    'doubles' -> (2,), '5-folds' -> (5,), 'accumulator' -> (selections,).
+    """
+    name = bet_type.lower().replace(" ", "_").replace("-", "_")
+    if name in SYSTEM_BETS:
+        required, sizes = SYSTEM_BETS[name]
+        if selections != required:
+            raise ValueError(f"A {bet_type} needs exactly {required} selections, got {selections}")
+        return sizes
+    if name in ("accumulator", "acca"):
+        return (selections,)
+    if name in FOLD_NAMES:
+        size = FOLD_NAMES[name]
+    elif name.endswith("_folds") and name[: -len("_folds")].isdigit():
+        size = int(name[: -len("_folds")])
+    else:
+        raise ValueError(f"Unknown bet type: {bet_type}")
+    if not 1 <= size <= selections:
+        raise ValueError(f"{bet_type} needs at least {size} selections, got {selections}")
+    return (size,)
+
+
+def elementary_symmetric(values: Sequence[float], max_order: Optional[int] = None) -> List[float]:
+    """
+    e_0..e_k of ``values`` by dynamic programming in O(n * k), where e_k is the
+    sum over every k-combination of the product of its values. With each value
+    the return per unit staked on one leg, e_k is the total return of every
+    k-fold per unit staked on each line, without enumerating combinations.
+    Example: [2, 3, 4] -> [1, 9, 26, 24]
+    """
+    order = len(values) if max_order is None else min(max_order, len(values))
+    e = [1.0] + [0.0] * order
+    for i, value in enumerate(values):
+        # Only orders up to i + 1 can be reached after i + 1 values
+        for k in range(min(i + 1, order), 0, -1):
+            e[k] += e[k - 1] * value
+    return e
+
+
+def leg_factor(odds: float, state: str, settled_only: bool = False) -> float:
+    """
+    Return per unit on one leg: its odds when won (or pending, for a potential
+    return), 1.0 when void and 0 when lost. With ``settled_only``, pending legs
+    count as 0, giving what the bet is already guaranteed to return.
+    """
+    if state == WON:
+        return odds
+    if state == VOID:
+        return 1.0
+    if state == LOST:
+        return 0.0
+    if state == PENDING:
+        return 0.0 if settled_only else odds
+    raise ValueError(f"Unknown selection state: {state}")
+
+
+def price_system_bet(odds: Sequence[float], stake_per_line: float, bet_type: str = "accumulator",
+                     states: Optional[Sequence[str]] = None) -> dict:
+    """
+    Stake and returns of an accumulator, an N-fold or a full-cover system bet.
+
+    ``states`` gives each leg as pending/won/lost/void (all pending by default).
+    ``potential_return`` treats pending legs as winners; ``settled_return`` is
+    what the bet returns if every pending leg loses, i.e. the final return once
+    all legs are settled.
+    """
+    states = list(states) if states is not None else [PENDING] * len(odds)
+    if len(states) != len(odds):
+        raise ValueError("One state is needed per selection")
+    if any(price <= 1.0 for price in odds):
+        raise ValueError("Decimal odds must be above 1.0")
+    sizes = fold_sizes(bet_type, len(odds))
+    highest = max(sizes)
+    potential = elementary_symmetric([leg_factor(price, state) for price, state in zip(odds, states)], highest)
+    settled = elementary_symmetric([leg_factor(price, state, True) for price, state in zip(odds, states)], highest)
+    lines = sum(comb(len(odds), size) for size in sizes)
+    return {
+        "bet_type": bet_type,
+        "lines": lines,
+        "total_stake": lines * stake_per_line,
+        "potential_return": sum(potential[size] for size in sizes) * stake_per_line,
+        "settled_return": sum(settled[size] for size in sizes) * stake_per_line,
+        "returns_by_fold": {size: potential[size] * stake_per_line for size in sizes},
+        "settled": all(state != PENDING for state in states),
+    }
+
+
+def build_bet_slip(bets: List[Bet], bet_type: str = "accumulator", stake_per_line: Optional[float] = None) -> BetSlip:
+    """
+    BetSlip for a multiple over ``bets`` (one leg each, using its odds and status).
+    The stake per line defaults to the first leg's stake.
+    """
+    if not bets:
+        raise ValueError("A bet slip needs at least one selection")
+    stake = stake_per_line if stake_per_line is not None else bets[0].stake
+    priced = price_system_bet([bet.odds for bet in bets], stake, bet_type, [bet.status for bet in bets])
+    return BetSlip(bets=bets, total_stake=priced["total_stake"], potential_payout=priced["potential_return"])
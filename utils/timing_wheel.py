@@ -0,0 +1,76 @@
+# utils/timing_wheel.py
+
+from math import ceil
+from typing import Any, Dict, Hashable, List, Tuple
+
+# Default number of slots; with 0.1s ticks one turn of the wheel covers 51.2 seconds
+WHEEL_SLOTS = 512
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: a ring of slots, one per tick, with each timer hashed
+    into the slot its expiry tick falls on. Timers further away than one turn
+    carry the number of whole turns left. Insert and cancel are O(1), and each
+    tick only looks at the timers in one slot, however many are parked.
+    Time is counted in ticks; the caller drives it with ``advance``.
+    """
+
+    def __init__(self, tick: float, slots: int = WHEEL_SLOTS):
+        if tick <= 0 or slots <= 0:
+            raise ValueError("Tick and slot count must be positive")
+        self.tick = tick
+        self.slots: List[Dict[Hashable, Tuple[int, Any]]] = [{} for _ in range(slots)]  # key -> (turns, item)
+        self.cursor = 0  # Slot of the current tick
+        self._where: Dict[Hashable, int] = {}  # key -> slot, for O(1) cancel
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def schedule(self, key: Hashable, item: Any, delay: float):
+        """Fire ``item`` after ``delay`` seconds, rounded up to whole ticks (at least one)."""
+        if key in self._where:
+            raise KeyError(f"Timer already scheduled: {key}")
+        ticks = max(1, ceil(delay / self.tick - 1e-9))
+        turns, offset = divmod(ticks - 1, len(self.slots))
+        slot = (self.cursor + offset + 1) % len(self.slots)
+        self.slots[slot][key] = (turns, item)
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable) -> Any:
+        """Remove a timer before it fires; returns its item, or None if it was not scheduled."""
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return None
+        return self.slots[slot].pop(key)[1]
+
+    def advance(self, ticks: int = 1) -> List[Any]:
+        """Move the wheel on by ``ticks`` and return the items that expired, in expiry order."""
+        expired = []
+        for _ in range(ticks):
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            slot = self.slots[self.cursor]
+            if not slot:
+                continue
+            for key, (turns, item) in list(slot.items()):
+                if turns == 0:
+                    del slot[key]
+                    del self._where[key]
+                    expired.append(item)
+                else:
+                    slot[key] = (turns - 1, item)
+        return expired
+
+    def drain(self) -> List[Any]:
+        """Remove every timer still parked and return their items, in expiry order."""
+        pending = []
+        for offset in range(1, len(self.slots) + 1):
+            slot = self.slots[(self.cursor + offset) % len(self.slots)]
+            pending.extend((turns, offset, item) for turns, item in slot.values())
+            slot.clear()
+        self._where.clear()
+        pending.sort(key=lambda entry: entry[:2])
+        return [item for _, _, item in pending]